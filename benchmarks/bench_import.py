@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+"""Benchmarks for the time it takes to import keteparaha
+
+Each statement is timed in a new interpreter, as every test process pays it
+once. Besides the best wall time over a few runs each benchmark reports the
+number of modules the import loaded, which only changes when keteparaha or
+its dependencies change.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_import --save baseline
+    # ... change keteparaha ...
+    python -m benchmarks.bench_import --compare baseline
+
+Results are stored as JSON in benchmarks/results, named after the import
+benchmark. Comparing fails with a non zero exit status if an import loads
+more modules than the stored result, or is slower by more than the allowed
+tolerance.
+"""
+from __future__ import print_function
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), 'results')
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+IMPORTS = (
+    ('package', 'import keteparaha'),
+    ('flow', 'from keteparaha import retry'),
+    ('page', 'from keteparaha import Page'),
+    ('browser', 'from keteparaha import BrowserTestCase'),
+)
+
+HEAVY = ('selenium', 'imapclient', 'numpy')
+
+TIMER = """
+import json, sys, time
+before = set(sys.modules)
+start = time.time()
+{0}
+seconds = time.time() - start
+loaded = set(sys.modules) - before
+print(json.dumps({{
+    'seconds': seconds,
+    'modules': len(loaded),
+    'heavy': sorted(set(
+        name.split('.')[0] for name in loaded
+        if name.split('.')[0] in {1!r})),
+}}))
+"""
+
+
+def time_import(statement):
+    """Time statement in a new interpreter, returning its result dict"""
+    output = subprocess.check_output(
+        [sys.executable, '-c', TIMER.format(statement, HEAVY)], cwd=ROOT)
+    return json.loads(output.decode('utf-8').strip().splitlines()[-1])
+
+
+def run(options):
+    """Run every import benchmark and return a dict of results keyed by name
+    """
+    results = {}
+    for name, statement in IMPORTS:
+        runs = [time_import(statement) for _ in range(options.repeat)]
+        result = min(runs, key=lambda r: r['seconds'])
+        results[name] = {
+            'modules': max(r['modules'] for r in runs),
+            'heavy': result['heavy'],
+            'seconds': result['seconds'],
+        }
+    return results
+
+
+def compare(results, stored, tolerance, noise=0.01):
+    """Return a list of descriptions of the regressions in results
+
+    Slow downs of less than noise seconds are ignored.
+    """
+    regressions = []
+    for name, result in sorted(results.items()):
+        if name not in stored:
+            continue
+        before = stored[name]
+        if result['modules'] > before['modules']:
+            regressions.append('{0}: {1} modules, was {2}'.format(
+                name, result['modules'], before['modules']))
+        slower = result['seconds'] - before['seconds']
+        if slower > max(before['seconds'] * tolerance, noise):
+            regressions.append('{0}: {1:.4f}s, was {2:.4f}s'.format(
+                name, result['seconds'], before['seconds']))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--save', metavar='NAME',
+                        help='store the results in benchmarks/results')
+    parser.add_argument('--compare', metavar='NAME',
+                        help='compare against stored results')
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='allowed fractional slow down before failing')
+    options = parser.parse_args(argv)
+
+    results = run(options)
+    for name, result in sorted(results.items()):
+        print('{0:<10} {1:>6} modules {2:>10.4f}s  {3}'.format(
+            name, result['modules'], result['seconds'],
+            ', '.join(result['heavy'])))
+
+    if options.save:
+        if not os.path.exists(RESULTS_DIR):
+            os.makedirs(RESULTS_DIR)
+        path = os.path.join(RESULTS_DIR, 'import-' + options.save + '.json')
+        with open(path, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+
+    if options.compare:
+        path = os.path.join(
+            RESULTS_DIR, 'import-' + options.compare + '.json')
+        with open(path) as f:
+            regressions = compare(results, json.load(f), options.tolerance)
+        for regression in regressions:
+            print('REGRESSION', regression)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
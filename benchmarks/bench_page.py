@@ -0,0 +1,199 @@
+# -*- coding: utf-8 -*-
+"""Benchmarks for the page object hot paths, run against a FakeDriver
+
+Each benchmark reports the number of WebDriver commands it issued, which only
+changes when keteparaha changes, and the best wall time over a few runs.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_page --save baseline
+    # ... change keteparaha ...
+    python -m benchmarks.bench_page --compare baseline
+
+Results are stored as JSON in benchmarks/results. Comparing fails with a non
+zero exit status if a benchmark issues more commands than the stored result,
+or is slower by more than the allowed tolerance.
+"""
+from __future__ import print_function
+import argparse
+import json
+import os
+import sys
+import time
+
+from keteparaha.expectations import _wait_for_condition
+from keteparaha.page import Component, Page, _root_registry, match_url
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support import expected_conditions as ec
+
+from .fake_driver import FakeDriver
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), 'results')
+BENCHMARKS = []
+
+
+def benchmark(func):
+    """Add a benchmark function to the suite"""
+    BENCHMARKS.append(func)
+    return func
+
+
+class BenchPage(Page):
+    scope = 'benchmarks'
+    url = 'http://benchmarks.keteparaha/'
+
+
+class BenchRow(Component):
+    scope = BenchPage
+    selector = 'tr'
+
+
+def _page(driver):
+    page = BenchPage(driver)
+    driver.reset()
+    return page
+
+
+@benchmark
+def click(driver, options):
+    _page(driver).click('.btn')
+
+
+@benchmark
+def get_components(driver, options):
+    for row in _page(driver).get_components(BenchRow):
+        row.text
+
+
+@benchmark
+def click_button(driver, options):
+    _page(driver).click_button('button {0}'.format(options.elements - 1))
+
+
+@benchmark
+def enter_text(driver, options):
+    _page(driver).enter_text('input[name=email]', 'test@example.com')
+
+
+@benchmark
+def nested_component_text(driver, options):
+    table = _page(driver).get_component('#orders')
+    table.get_component('tbody').get_component('tr.selected').text
+
+
+@benchmark
+def match_url_many_pages(driver, options):
+    registry = _root_registry.scope('benchmarks.match_url')
+    for idx in range(options.pages):
+        type(str('Page{0}'.format(idx)), (Page,), {
+            'scope': 'benchmarks.match_url',
+            'url': 'http://benchmarks.keteparaha/section/{0}/'.format(idx),
+        })
+    try:
+        driver.reset()
+        location = 'http://benchmarks.keteparaha/section/{0}/?q=1'.format(
+            options.pages - 1)
+        for _ in range(10):
+            match_url(location, registry.urls())
+    finally:
+        registry.remove()
+
+
+@benchmark
+def select_option(driver, options):
+    _page(driver).select_option(
+        'select[name=country]', 'option {0}'.format(options.elements - 1))
+
+
+@benchmark
+def wait_for_condition(driver, options):
+    page = _page(driver)
+    driver.missing = {'.late'}
+    driver.appear_after = 2
+    try:
+        _wait_for_condition(
+            ec.presence_of_element_located((By.CSS_SELECTOR, '.late')),
+            page
+        )
+    finally:
+        driver.missing = set()
+        driver.appear_after = None
+
+
+def run(options):
+    """Run every benchmark and return a dict of results keyed by name"""
+    results = {}
+    for func in BENCHMARKS:
+        times = []
+        for _ in range(options.repeat):
+            driver = FakeDriver(
+                elements=options.elements, latency=options.latency)
+            start = time.time()
+            func(driver, options)
+            times.append(time.time() - start)
+        results[func.__name__] = {
+            'commands': driver.commands,
+            'seconds': min(times),
+        }
+    return results
+
+
+def compare(results, stored, tolerance, noise=0.005):
+    """Return a list of descriptions of the regressions in results
+
+    Slow downs of less than noise seconds are ignored.
+    """
+    regressions = []
+    for name, result in sorted(results.items()):
+        if name not in stored:
+            continue
+        before = stored[name]
+        if result['commands'] > before['commands']:
+            regressions.append('{0}: {1} commands, was {2}'.format(
+                name, result['commands'], before['commands']))
+        slower = result['seconds'] - before['seconds']
+        if slower > max(before['seconds'] * tolerance, noise):
+            regressions.append('{0}: {1:.4f}s, was {2:.4f}s'.format(
+                name, result['seconds'], before['seconds']))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--elements', type=int, default=200,
+                        help='elements matched by multi element searches')
+    parser.add_argument('--pages', type=int, default=500,
+                        help='pages registered for match_url')
+    parser.add_argument('--latency', type=float, default=0.0005,
+                        help='seconds each WebDriver command takes')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--save', metavar='NAME',
+                        help='store the results in benchmarks/results')
+    parser.add_argument('--compare', metavar='NAME',
+                        help='compare against stored results')
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='allowed fractional slow down before failing')
+    options = parser.parse_args(argv)
+
+    results = run(options)
+    for name, result in sorted(results.items()):
+        print('{0:<24} {1:>8} commands {2:>10.4f}s'.format(
+            name, result['commands'], result['seconds']))
+
+    if options.save:
+        if not os.path.exists(RESULTS_DIR):
+            os.makedirs(RESULTS_DIR)
+        with open(os.path.join(RESULTS_DIR, options.save + '.json'), 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+
+    if options.compare:
+        with open(os.path.join(RESULTS_DIR, options.compare + '.json')) as f:
+            regressions = compare(results, json.load(f), options.tolerance)
+        for regression in regressions:
+            print('REGRESSION', regression)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
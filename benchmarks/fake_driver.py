@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+"""A deterministic WebDriver that talks to no browser
+
+Every WebDriver command goes through FakeDriver.execute, where it is counted,
+delayed by the configured latency, and answered from a fake DOM. The DOM has
+a fixed number of elements for every selector, so the commands issued by a
+keteparaha action depend only on keteparaha and the DOM size.
+
+Example:
+    driver = FakeDriver(elements=500, latency=0.001)
+    page = SomePage(driver)
+    page.click('.btn')
+    print(driver.commands)
+
+"""
+from collections import Counter
+import time
+
+from selenium.common.exceptions import NoSuchElementException
+from selenium.webdriver.remote.command import Command
+from selenium.webdriver.remote.webdriver import WebDriver
+
+from keteparaha.page import SELECTOR_CHAIN_SCRIPT
+
+
+class FakeDriver(WebDriver):
+    """WebDriver answering commands from a fake DOM of identical elements
+
+    elements -- the number of elements found by any multiple element search
+    latency -- the seconds each command takes, simulating the round trip
+    missing -- selectors that match nothing
+    appear_after -- the number of commands after which missing elements are
+        found after all
+    """
+
+    capabilities = {'javascriptEnabled': True}
+
+    def __init__(self, elements=100, latency=0, missing=(),
+                 appear_after=None):
+        self.elements = elements
+        self.latency = latency
+        self.missing = set(missing)
+        self.appear_after = appear_after
+        self.current_url_value = ''
+        self.session_id = 'fake-session'
+        self.w3c = False
+        self._is_remote = False
+        self.reset()
+
+    def reset(self):
+        """Forget the commands issued and any text typed into elements"""
+        self.commands = 0
+        self.command_counts = Counter()
+        self.values = {}
+
+    def _is_missing(self, selector):
+        if selector not in self.missing:
+            return False
+        return self.appear_after is None or self.commands <= self.appear_after
+
+    def _element(self, element_id):
+        return {'ELEMENT': element_id}
+
+    def _find(self, params):
+        if self._is_missing(params['value']):
+            raise NoSuchElementException(
+                'No element "{0}"'.format(params['value']))
+        return self._element('{0}-0'.format(params['value']))
+
+    def _find_all(self, params):
+        if self._is_missing(params['value']):
+            return []
+        return [
+            self._element('{0}-{1}'.format(params['value'], idx))
+            for idx in range(self.elements)
+        ]
+
+    def _text(self, element_id):
+        if element_id in self.values:
+            return self.values[element_id]
+        selector, _, idx = element_id.rpartition('-')
+        return '{0} {1}'.format(selector, idx)
+
+    def _send_keys(self, params):
+        element_id = params['id']
+        self.values[element_id] = (
+            self.values.get(element_id, '') + ''.join(params['value']))
+
+    def _execute_script(self, params):
+        if params['script'] != SELECTOR_CHAIN_SCRIPT:
+            return None
+        selector, idx = params['args'][0][-1]
+        if any(self._is_missing(sel) for sel, _ in params['args'][0]):
+            return None
+        return self._element('{0}-{1}'.format(selector, idx or 0))
+
+    def execute(self, driver_command, params=None):
+        """Count the command, wait for the latency and answer it"""
+        params = params or {}
+        self.commands += 1
+        self.command_counts[driver_command] += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+        handlers = {
+            Command.GET: lambda: setattr(
+                self, 'current_url_value', params['url']),
+            Command.GET_CURRENT_URL: lambda: self.current_url_value,
+            Command.FIND_ELEMENT: lambda: self._find(params),
+            Command.FIND_CHILD_ELEMENT: lambda: self._find(params),
+            Command.FIND_ELEMENTS: lambda: self._find_all(params),
+            Command.FIND_CHILD_ELEMENTS: lambda: self._find_all(params),
+            Command.GET_ELEMENT_TEXT: lambda: self._text(params['id']),
+            Command.GET_ELEMENT_ATTRIBUTE: lambda: self.values.get(
+                params['id']),
+            Command.GET_ELEMENT_TAG_NAME: lambda: 'div',
+            Command.IS_ELEMENT_ENABLED: lambda: True,
+            Command.IS_ELEMENT_DISPLAYED: lambda: True,
+            Command.CLICK_ELEMENT: lambda: None,
+            Command.CLEAR_ELEMENT: lambda: self.values.pop(params['id'], None),
+            Command.SEND_KEYS_TO_ELEMENT: lambda: self._send_keys(params),
+            Command.EXECUTE_SCRIPT: lambda: self._execute_script(params),
+            Command.GET_WINDOW_SIZE: lambda: {'width': 1300, 'height': 1080},
+        }
+        value = handlers.get(driver_command, lambda: None)()
+        return {'status': 0, 'value': self._unwrap_value(value)}
+
+    def quit(self):
+        pass
+
+    close = quit
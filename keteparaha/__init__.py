@@ -75,22 +75,63 @@ repository for more details. Copyright 2015 by Hansel Dunlop.
 
 """
 
-from .email_client import GmailImapClient
-from .page import Component, Page
-from .browser import (
-    BrowserTestCase,
-    HeadlessBrowserTestCase,
-    snapshot_on_error
-)
-from .flow import ignore, retry
+import importlib
+import sys
+
+_EXPORTS = {
+    'BrowserErrors': 'browser',
+    'BrowserTestCase': 'browser',
+    'Component': 'page',
+    'GmailImapClient': 'email_client',
+    'GroupingLoader': 'scheduling',
+    'HeadlessBrowserTestCase': 'browser',
+    'HtmlDriver': 'html_driver',
+    'ignore': 'flow',
+    'Page': 'page',
+    'ReplayDriver': 'replay',
+    'retry': 'flow',
+    'snapshot_on_error': 'browser',
+    'starts_on': 'scheduling',
+}
 
 __all__ = [
+    'BrowserErrors',
     'BrowserTestCase',
     'Component',
     'GmailImapClient',
+    'GroupingLoader',
     'HeadlessBrowserTestCase',
+    'HtmlDriver',
     'ignore',
     'Page',
+    'ReplayDriver',
     'retry',
-    'snapshot_on_error'
+    'snapshot_on_error',
+    'starts_on'
 ]
+
+
+def __getattr__(name):
+    """Import the module a name comes from the first time it is used
+
+    Importing keteparaha doesn't import Selenium or IMAPClient until they are
+    needed, which adds up when many test processes import it.
+    """
+    try:
+        module = _EXPORTS[name]
+    except KeyError:
+        raise AttributeError(
+            'module {0!r} has no attribute {1!r}'.format(__name__, name))
+    value = getattr(importlib.import_module('.' + module, __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
+
+
+if sys.version_info < (3, 7):
+    # Modules can only define __getattr__ from Python 3.7
+    for _name in __all__:
+        __getattr__(_name)
@@ -0,0 +1,223 @@
+# -*- coding: utf-8 -*-
+"""Sequences of mouse and keyboard actions performed in one go
+
+Hover menus, drag and drop and keyboard shortcuts need several actions in a
+row. An ActionSequence collects them, finds every element they target before
+starting, and then performs the whole sequence. Browsers speaking the W3C
+protocol get it in a single actions request, older ones a chain of commands
+without any element lookups in between.
+
+Targets are CSS selectors, components or WebElements, or nothing to target
+the page or component the sequence was started from.
+
+Example:
+    page.actions().hover('#menu').click('#menu .reports').perform()
+
+    board.actions().drag('.card', '.done').pause(0.5).perform(opens=Done)
+
+"""
+from __future__ import unicode_literals
+from inspect import isclass
+import time
+
+import six
+
+from .flight import recorded
+
+__all__ = ['ActionSequence']
+
+W3C_ACTIONS = 'actions'
+""" (str): The name of the W3C perform actions command"""
+
+W3C_RELEASE_ACTIONS = 'clearActionState'
+""" (str): The name of the W3C release actions command"""
+
+W3C_ELEMENT = 'element-6066-11e4-a52e-4f735466cecf'
+""" (str): The key of element references in the W3C protocol"""
+
+
+class ActionSequence(object):
+    """Mouse and keyboard actions to perform in one go
+
+    Every method but perform adds an action and returns the sequence, so
+    they can be chained. Create them with Page.actions or
+    Component.actions.
+    """
+
+    def __init__(self, component):
+        self.component = component
+        self._actions = []
+
+    def __repr__(self):
+        return 'ActionSequence({0})'.format(
+            ', '.join(action[0] for action in self._actions))
+
+    def __len__(self):
+        return len(self._actions)
+
+    def hover(self, target=None):
+        """Move the mouse over the middle of target"""
+        self._actions.append(('move', target))
+        return self
+
+    def click(self, target=None):
+        """Click target, or where the mouse is if target is None"""
+        if target is not None:
+            self.hover(target)
+        self._actions.append(('click', None))
+        return self
+
+    def double_click(self, target=None):
+        """Double click target, or where the mouse is if target is None"""
+        if target is not None:
+            self.hover(target)
+        self._actions.append(('double_click', None))
+        return self
+
+    def drag(self, source, target):
+        """Drag source and drop it on target"""
+        self._actions.extend([
+            ('move', source), ('press', None),
+            ('move', target), ('release', None),
+        ])
+        return self
+
+    def key_down(self, key):
+        """Press and hold a key, for example Keys.SHIFT"""
+        self._actions.append(('key_down', key))
+        return self
+
+    def key_up(self, key):
+        """Release a key held with key_down"""
+        self._actions.append(('key_up', key))
+        return self
+
+    def send_keys(self, text):
+        """Type text into the element with focus"""
+        self._actions.append(('send_keys', text))
+        return self
+
+    def pause(self, seconds):
+        """Wait before the next action, for example for a menu to open"""
+        self._actions.append(('pause', seconds))
+        return self
+
+    def _elements(self):
+        """The elements targeted, found before any action is performed"""
+        found = {}
+        for name, target in self._actions:
+            if name == 'move' and _key(target) not in found:
+                found[_key(target)] = self._element(target)
+        return found
+
+    def _element(self, target):
+        from selenium.webdriver.remote.webelement import WebElement
+        if target is None:
+            return self.component._element
+        if isinstance(target, WebElement):
+            return target
+        if isinstance(target, six.string_types):
+            return self.component.get_element(target)
+        if isclass(target):
+            target = target(self.component)
+        return target._element
+
+    @property
+    def page(self):
+        return self.component.page
+
+    @recorded
+    def perform(self, opens=None):
+        """Perform the actions, returning what they opened like click does
+        """
+        self._perform()
+        return self.component._opened(opens)
+
+    def _perform(self):
+        elements = self._elements()
+        driver = self.component.page._driver
+        steps = [
+            (name, elements[_key(value)] if name == 'move' else value)
+            for name, value in self._actions
+        ]
+        if getattr(driver, 'w3c', False):
+            _perform_w3c(driver, steps)
+        else:
+            _perform_chain(driver, steps)
+
+
+def _key(target):
+    """Targets are found once each, selectors by their text"""
+    return target if isinstance(target, six.string_types) else id(target)
+
+
+def _perform_w3c(driver, steps):
+    """Send the steps as a single W3C actions request, then release any keys
+    and buttons still held down
+    """
+    pointer, keys = [], []
+
+    def tick(pointer_action, key_action=None):
+        pointer.append(pointer_action or {'type': 'pause', 'duration': 0})
+        keys.append(key_action or {'type': 'pause', 'duration': 0})
+
+    for name, value in steps:
+        if name == 'move':
+            tick({'type': 'pointerMove', 'duration': 0, 'x': 0, 'y': 0,
+                  'origin': {W3C_ELEMENT: value.id, 'ELEMENT': value.id}})
+        elif name in ('click', 'double_click'):
+            for _ in range(2 if name == 'double_click' else 1):
+                tick({'type': 'pointerDown', 'button': 0})
+                tick({'type': 'pointerUp', 'button': 0})
+        elif name == 'press':
+            tick({'type': 'pointerDown', 'button': 0})
+        elif name == 'release':
+            tick({'type': 'pointerUp', 'button': 0})
+        elif name in ('key_down', 'key_up'):
+            tick(None, {'type': 'keyDown' if name == 'key_down' else 'keyUp',
+                        'value': value})
+        elif name == 'send_keys':
+            for char in value:
+                tick(None, {'type': 'keyDown', 'value': char})
+                tick(None, {'type': 'keyUp', 'value': char})
+        elif name == 'pause':
+            duration = int(value * 1000)
+            tick({'type': 'pause', 'duration': duration},
+                 {'type': 'pause', 'duration': duration})
+
+    commands = getattr(
+        getattr(driver, 'command_executor', None), '_commands', None)
+    if commands is not None and W3C_ACTIONS not in commands:
+        commands[W3C_ACTIONS] = ('POST', '/session/$sessionId/actions')
+    if commands is not None and W3C_RELEASE_ACTIONS not in commands:
+        commands[W3C_RELEASE_ACTIONS] = (
+            'DELETE', '/session/$sessionId/actions')
+    try:
+        driver.execute(W3C_ACTIONS, {'actions': [
+            {'type': 'pointer', 'id': 'mouse',
+             'parameters': {'pointerType': 'mouse'}, 'actions': pointer},
+            {'type': 'key', 'id': 'keyboard', 'actions': keys},
+        ]})
+    finally:
+        driver.execute(W3C_RELEASE_ACTIONS)
+
+
+def _perform_chain(driver, steps):
+    """Perform the steps with ActionChains, for JSON wire protocol drivers
+    """
+    from selenium.webdriver.common.action_chains import ActionChains
+    chain = ActionChains(driver)
+    for name, value in steps:
+        if name == 'pause':
+            chain.perform()
+            time.sleep(value)
+            chain = ActionChains(driver)
+        elif name == 'move':
+            chain.move_to_element(value)
+        elif name == 'press':
+            chain.click_and_hold()
+        elif name in ('key_down', 'key_up', 'send_keys'):
+            getattr(chain, name)(value)
+        else:
+            getattr(chain, name)()
+    chain.perform()
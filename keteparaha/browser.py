@@ -13,32 +13,101 @@
     :license: MIT, see LICENSE for more details
 """
 from functools import wraps
+import inspect
+import logging
 import math
+from multiprocessing.pool import ThreadPool
 import os
-from selenium import webdriver
 from six import reraise
 import sys
 import time
 import unittest
 
-# The loggers for these packages spew a lot of garbage by default
-import logging
-for verbose_logger in (
-        "selenium.webdriver.remote.remote_connection", "paramiko.transport",
-        "easyprocess", "pyvirtualdisplay.abstractdisplay",
-        "selenium.webdriver.remote.remote_connection",):
-    logger = logging.getLogger(verbose_logger)
-    logger.setLevel(logging.WARNING)
+# Selenium and the optional subsystems are imported when they are used, so
+# importing a test module doesn't pay for browsers it never starts
+from .scheduling import _start_state, browser_pool, start_state
+
+VERBOSE_LOGGERS = (
+    "selenium.webdriver.remote.remote_connection", "paramiko.transport",
+    "easyprocess", "pyvirtualdisplay.abstractdisplay",
+)
+""" (tuple): Loggers that spew a lot of garbage by default, only their
+    warnings are logged while tests run
+"""
 
 FRAME_SIZE = (1300, 1080)
 
+RECORD_ENV = 'KETEPARAHA_RECORD'
+""" (str): Environment variable with a directory to record browsers to"""
+
+GRID_ENV = 'KETEPARAHA_GRID'
+""" (str): Environment variable with the url of the Selenium grid that
+    "Remote" browsers are started on
+"""
+
+
+class BrowserErrors(Exception):
+    """Raised when an action failed in more than one browser
+
+    errors is a list of (browser index, exception) pairs and results holds
+    the result, or None, of the action in each browser.
+    """
+
+    def __init__(self, errors, results):
+        self.errors = errors
+        self.results = results
+        super(BrowserErrors, self).__init__(
+            'Failed in {0} browsers:\n{1}'.format(len(errors), '\n'.join(
+                'browser {0}: {1!r}'.format(idx, exc) for idx, exc in errors
+            ))
+        )
+
+
+def _in_parallel(func, items):
+    """Call func with each item in a thread, returns (result, exc_info) pairs
+
+    exc_info is None unless the call raised an exception.
+    """
+    def call(item):
+        try:
+            return func(item), None
+        except BaseException:
+            return None, sys.exc_info()
+
+    items = list(items)
+    if len(items) < 2:
+        return [call(item) for item in items]
+    pool = ThreadPool(len(items))
+    try:
+        return pool.map(call, items)
+    finally:
+        pool.close()
+        pool.join()
+
+
+def _snapshot_browser(browser, path):
+    """Save screenshots of each window height of the browser's page"""
+    try:
+        body = browser.find_element_by_tag_name('body')
+        body_height = body.size['height']
+        window_height = browser.get_window_size()['height']
+        pages = int(math.ceil(float(body_height) / window_height))
+    except BaseException:
+        pages = 0
+
+    for i in range(pages):
+        browser.execute_script(
+            'window.scrollTo(0,%s)' % (i*window_height))
+        time.sleep(0.2)
+        browser.get_screenshot_as_file(path % i)
+
 
 def snapshot_on_error(method):
     """A decorator that captures a snapshot of all browsers on error
 
-    By default these are saved in the home directory, to change the
-    snapshot location set SNAPSHOT_PATH on the test case. The snapshot
-    directory will be created if possible.
+    The browsers are snapshotted at the same time. By default these are saved
+    in the home directory, to change the snapshot location set SNAPSHOT_PATH
+    on the test case. The snapshot directory will be created if possible.
     """
     @wraps(method)
     def wrapper(self, *args, **kwargs):
@@ -51,26 +120,15 @@ def snapshot_on_error(method):
         except BaseException:
 
             test_exc_type, test_exc, test_traceback = sys.exc_info()
-            for idx, browser in enumerate(self.browsers):
-                try:
-                    body = browser.find_element_by_tag_name('body')
-                    body_height = body.size['height']
-                    window_height = browser.get_window_size()['height']
-                    pages = int(math.ceil(float(body_height) / window_height))
-                except BaseException:
-                    pages = 0
-
-                for i in range(pages):
-                    browser.execute_script(
-                        'window.scrollTo(0,%s)' % (i*window_height))
-                    time.sleep(0.2)
-                    browser.get_screenshot_as_file(
-                        snapshot_path + "/%s_browser-%s_page-%s.png" % (
-                            self.id(),
-                            idx,
-                            i
-                        )
-                    )
+            test_id = self.id()
+            from .profiler import measure
+            with measure('error_snapshot', test_id):
+                _in_parallel(
+                    lambda args: _snapshot_browser(args[1], (
+                        snapshot_path + "/%s_browser-%s_page-%%s.png" % (
+                            test_id, args[0]))),
+                    enumerate(self.browsers)
+                )
 
         finally:
             if 'test_exc' in locals():
@@ -79,11 +137,137 @@ def snapshot_on_error(method):
     return wrapper
 
 
+_session_cache = None
+
+
+def _quiet_loggers():
+    """Only log warnings from VERBOSE_LOGGERS"""
+    for name in VERBOSE_LOGGERS:
+        logging.getLogger(name).setLevel(logging.WARNING)
+
+
+class _FailureWatch(object):
+    """A test result calling on_failure the first time an error or failure
+    is added to it
+
+    Errors in on_failure are logged, they never hide the test's own.
+    """
+
+    def __init__(self, result, on_failure):
+        self._result = result
+        self._on_failure = on_failure
+        self._failed = False
+
+    def __getattr__(self, name):
+        value = getattr(self._result, name)
+        if name == 'addSubTest':
+            def add_sub_test(test, subtest, err):
+                value(test, subtest, err)
+                if err is not None:
+                    self._failure()
+            return add_sub_test
+        return value
+
+    def _failure(self):
+        if self._failed:
+            return
+        self._failed = True
+        try:
+            self._on_failure()
+        except Exception:
+            logging.getLogger(__name__).exception(
+                'Could not write the flight recording')
+
+    def addError(self, test, err):
+        self._result.addError(test, err)
+        self._failure()
+
+    def addFailure(self, test, err):
+        self._result.addFailure(test, err)
+        self._failure()
+
+
+def _configured_driver(name, driver, **settings):
+    """Return a function starting the driver with its cached profile and
+    options
+
+    settings are passed on to driver_options.
+    """
+    from .profiles import driver_options
+
+    def start(headless=False, size=None):
+        return driver(**driver_options(
+            name, driver, headless=headless, size=size, **settings))
+    return start
+
+
 class BrowserTestCase(unittest.TestCase):
     """Browser test case that can be used with Selenium Webdriver to
     functionally test a website
+
+    Set app to a WSGI or ASGI application and start the "HtmlDriver" to test
+    server rendered pages in process, without a browser or a server:
+
+        class HomePageTest(BrowserTestCase):
+            app = my_wsgi_app
+
+            def test_home_page(self):
+                Home(self.start_browser(driver="HtmlDriver"))
+
+    Other browsers get a live server running a WSGI app, started once per
+    process and shared by all tests. Pages with urls starting with base_url
+    are rewritten to use the live server instead.
+
+    Firefox and Chrome start with a profile that has updates, telemetry and
+    first run pages turned off. Set load_images to False to stop them
+    loading images too, and blocked_urls to shell style url patterns they
+    should not load at all:
+
+        blocked_urls = ('*.google-analytics.com', '*fonts.googleapis.com*')
+
+    page_load_strategy sets how long these browsers wait for pages to load
+    after following links, "normal", "eager" or "none".
+
+    Set record_to, or KETEPARAHA_RECORD, to a directory to record the
+    commands each browser executes, for replaying with a ReplayDriver.
+
+    assert_visually_matches compares screenshots with baseline images kept
+    in visual_baselines, or KETEPARAHA_BASELINES.
+
+    The "Remote" driver starts browsers on the Selenium grid at remote_url,
+    or KETEPARAHA_GRID, with remote_capabilities, Firefox by default. Their
+    commands are sent over keep-alive connections shared by every browser in
+    the process, see keteparaha.grid. Set compress_commands to gzip large
+    commands.
+
+    start_page starts a browser on the page and as the user the test starts
+    from, see keteparaha.scheduling. Test cases with tests starting as a
+    user must have a log_in(browser, user) method, for example calling
+    restore_session(user, login, browser). Set
+    reuse_browsers to hand the browser on to the next test starting from the
+    same state instead of closing it.
+
+    Set flight_log, or KETEPARAHA_FLIGHT, to a directory to keep the last
+    actions of each test, and flight_screenshots screenshots, and write
+    them there when the test fails. See keteparaha.flight.
     """
 
+    app = None
+    base_url = None
+    load_images = True
+    blocked_urls = ()
+    page_load_strategy = None
+    session_cache = None
+    record_to = None
+    visual_baselines = None
+    reuse_browsers = False
+    browser_pool = None
+    remote_url = None
+    remote_capabilities = None
+    compress_commands = False
+    flight_log = None
+    flight_screenshots = 0
+
     def __init__(self, *args, **kwargs):
         self.browsers = list()
         self._driver = None
@@ -93,6 +277,119 @@ class BrowserTestCase(unittest.TestCase):
     def start_browser(self, size=FRAME_SIZE, driver="Firefox"):
         """Start and return a Selenium Webdriver browser instance
         """
+        from .profiler import measure
+        with measure('browser_start', driver):
+            factory = self._driver_factory(driver)
+            return self._add_browser(self._launch(factory, size))
+
+    def start_browsers(self, count, size=FRAME_SIZE, driver="Firefox"):
+        """Start count browsers at the same time and return them in a list
+
+        If any of them fails to start the others are closed again.
+        """
+        from .profiler import measure
+        with measure('browser_start', driver, count=count):
+            factory = self._driver_factory(driver)
+            started = _in_parallel(
+                lambda _: self._launch(factory, size), range(count))
+        failed = [exc_info for _, exc_info in started if exc_info]
+        if failed:
+            for browser, _ in started:
+                if browser is not None:
+                    browser.quit()
+            reraise(*failed[0])
+        return [self._add_browser(browser) for browser, _ in started]
+
+    def start_page(self, size=FRAME_SIZE, driver="Firefox"):
+        """Return the page the test starts on, as the user it starts as
+
+        Without a start page the browser is returned. When reuse_browsers is
+        set a browser left in the same state by an earlier test is used if
+        there is one.
+        """
+        page, user = start_state(self)
+        if not self.reuse_browsers:
+            browser = self.start_browser(size=size, driver=driver)
+            if user is not None:
+                self.log_in(browser, user)
+            return browser if page is None else page(browser)
+        pool = browser_pool if self.browser_pool is None else (
+            self.browser_pool)
+        key = self._pool_key(driver, size, user)
+        browser = pool.acquire(key)
+        if browser is None:
+            from .profiler import measure
+            with measure('browser_start', driver):
+                browser = self._launch(self._driver_factory(driver), size)
+            try:
+                if user is not None:
+                    self.log_in(browser, user)
+            except Exception:
+                browser.quit()
+                raise
+        self._add_browser(browser, close=lambda: pool.release(key, browser))
+        return browser if page is None else page(browser)
+
+    def _pool_key(self, driver, size, user):
+        """The state a reused browser is kept in the pool by"""
+        return (driver, tuple(size), user)
+
+    def log_in(self, browser, user):
+        """Log the browser in as the user the test starts as"""
+        raise NotImplementedError(
+            '{0} starts as {1!r}, but {2} has no log_in method'.format(
+                self.id(), user, type(self).__name__))
+
+    def for_each_browser(self, func, browsers=None):
+        """Call func with each browser, in parallel, and return the results
+
+        The results are in the same order as the browsers. If func raises in
+        one browser the exception is raised as it is, if it raises in several
+        they are raised together as BrowserErrors.
+        """
+        browsers = self.browsers if browsers is None else browsers
+        outcomes = _in_parallel(func, browsers)
+        errors = [
+            (idx, exc_info) for idx, (_, exc_info) in enumerate(outcomes)
+            if exc_info
+        ]
+        if len(errors) == 1:
+            reraise(*errors[0][1])
+        results = [result for result, _ in outcomes]
+        if errors:
+            raise BrowserErrors(
+                [(idx, exc_info[1]) for idx, exc_info in errors], results)
+        return results
+
+    def run(self, result=None):
+        from .flight import FLIGHT_ENV, flight_recorder
+        from .profiler import profiler
+        _quiet_loggers()
+        profiler.start_test(self.id())
+        directory = self.flight_log or os.environ.get(FLIGHT_ENV)
+        if directory and result is not None:
+            flight_recorder.start_test(
+                self.id(), screenshots=self.flight_screenshots)
+            result = _FailureWatch(
+                result, lambda: flight_recorder.dump(directory))
+        try:
+            return super(BrowserTestCase, self).run(result)
+        finally:
+            profiler.stop_test()
+            if directory:
+                flight_recorder.stop_test()
+
+    def _driver_factory(self, driver):
+        """Return the callable that creates the named driver"""
+        if driver == "HtmlDriver":
+            return self._html_driver
+        if driver == "Remote":
+            if self._app() is not None:
+                self.start_live_server()
+            return self._remote_driver
+        from selenium import webdriver
+        from .profiles import DRIVERS
+        name = driver
         try:
             driver = getattr(webdriver, driver)
         except AttributeError:
@@ -103,16 +400,106 @@ class BrowserTestCase(unittest.TestCase):
                     'ChromeOptions', 'TouchActions',
                     'DesiredCapabilities'
                 ]
-            ]
+            ] + ["HtmlDriver"]
             raise ValueError(
                 "No such driver. Choose from: %s" % (
                     ", ".join(supported_drivers),))
+        if self._app() is not None:
+            self.start_live_server()
+        if name in DRIVERS:
+            return _configured_driver(
+                name, driver, images=self.load_images,
+                blocked=self.blocked_urls,
+                page_load_strategy=self.page_load_strategy)
+        return driver
+
+    def _launch(self, driver, size):
+        browser = driver()
+        browser.set_window_size(*size)
+        return browser
+
+    def _add_browser(self, browser, close=None):
+        self._driver = browser
+        self.browsers.append(browser)
+        self.addCleanup(close or browser.close)
+        directory = self.record_to or os.environ.get(RECORD_ENV)
+        if directory:
+            if not os.path.isdir(directory):
+                os.makedirs(directory)
+            from .replay import Recorder
+            recorder = Recorder(browser, os.path.join(
+                directory, '{0}-{1}.jsonl.gz'.format(
+                    self.id(), len(self.browsers) - 1))).start()
+            self.addCleanup(recorder.stop)
+        return browser
+
+    def _app(self):
+        app = getattr(type(self), "app", None)
+        if inspect.ismethod(app) and app.__self__ is None:
+            # A function assigned in the class body is unbound on Python 2
+            app = app.__func__
+        return app
+
+    def _remote_driver(self):
+        """A Remote driver sending commands over pooled connections"""
+        url = self.remote_url or os.environ.get(GRID_ENV)
+        if not url:
+            raise ValueError(
+                'Set remote_url, or {0}, to the url of a Selenium grid'.format(
+                    GRID_ENV))
+        from selenium import webdriver
+        from .grid import PooledConnection
+        return webdriver.Remote(
+            command_executor=PooledConnection(
+                url, compress=self.compress_commands),
+            desired_capabilities=dict(
+                self.remote_capabilities
+                or webdriver.DesiredCapabilities.FIREFOX))
+
+    def _html_driver(self):
+        """An HtmlDriver that loads pages from the test case's app"""
+        from .html_driver import HtmlDriver
+        return HtmlDriver(app=self._app())
+
+    def start_live_server(self):
+        """Return the live server running app, rebasing pages onto it
+
+        The server is only started once per process, later calls return the
+        running server.
+        """
+        from .server import live_server, rebase_pages
+        server = live_server(self._app())
+        if self.base_url:
+            rebase_pages(self.base_url, server.url)
+        return server
+
+    def restore_session(self, key, login, browser=None):
+        """Restore the browser session saved under key, e.g. a username
 
-        self._driver = driver()
-        self._driver.set_window_size(*size)
-        self.browsers.append(self._driver)
-        self.addCleanup(self._driver.close)
-        return self._driver
+        If there isn't one login(browser) is called and the session it
+        creates is saved for later tests. Sessions are kept in
+        session_cache, which defaults to one shared by all test cases.
+        """
+        global _session_cache
+        cache = self.session_cache
+        if cache is None:
+            if _session_cache is None:
+                from .session import SessionCache
+                _session_cache = SessionCache()
+            cache = _session_cache
+        return cache.restore(key, browser or self.browser, login)
+
+    def assert_visually_matches(self, baseline, target=None, **options):
+        """Assert a screenshot matches the baseline image
+
+        target is a page, component or browser, by default the last browser
+        started. Baselines are kept in visual_baselines, see
+        keteparaha.visual.
+        """
+        from .visual import assert_visually_matches
+        options.setdefault('directory', self.visual_baselines)
+        return assert_visually_matches(
+            self.browser if target is None else target, baseline, **options)
 
     @property
     def browser(self):
@@ -128,25 +515,101 @@ class BrowserTestCase(unittest.TestCase):
         return hasattr(self, "_display")
 
 
+NATIVE_HEADLESS = ('Chrome', 'Firefox')
+""" (tuple): Drivers that can run headless without Xvfb"""
+
+NO_DISPLAY = ('HtmlDriver', 'PhantomJS', 'Remote')
+""" (tuple): Drivers that never need a display"""
+
+
+class _HeadlessDriver(object):
+    """A driver and how it is run headless"""
+
+    def __init__(self, name, driver, mode):
+        self.name = name
+        self.driver = driver
+        self.mode = mode
+
+
 class HeadlessBrowserTestCase(BrowserTestCase):
     """Seleniun Webdiver test case for headless environemnts
 
-    Browser test case that will start a virtual display to run the
-    Webdriver browser in before running test cases
+    Firefox and Chrome are run in their own headless mode. Other browsers are
+    run in a virtual display, as are all browsers if native_headless is set
+    to False.
+
+    startup_times holds a (driver, mode, seconds) tuple for each browser
+    started, where mode is "native", "xvfb" or "none". Browsers run in xvfb
+    can't be kept for reuse_browsers.
     """
 
+    native_headless = True
+
+    def __init__(self, *args, **kwargs):
+        self.startup_times = []
+        super(HeadlessBrowserTestCase, self).__init__(*args, **kwargs)
+
     def start_browser(self, size=FRAME_SIZE, driver="Firefox", **kwargs):
-        """Start xvfb headless display and a browser inside it
+        """Start a headless browser
 
-        Extra keyword args are passed directly to the XvFB interface
+        Extra keyword args are passed directly to the XvFB interface, if the
+        browser needs one
 
         """
+        self._display_options = dict(kwargs, size=size)
+        return super(
+            HeadlessBrowserTestCase, self).start_browser(
+                size=size, driver=driver)
+
+    def start_browsers(self, count, size=FRAME_SIZE, driver="Firefox",
+                       **kwargs):
+        self._display_options = dict(kwargs, size=size)
+        return super(HeadlessBrowserTestCase, self).start_browsers(
+            count, size=size, driver=driver)
+
+    def headless_mode(self, driver):
+        """How the named driver is run headless"""
+        if driver in NO_DISPLAY:
+            return 'none'
+        if self.native_headless and driver in NATIVE_HEADLESS:
+            return 'native'
+        return 'xvfb'
+
+    def start_display(self, size=FRAME_SIZE, **kwargs):
+        """Start the xvfb virtual display, if it isn't running already"""
         if not getattr(self, "_display"):
             from pyvirtualdisplay import Display
             self._display = Display(visible=0, size=size, **kwargs)
             self._display.start()
+            self.addCleanup(self._display.stop)
+        return self._display
 
-        self.addCleanup(self._display.stop)
-        return super(
-            HeadlessBrowserTestCase, self).start_browser(
-                size=size, driver=driver)
+    def _driver_factory(self, driver):
+        mode = self.headless_mode(driver)
+        factory = super(HeadlessBrowserTestCase, self)._driver_factory(driver)
+        if mode == 'xvfb':
+            self.start_display(**getattr(self, '_display_options', {}))
+        return _HeadlessDriver(driver, factory, mode)
+
+    def _pool_key(self, driver, size, user):
+        mode = self.headless_mode(driver)
+        if mode == 'xvfb':
+            # The display is stopped when the test ends, before the pool
+            # hands its browsers on
+            raise ValueError(
+                "{0} browsers run in a virtual display, which can't be kept "
+                "between tests for reuse_browsers".format(driver))
+        return super(HeadlessBrowserTestCase, self)._pool_key(
+            driver, size, user) + (mode,)
+
+    def _launch(self, driver, size):
+        start = time.time()
+        if driver.mode == 'native':
+            # The size is set by the options, no need to resize the window
+            browser = driver.driver(headless=True, size=size)
+        else:
+            browser = super(HeadlessBrowserTestCase, self)._launch(
+                driver.driver, size)
+        self.startup_times.append(
+            (driver.name, driver.mode, time.time() - start))
+        return browser
@@ -0,0 +1,432 @@
+# -*- coding: utf-8 -*-
+"""A small document tree with CSS selector queries
+
+Used by the HtmlDriver to run page objects without a browser. Documents are
+parsed with the standard library HTML parser into a tree of Nodes that can be
+queried with the common subset of CSS selectors that page objects use: type,
+universal, id, class and attribute selectors, the descendant, child and
+sibling combinators, selector groups, and the structural pseudo classes.
+
+Example:
+    document = parse_html('<ul><li class="a">One</li><li>Two</li></ul>')
+    document.select_one('li.a').text  # u'One'
+    [li.text for li in document.select('ul > li:last-child')]  # [u'Two']
+
+"""
+from __future__ import unicode_literals
+import re
+
+import six
+from six.moves.html_entities import name2codepoint
+from six.moves.html_parser import HTMLParser
+
+__all__ = ['Node', 'SelectorError', 'parse_html']
+
+VOID_ELEMENTS = frozenset([
+    'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'keygen',
+    'link', 'meta', 'param', 'source', 'track', 'wbr'
+])
+""" (frozenset): Elements that never have children or an end tag"""
+
+BLOCK_ELEMENTS = frozenset([
+    'address', 'article', 'aside', 'blockquote', 'dd', 'div', 'dl', 'dt',
+    'fieldset', 'figure', 'footer', 'form', 'h1', 'h2', 'h3', 'h4', 'h5',
+    'h6', 'header', 'hr', 'li', 'main', 'nav', 'ol', 'p', 'pre', 'section',
+    'table', 'tr', 'ul'
+])
+""" (frozenset): Elements whose text is put on lines of its own"""
+
+HIDDEN_ELEMENTS = frozenset([
+    'head', 'link', 'meta', 'noscript', 'script', 'style', 'template',
+    'title'
+])
+""" (frozenset): Elements that are never rendered"""
+
+# Starting one of these elements closes any open elements in the set
+_IMPLIED_END = {
+    'li': frozenset(['li']),
+    'option': frozenset(['option']),
+    'tr': frozenset(['tr', 'td', 'th']),
+    'td': frozenset(['td', 'th']),
+    'th': frozenset(['td', 'th']),
+    'dt': frozenset(['dt', 'dd']),
+    'dd': frozenset(['dt', 'dd']),
+}
+
+
+class SelectorError(ValueError):
+    """Raised for CSS selectors that are invalid or not supported"""
+
+
+class Node(object):
+    """An element in a parsed document
+
+    children holds Nodes and text strings in document order. The document
+    itself is a Node with a tag of None.
+    """
+
+    def __init__(self, tag, attrs=None, parent=None):
+        self.tag = tag
+        self.attrs = dict(attrs or {})
+        self.parent = parent
+        self.children = []
+
+    def __repr__(self):
+        return '<Node {0}{1}>'.format(
+            self.tag or '#document',
+            ''.join(' {0}="{1}"'.format(k, v) for k, v in sorted(
+                self.attrs.items()))
+        )
+
+    @property
+    def elements(self):
+        """The child elements, without text"""
+        return [child for child in self.children if isinstance(child, Node)]
+
+    @property
+    def classes(self):
+        return self.attrs.get('class', '').split()
+
+    @property
+    def root(self):
+        node = self
+        while node.parent is not None:
+            node = node.parent
+        return node
+
+    def ancestors(self):
+        """Yield the parent elements of this node, nearest first"""
+        node = self.parent
+        while node is not None and node.tag is not None:
+            yield node
+            node = node.parent
+
+    def iter(self):
+        """Yield every element below this node in document order"""
+        stack = list(reversed(self.elements))
+        while stack:
+            node = stack.pop()
+            yield node
+            stack.extend(reversed(node.elements))
+
+    @property
+    def hidden(self):
+        """Whether this element hides itself and its children"""
+        style = re.sub(r'\s+', '', self.attrs.get('style', '')).lower()
+        return (
+            self.tag in HIDDEN_ELEMENTS
+            or 'hidden' in self.attrs
+            or 'display:none' in style
+            or 'visibility:hidden' in style
+            or (self.tag == 'input'
+                and self.attrs.get('type', '').lower() == 'hidden')
+        )
+
+    @property
+    def displayed(self):
+        """Whether neither the element nor one of its parents is hidden"""
+        if self.tag is None:
+            return True
+        return not self.hidden and not any(
+            node.hidden for node in self.ancestors())
+
+    @property
+    def text(self):
+        """The rendered text of the element, with whitespace collapsed"""
+        chunks = []
+        self._collect_text(chunks)
+        lines = (
+            re.sub(r'\s+', ' ', line).strip()
+            for line in ''.join(chunks).split('\n')
+        )
+        return '\n'.join(line for line in lines if line)
+
+    def _collect_text(self, chunks):
+        if self.tag == 'br':
+            chunks.append('\n')
+            return
+        separator = '\n' if self.tag in BLOCK_ELEMENTS else (
+            ' ' if self.tag in ('td', 'th') else '')
+        chunks.append(separator)
+        for child in self.children:
+            if isinstance(child, Node):
+                if not child.hidden:
+                    child._collect_text(chunks)
+            else:
+                chunks.append(re.sub(r'\s+', ' ', child))
+        chunks.append(separator)
+
+    def matches(self, selector):
+        """Whether this element is matched by the CSS selector"""
+        return any(
+            _matches(self, parts, len(parts) - 1)
+            for parts in _parse_selector(selector))
+
+    def select(self, selector):
+        """Return the elements below this node matched by the CSS selector
+        """
+        groups = _parse_selector(selector)
+        return [
+            node for node in self.iter() if any(
+                _matches(node, parts, len(parts) - 1) for parts in groups)
+        ]
+
+    def select_one(self, selector):
+        """Return the first element matched by the selector, or None"""
+        groups = _parse_selector(selector)
+        for node in self.iter():
+            if any(_matches(node, parts, len(parts) - 1)
+                   for parts in groups):
+                return node
+        return None
+
+
+class _TreeBuilder(HTMLParser):
+
+    def __init__(self):
+        HTMLParser.__init__(self)
+        self.convert_charrefs = True
+        self.document = Node(None)
+        self.stack = [self.document]
+
+    @property
+    def current(self):
+        return self.stack[-1]
+
+    def handle_starttag(self, tag, attrs):
+        implied = _IMPLIED_END.get(tag)
+        if implied and self.current.tag in implied:
+            self.stack.pop()
+        if self.current.tag == 'p' and tag in BLOCK_ELEMENTS:
+            self.stack.pop()
+        node = Node(tag, [(k, v if v is not None else '') for k, v in attrs],
+                    parent=self.current)
+        self.current.children.append(node)
+        if tag not in VOID_ELEMENTS:
+            self.stack.append(node)
+
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs)
+        if tag not in VOID_ELEMENTS:
+            self.stack.pop()
+
+    def handle_endtag(self, tag):
+        for idx in range(len(self.stack) - 1, 0, -1):
+            if self.stack[idx].tag == tag:
+                del self.stack[idx:]
+                return
+
+    def handle_data(self, data):
+        self.current.children.append(data)
+
+    def handle_entityref(self, name):
+        if name in name2codepoint:
+            self.handle_data(six.unichr(name2codepoint[name]))
+        else:
+            self.handle_data('&' + name)
+
+    def handle_charref(self, name):
+        if name.lower().startswith('x'):
+            self.handle_data(six.unichr(int(name[1:], 16)))
+        else:
+            self.handle_data(six.unichr(int(name)))
+
+
+def parse_html(markup):
+    """Parse an HTML document, or fragment, into a tree of Nodes"""
+    builder = _TreeBuilder()
+    builder.feed(markup)
+    builder.close()
+    return builder.document
+
+
+_TOKEN = re.compile(r'''
+    (?P<comma>\s*,\s*)
+    | \s*(?P<combinator>[>+~])\s*
+    | (?P<space>\s+)
+    | (?P<tag>\*|[-\w]+)
+    | \#(?P<id>[-\w]+)
+    | \.(?P<cls>[-\w]+)
+    | \[\s*(?P<attr>[-\w:]+)\s*
+        (?:(?P<op>[~^$*|]?=)\s*
+            (?P<value>"[^"]*"|'[^']*'|[^\]\s]+)\s*)?\]
+    | :(?P<pseudo>[-\w]+)(?:\(\s*(?P<arg>[^)]*?)\s*\))?
+''', re.VERBOSE | re.UNICODE)
+
+_selector_cache = {}
+
+
+def _parse_selector(selector):
+    """Parse a selector group into lists of (combinator, tests) pairs"""
+    try:
+        return _selector_cache[selector]
+    except KeyError:
+        pass
+
+    groups, parts, tests = [], [], []
+    combinator = None
+    pos, source = 0, selector.strip()
+    while pos < len(source):
+        match = _TOKEN.match(source, pos)
+        if not match:
+            raise SelectorError('Invalid selector "{0}"'.format(selector))
+        pos = match.end()
+        if match.group('comma') or match.group('combinator') or (
+                match.group('space')):
+            if not tests:
+                raise SelectorError(
+                    'Invalid selector "{0}"'.format(selector))
+            parts.append((combinator, tests))
+            tests = []
+            combinator = match.group('combinator') or ' '
+            if match.group('comma'):
+                groups.append(parts)
+                parts, combinator = [], None
+        else:
+            tests.append(_make_test(match))
+    if not tests:
+        raise SelectorError('Invalid selector "{0}"'.format(selector))
+    parts.append((combinator, tests))
+    groups.append(parts)
+
+    if len(_selector_cache) > 500:
+        _selector_cache.clear()
+    _selector_cache[selector] = groups
+    return groups
+
+
+def _make_test(match):
+    """Return a function that tests a node for one simple selector"""
+    if match.group('tag'):
+        tag = match.group('tag').lower()
+        if tag == '*':
+            return lambda node: True
+        return lambda node: node.tag == tag
+    if match.group('id'):
+        id_ = match.group('id')
+        return lambda node: node.attrs.get('id') == id_
+    if match.group('cls'):
+        cls = match.group('cls')
+        return lambda node: cls in node.classes
+    if match.group('attr'):
+        return _attribute_test(
+            match.group('attr').lower(), match.group('op'),
+            match.group('value'))
+    return _pseudo_test(match.group('pseudo').lower(), match.group('arg'))
+
+
+def _attribute_test(name, op, value):
+    if value and value[0] in '"\'':
+        value = value[1:-1]
+    if op is None:
+        return lambda node: name in node.attrs
+    compare = {
+        '=': lambda attr: attr == value,
+        '~=': lambda attr: value in attr.split(),
+        '^=': lambda attr: bool(value) and attr.startswith(value),
+        '$=': lambda attr: bool(value) and attr.endswith(value),
+        '*=': lambda attr: bool(value) and value in attr,
+        '|=': lambda attr: attr == value or attr.startswith(value + '-'),
+    }[op]
+    return lambda node: name in node.attrs and compare(node.attrs[name])
+
+
+def _nth(arg):
+    """Return a function testing 1 based positions against an+b"""
+    arg = arg.replace(' ', '').lower()
+    if arg == 'odd':
+        arg = '2n+1'
+    elif arg == 'even':
+        arg = '2n'
+    match = re.match(r'^([-+]?\d*)n([-+]\d+)?$|^([-+]?\d+)$', arg)
+    if not match:
+        raise SelectorError('Invalid nth expression "{0}"'.format(arg))
+    if match.group(3) is not None:
+        b = int(match.group(3))
+        return lambda pos: pos == b
+    a = match.group(1)
+    a = -1 if a == '-' else int(a) if a not in ('', '+') else 1
+    b = int(match.group(2) or 0)
+    if a == 0:
+        return lambda pos: pos == b
+    return lambda pos: (pos - b) % a == 0 and (pos - b) // a >= 0
+
+
+def _siblings(node, of_type=False):
+    if node.parent is None:
+        return [node]
+    return [
+        sibling for sibling in node.parent.elements
+        if not of_type or sibling.tag == node.tag
+    ]
+
+
+def _pseudo_test(name, arg):
+    if name in ('first-child', 'last-child', 'only-child', 'first-of-type',
+                'last-of-type', 'only-of-type'):
+        of_type = name.endswith('of-type')
+        position = name.split('-')[0]
+
+        def structural(node):
+            siblings = _siblings(node, of_type)
+            if position == 'first':
+                return siblings[0] is node
+            if position == 'last':
+                return siblings[-1] is node
+            return len(siblings) == 1
+        return structural
+    if name in ('nth-child', 'nth-last-child', 'nth-of-type',
+                'nth-last-of-type'):
+        if arg is None:
+            raise SelectorError(':{0} needs an argument'.format(name))
+        test = _nth(arg)
+        of_type = name.endswith('of-type')
+        last = '-last-' in name
+
+        def nth(node):
+            siblings = _siblings(node, of_type)
+            if last:
+                siblings = siblings[::-1]
+            return test(siblings.index(node) + 1)
+        return nth
+    if name == 'not':
+        if not arg:
+            raise SelectorError(':not needs an argument')
+        groups = _parse_selector(arg)
+        return lambda node: not any(
+            _matches(node, parts, len(parts) - 1) for parts in groups)
+    if name == 'empty':
+        return lambda node: not node.children
+    if name == 'checked':
+        return lambda node: 'checked' in node.attrs or 'selected' in node.attrs
+    if name == 'disabled':
+        return lambda node: 'disabled' in node.attrs
+    if name == 'enabled':
+        return lambda node: 'disabled' not in node.attrs
+    raise SelectorError('Unsupported pseudo class ":{0}"'.format(name))
+
+
+def _previous_elements(node):
+    if node.parent is None:
+        return []
+    siblings = node.parent.elements
+    return siblings[:siblings.index(node)]
+
+
+def _matches(node, parts, idx):
+    """Match node against parts[idx], then its combinator to the left"""
+    combinator, tests = parts[idx]
+    if node.tag is None or not all(test(node) for test in tests):
+        return False
+    if idx == 0:
+        return True
+    if combinator == ' ':
+        return any(_matches(ancestor, parts, idx - 1)
+                   for ancestor in node.ancestors())
+    if combinator == '>':
+        return node.parent is not None and _matches(
+            node.parent, parts, idx - 1)
+    previous = _previous_elements(node)
+    if combinator == '+':
+        return bool(previous) and _matches(previous[-1], parts, idx - 1)
+    return any(_matches(sibling, parts, idx - 1) for sibling in previous)
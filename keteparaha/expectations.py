@@ -1,18 +1,119 @@
 """
     Conditions using Keteparaha components
 """
-from selenium.webdriver.support.wait import WebDriverWait
-from selenium.common.exceptions import StaleElementReferenceException
+from __future__ import unicode_literals
+import time
+
+from selenium.common.exceptions import (
+    StaleElementReferenceException,
+    TimeoutException
+)
+import six
+
+from .profiler import call_site, measure, profiler
+
+
+@six.python_2_unicode_compatible
+class WaitDiagnostics(object):
+    """Describes what a wait was waiting for
+
+    The failure message is only built if the wait times out, so successful
+    waits never pay for it.
+
+    message -- format string, formatted with selector, expected and actual
+    selector -- the selector of the element waited on
+    expected -- what the wait expected to find, e.g. some text
+    actual -- function returning what was found instead, only called after
+        a timeout
+    """
+
+    def __init__(self, message, selector=None, expected=None, actual=None):
+        self.message = message
+        self.selector = selector
+        self.expected = expected
+        self.actual = actual
+        self.condition = None
+        self.timeout = None
+        self.waited = None
+
+    def __repr__(self):
+        return 'WaitDiagnostics({0!r}, selector={1!r})'.format(
+            self.message, self.selector)
+
+    def found(self):
+        """What was found instead of the expected result"""
+        if self.actual is None:
+            return None
+        try:
+            return self.actual()
+        except Exception as exc:
+            return '<unavailable, {0}>'.format(type(exc).__name__)
+
+    def __str__(self):
+        message = self.message.format(
+            selector=self.selector,
+            expected=self.expected,
+            actual=self.found() if '{actual}' in self.message else None
+        )
+        if self.waited is not None:
+            message = '{0} Waited {1:.1f} seconds.'.format(
+                message, self.waited)
+        return message
 
 
 def _wait_for_condition(
     condition, component, message='', driver=None, timeout=10
 ):
-    """Wait until the expected condition is true and return the result"""
+    """Wait until the expected condition is true and return the result
+
+    message can be a WaitDiagnostics, it is only turned into the message of
+    the TimeoutException if the wait times out. The exception's diagnostics
+    attribute is set to it.
+    """
     if not driver:
         driver = component._element
-    return WebDriverWait(
-        driver, timeout).until(condition, message)
+    condition_name = type(condition).__name__
+    checking = []
+    if profiler.current is not None:
+        condition = _timed(condition, checking)
+    start = time.time()
+    selector = getattr(message, 'selector', None)
+    name = condition_name if selector is None else six.text_type(selector)
+    with measure(
+        'wait', name, condition=condition_name, timeout=timeout
+    ) as details:
+        from selenium.webdriver.support.wait import WebDriverWait
+        try:
+            return WebDriverWait(driver, timeout).until(condition)
+        except TimeoutException as exc:
+            details['timed_out'] = True
+            if isinstance(message, WaitDiagnostics):
+                message.condition = condition_name
+                message.timeout = timeout
+                message.waited = time.time() - start
+            error = TimeoutException(
+                six.text_type(message), exc.screen, exc.stacktrace)
+            error.diagnostics = message
+            raise error
+        finally:
+            if profiler.current is not None:
+                details['checking'] = sum(checking)
+                details['checks'] = len(checking)
+                details['call_site'] = call_site()
+                profiler.wait_stats.record(
+                    name, details['call_site'], time.time() - start,
+                    details.get('timed_out', False), len(checking))
+
+
+def _timed(condition, durations):
+    """Wrap condition to add the time each check takes to durations"""
+    def timed_condition(driver):
+        start = time.time()
+        try:
+            return condition(driver)
+        finally:
+            durations.append(time.time() - start)
+    return timed_condition
 
 
 class text_to_be_present_in_component(object):
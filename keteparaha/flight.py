@@ -0,0 +1,256 @@
+# -*- coding: utf-8 -*-
+"""Keeping the last actions of a test, to see what led up to a failure
+
+A snapshot taken after a test fails shows where it ended up, not how it got
+there. While a test runs the flight recorder keeps its last actions in a
+ring buffer: each visit, click, lookup and text entry with its target, the
+page it was done on, when it started, how long it took and any error it
+raised. Recording an action is appending a tuple, nothing is asked of the
+browser, and nothing is written unless the test fails.
+
+Low resolution screenshots can be kept too, at most one a second by
+default. They are taken by a worker thread, between the test's own
+commands, and shrunk there if Pillow is installed.
+
+BrowserTestCase records every test when flight_log, or KETEPARAHA_FLIGHT,
+is set to a directory, and writes the recording of tests that fail to it.
+
+Example:
+    flight_recorder.start_test('test_checkout', screenshots=5)
+    Basket(driver).checkout()
+    ...
+    flight_recorder.dump('/tmp/flights')
+    flight_recorder.stop_test()
+
+"""
+from __future__ import unicode_literals
+from collections import deque
+from functools import wraps
+import io
+import json
+import os
+import threading
+import time
+
+from six.moves import queue
+import six
+
+__all__ = ['FlightRecorder', 'flight_recorder', 'recorded']
+
+FLIGHT_ENV = 'KETEPARAHA_FLIGHT'
+""" (str): Environment variable with a directory to write the flight
+    recordings of failed tests to
+"""
+
+
+def _describe(target):
+    """A short description of what an action was done to"""
+    if target is None or isinstance(target, six.string_types):
+        return target
+    selector = getattr(target, 'selector', None)
+    if isinstance(selector, six.string_types):
+        return selector
+    return repr(target)
+
+
+class _GuardedExecute(object):
+    """Runs a driver's commands one at a time, so screenshots can be taken
+    from another thread
+    """
+
+    def __init__(self, driver):
+        self.driver = driver
+        self.execute = driver.execute
+        self.lock = threading.Lock()
+
+    def __call__(self, driver_command, params=None):
+        with self.lock:
+            return self.execute(driver_command, params)
+
+    def remove(self):
+        if self.driver.__dict__.get('execute') is self:
+            del self.driver.execute
+            if self.driver.execute != self.execute:
+                self.driver.execute = self.execute
+
+
+def _shrink(png, scale):
+    """Scale a PNG screenshot down, if Pillow is there to do it"""
+    try:
+        from PIL import Image
+    except ImportError:
+        return png
+    image = Image.open(io.BytesIO(png))
+    image.thumbnail((max(1, int(image.size[0] * scale)),
+                     max(1, int(image.size[1] * scale))))
+    output = io.BytesIO()
+    image.save(output, format='PNG', optimize=False)
+    return output.getvalue()
+
+
+class _Screenshots(object):
+    """Screenshots taken in the background, the last count of them kept"""
+
+    def __init__(self, count, interval, scale):
+        self.images = deque(maxlen=count)
+        self.interval = interval
+        self.scale = scale
+        self._last = 0
+        self._guards = {}
+        self._queue = queue.Queue(maxsize=1)
+        self._thread = threading.Thread(target=self._work)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def request(self, driver, action):
+        """Ask for a screenshot after action, unless one was taken lately"""
+        now = time.time()
+        if driver is None or now - self._last < self.interval:
+            return
+        if id(driver) not in self._guards:
+            guard = self._guards[id(driver)] = _GuardedExecute(driver)
+            driver.execute = guard
+        try:
+            self._queue.put_nowait((driver, action, now))
+            self._last = now
+        except queue.Full:
+            pass  # Still busy with the last one
+
+    def _work(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            driver, action, taken = item
+            try:
+                png = driver.get_screenshot_as_png()
+                self.images.append((action, taken, _shrink(png, self.scale)))
+            except Exception:
+                pass  # Screenshots are a bonus, never a reason to fail
+
+    def stop(self):
+        self._queue.put(None)
+        self._thread.join(5)
+        for guard in self._guards.values():
+            guard.remove()
+        self._guards.clear()
+
+
+class FlightRecorder(object):
+    """Keeps the last size actions of the running test
+
+    Nothing is recorded between start_test and stop_test.
+    """
+
+    def __init__(self, size=100):
+        self.size = size
+        self.current = None
+        self.test = None
+        self.started = None
+        self.count = 0
+        self.screenshots = None
+
+    def __repr__(self):
+        return 'FlightRecorder({0}, {1} actions)'.format(
+            self.test, len(self.current or ()))
+
+    def start_test(self, test, screenshots=0, interval=1.0, scale=0.25):
+        """Start recording a test
+
+        screenshots -- the number of screenshots to keep, none by default
+        interval -- the least number of seconds between screenshots
+        scale -- the size of the screenshots kept, relative to the window
+        """
+        self.stop_test()
+        self.test = test
+        self.started = time.time()
+        self.count = 0
+        self.current = deque(maxlen=self.size)
+        if screenshots:
+            self.screenshots = _Screenshots(screenshots, interval, scale)
+
+    def stop_test(self):
+        self.current = None
+        if self.screenshots is not None:
+            self.screenshots.stop()
+            self.screenshots = None
+
+    def record(self, component, action, target, start, error=None):
+        """Add an action done to target on component's page"""
+        current = self.current
+        if current is None:
+            return
+        page = component.page
+        self.count += 1
+        current.append((
+            self.count, start, time.time() - start, action, target,
+            type(page).__name__, page.url, error))
+        if self.screenshots is not None:
+            self.screenshots.request(
+                getattr(page, '_driver', None), self.count)
+
+    def actions(self):
+        """The actions recorded, oldest first, as dicts"""
+        return [
+            {'action': action, 'duration': duration, 'error': error,
+             'number': number, 'page': page, 'start': start - self.started,
+             'target': _describe(target), 'url': url}
+            for number, start, duration, action, target, page, url, error
+            in list(self.current or ())
+        ]
+
+    def dump(self, directory):
+        """Write the recording to directory, returning the path of the file
+
+        The actions are written as JSON to <test>-flight.json, and each
+        screenshot to <test>-flight-<action number>.png.
+        """
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        prefix = os.path.join(directory, '{0}-flight'.format(self.test))
+        screenshots = []
+        images = self.screenshots.images if self.screenshots else ()
+        for action, taken, png in list(images):
+            path = '{0}-{1}.png'.format(prefix, action)
+            with open(path, 'wb') as f:
+                f.write(png)
+            screenshots.append({'action': action, 'path': path,
+                                'time': taken - self.started})
+        path = prefix + '.json'
+        with open(path, 'w') as f:
+            json.dump({
+                'test': self.test,
+                'actions': self.actions(),
+                'dropped': self.count - len(self.current or ()),
+                'screenshots': screenshots,
+            }, f, indent=2, sort_keys=True)
+        return path
+
+
+flight_recorder = FlightRecorder()
+""" (FlightRecorder): The recorder that page actions are recorded by"""
+
+
+def recorded(method):
+    """Record calls of a page or component method with flight_recorder
+
+    The action's target is its first argument, or the page or component
+    itself.
+    """
+    name = method.__name__
+
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        if flight_recorder.current is None:
+            return method(self, *args, **kwargs)
+        start = time.time()
+        error = None
+        try:
+            return method(self, *args, **kwargs)
+        except BaseException as exc:
+            error = type(exc).__name__
+            raise
+        finally:
+            flight_recorder.record(
+                self, name, args[0] if args else self, start, error)
+    return wrapper
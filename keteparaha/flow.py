@@ -25,10 +25,11 @@ def retry(func, errors, attempts=5):
     def wrapper(*args, **kwargs):
         """Wrapper func"""
         retries = attempts
-        while retries:
+        while True:
             try:
                 return func(*args, **kwargs)
             except errors:
                 retries -= 1
-        raise
+                if retries <= 0:
+                    raise
     return wrapper
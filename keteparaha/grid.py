@@ -0,0 +1,258 @@
+# -*- coding: utf-8 -*-
+"""A faster transport for WebDriver commands sent to a Selenium grid
+
+Every action on a page is one or more WebDriver commands, each an HTTP
+request to the grid. Selenium's RemoteConnection opens a new connection for
+every command, so connection setup can take longer than the command itself.
+PooledConnection keeps connections to each grid open, in a pool shared by
+every browser session in the process, and can compress large requests.
+It builds on the RemoteConnection of Selenium 3 and earlier, the versions
+keteparaha supports.
+
+The time each command takes, from sending it to reading the response, is
+recorded in command_stats, to see which commands a test suite spends its
+time on.
+
+Example:
+    driver = webdriver.Remote(
+        command_executor=PooledConnection('http://grid:4444/wd/hub'),
+        desired_capabilities=DesiredCapabilities.FIREFOX)
+    ...
+    command_stats.report()
+
+"""
+from __future__ import division, unicode_literals
+import base64
+import gzip
+import io
+import socket
+import threading
+import time
+
+from selenium.webdriver.remote import utils
+from selenium.webdriver.remote.errorhandler import ErrorCode
+from selenium.webdriver.remote.remote_connection import RemoteConnection
+from six.moves import http_client
+from six.moves.urllib.parse import urljoin, urlsplit
+
+__all__ = ['CommandStats', 'ConnectionPool', 'PooledConnection',
+           'command_stats']
+
+
+class CommandStats(object):
+    """The number of times each command was sent and how long they took"""
+
+    def __init__(self):
+        self.commands = {}
+        self._lock = threading.Lock()
+
+    def record(self, command, seconds):
+        with self._lock:
+            stats = self.commands.get(command)
+            if stats is None:
+                stats = self.commands[command] = {
+                    'command': command, 'count': 0, 'total': 0.0, 'max': 0.0}
+            stats['count'] += 1
+            stats['total'] += seconds
+            stats['max'] = max(stats['max'], seconds)
+
+    def report(self):
+        """The stats of each command, the most time consuming first"""
+        with self._lock:
+            commands = [dict(stats) for stats in self.commands.values()]
+        for stats in commands:
+            stats['mean'] = stats['total'] / stats['count']
+        return sorted(commands, key=lambda s: s['total'], reverse=True)
+
+    def clear(self):
+        with self._lock:
+            self.commands.clear()
+
+
+command_stats = CommandStats()
+""" (CommandStats): The stats of every command sent by a PooledConnection"""
+
+
+class ConnectionPool(object):
+    """Open HTTP connections to one server, reused between requests
+
+    maxsize -- the number of idle connections kept, more are opened when
+        needed but closed once used
+    """
+
+    def __init__(self, scheme, host, port, maxsize=8, timeout=None):
+        self.scheme = scheme
+        self.host = host
+        self.port = port
+        self.maxsize = maxsize
+        self.timeout = timeout
+        self.opened = 0
+        self._idle = []
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return 'ConnectionPool({0}://{1}:{2}, {3} idle)'.format(
+            self.scheme, self.host, self.port, len(self._idle))
+
+    def get(self):
+        """Return an idle connection and whether it was used before"""
+        with self._lock:
+            if self._idle:
+                return self._idle.pop(), True
+            self.opened += 1
+        connection_class = (
+            http_client.HTTPSConnection if self.scheme == 'https'
+            else http_client.HTTPConnection)
+        kwargs = {} if self.timeout is None else {'timeout': self.timeout}
+        return connection_class(self.host, self.port, **kwargs), False
+
+    def put(self, connection):
+        with self._lock:
+            if len(self._idle) < self.maxsize:
+                self._idle.append(connection)
+                return
+        connection.close()
+
+    def close(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for connection in idle:
+            connection.close()
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def connection_pool(url, maxsize=8, timeout=None):
+    """The pool shared by every connection to the server at url"""
+    parts = urlsplit(url)
+    port = parts.port or (443 if parts.scheme == 'https' else 80)
+    key = (parts.scheme, parts.hostname, port)
+    with _pools_lock:
+        if key not in _pools:
+            _pools[key] = ConnectionPool(
+                parts.scheme, parts.hostname, port, maxsize, timeout)
+        return _pools[key]
+
+
+def _gzip(data):
+    output = io.BytesIO()
+    with gzip.GzipFile(fileobj=output, mode='wb') as f:
+        f.write(data)
+    return output.getvalue()
+
+
+def _gunzip(data):
+    with gzip.GzipFile(fileobj=io.BytesIO(data)) as f:
+        return f.read()
+
+
+class PooledConnection(RemoteConnection):
+    """A RemoteConnection sending commands over pooled keep-alive connections
+
+    compress -- gzip request bodies of at least compress_min bytes, for
+        grids that accept compressed requests. Uploads and scripts are the
+        commands that benefit
+    """
+
+    def __init__(self, remote_server_addr, compress=False, compress_min=1024,
+                 maxsize=8, resolve_ip=False, stats=None):
+        super(PooledConnection, self).__init__(
+            remote_server_addr, keep_alive=False, resolve_ip=resolve_ip)
+        self.compress = compress
+        self.compress_min = compress_min
+        self.stats = command_stats if stats is None else stats
+        self.pool = connection_pool(
+            self._url, maxsize, self._timeout_or_none())
+
+    def _timeout_or_none(self):
+        timeout = self.get_timeout()
+        return None if timeout is socket._GLOBAL_DEFAULT_TIMEOUT else timeout
+
+    def execute(self, command, params):
+        start = time.time()
+        try:
+            return super(PooledConnection, self).execute(command, params)
+        finally:
+            self.stats.record(command, time.time() - start)
+
+    def _request(self, method, url, body=None):
+        parts = urlsplit(url)
+        path = parts.path + ('?' + parts.query if parts.query else '')
+        headers = {
+            'Accept': 'application/json',
+            'Accept-Encoding': 'gzip',
+            'Connection': 'keep-alive',
+            'Content-Type': 'application/json;charset=UTF-8',
+        }
+        if parts.username:
+            headers['Authorization'] = 'Basic ' + base64.b64encode(
+                '{0}:{1}'.format(parts.username, parts.password or '').encode(
+                    'utf-8')).decode('ascii')
+        data = None
+        if body is not None and method in ('POST', 'PUT'):
+            data = body if isinstance(body, bytes) else body.encode('utf-8')
+            if self.compress and len(data) >= self.compress_min:
+                data = _gzip(data)
+                headers['Content-Encoding'] = 'gzip'
+
+        # Redirects may be to another server, with a pool of its own
+        pool = connection_pool(url, self.pool.maxsize, self.pool.timeout)
+        # httplib joins the request line, headers and body into one string,
+        # on Python 2 unicode in any of them breaks binary bodies
+        status, response_headers, content = self._send(
+            pool, str(method), str(path), data,
+            dict((str(name), str(value)) for name, value in headers.items()))
+        if response_headers.get('content-encoding') == 'gzip':
+            content = _gunzip(content)
+        return self._response(url, status, response_headers, content)
+
+    def _send(self, pool, method, path, data, headers):
+        """Send a request, retrying if a reused connection was closed
+
+        The grid closes connections that were idle for too long, that is
+        only found out when they are used again. Timeouts are not retried,
+        the grid may have run the command.
+        """
+        while True:
+            connection, reused = pool.get()
+            try:
+                connection.request(method, path, data, headers)
+                response = connection.getresponse()
+                content = response.read()
+            except (http_client.HTTPException, socket.error) as exc:
+                connection.close()
+                if reused and not isinstance(exc, socket.timeout):
+                    continue
+                raise
+            response_headers = dict(
+                (name.lower(), value) for name, value in response.getheaders())
+            if response_headers.get('connection', '').lower() == 'close' or (
+                    response.version < 11):
+                connection.close()
+            else:
+                pool.put(connection)
+            return response.status, response_headers, content
+
+    def _response(self, url, status, headers, content):
+        """Parse the response to url as RemoteConnection does"""
+        if 300 <= status < 304:
+            return self._request('GET', urljoin(url, headers['location']))
+        body = content.decode('utf-8').replace('\x00', '').strip()
+        if 399 < status <= 500:
+            return {'status': status, 'value': body}
+        if any(part.strip().startswith('image/png')
+               for part in headers.get('content-type', '').split(';')):
+            return {'status': 0, 'value': body}
+        try:
+            data = utils.load_json(body)
+        except ValueError:
+            return {
+                'status': ErrorCode.SUCCESS if 199 < status < 300
+                else ErrorCode.UNKNOWN_ERROR,
+                'value': body,
+            }
+        if 'value' not in data:
+            data['value'] = None
+        return data
@@ -0,0 +1,562 @@
+# -*- coding: utf-8 -*-
+"""A WebDriver that runs page objects without a browser
+
+The HtmlDriver parses pages with the standard library HTML parser and answers
+WebDriver commands from the parsed document. It understands CSS selectors,
+link text, typing into and submitting forms, and following links. It does not
+run JavaScript, compute layout, or load anything but the page itself, so it is
+only suitable for server rendered pages, but there it is many times faster
+than a real browser.
+
+Pages are loaded from file:// urls, or from a WSGI or ASGI application called
+in process, with cookies and redirects handled by the transport. The same
+Page and Component classes work with the HtmlDriver and with a real browser.
+
+Example:
+    driver = HtmlDriver(app=my_wsgi_app)
+    login = LoginPage(driver)
+    dashboard = login.login('a@b.com', 'xxxxx')
+
+"""
+from __future__ import unicode_literals
+import itertools
+import re
+
+from selenium.common.exceptions import (
+    InvalidSelectorException,
+    NoSuchElementException,
+    StaleElementReferenceException,
+    WebDriverException
+)
+from selenium.webdriver.common.by import By
+from selenium.webdriver.common.keys import Keys
+from selenium.webdriver.remote.webdriver import WebDriver
+from six.moves.http_cookiejar import Cookie
+from six.moves.urllib.parse import urldefrag, urlencode, urljoin, urlsplit
+
+from .dom import VOID_ELEMENTS, SelectorError, parse_html
+from .transport import FileTransport, app_transport
+
+__all__ = ['HtmlDriver']
+
+_BOOLEAN_ATTRIBUTES = frozenset([
+    'async', 'autofocus', 'checked', 'defer', 'disabled', 'hidden',
+    'multiple', 'readonly', 'required', 'selected'
+])
+
+_URL_ATTRIBUTES = frozenset(['action', 'href', 'src'])
+
+# XPath expressions used by selenium's Select support class
+_OPTION_XPATH = re.compile(
+    r'^\.//option\[(normalize-space\(\.\)\s*=|contains\(\.\s*,)\s*'
+    r'(?P<quote>["\'])(?P<text>.*)(?P=quote)\s*\)?\]$'
+)
+
+
+class HtmlDriver(WebDriver):
+    """WebDriver that parses HTML instead of driving a browser
+
+    app -- a WSGI or ASGI application that http and https urls are loaded from
+    transport -- a transport used for http and https urls instead of calling
+        app directly, see keteparaha.transport
+    """
+
+    capabilities = {
+        'browserName': 'htmldriver',
+        'javascriptEnabled': False,
+    }
+
+    def __init__(self, app=None, transport=None):
+        if transport is None and app is not None:
+            transport = app_transport(app)
+        self.transport = transport
+        self.session_id = 'html-driver'
+        self.w3c = False
+        self._is_remote = False
+        self._window_size = {'width': 1300, 'height': 1080}
+        self._history = []
+        self._position = -1
+        self._document = parse_html('')
+        self._elements = {}
+        self._element_ids = {}
+        self._ids = itertools.count()
+
+    def __repr__(self):
+        return '<HtmlDriver {0}>'.format(self._url or 'about:blank')
+
+    @property
+    def _url(self):
+        if self._position < 0:
+            return ''
+        return self._history[self._position]
+
+    def _transport_for(self, url):
+        if url.startswith('file:'):
+            return FileTransport()
+        if self.transport is None:
+            raise WebDriverException(
+                'HtmlDriver needs an app or transport to load "{0}"'.format(
+                    url))
+        return self.transport
+
+    def _load(self, url, method='GET', body=None, headers=None,
+              history=True):
+        url = urljoin(self._url, url)
+        response = self._transport_for(url).request(
+            method, url, body, headers)
+        if history:
+            del self._history[self._position + 1:]
+            self._history.append(response.url)
+            self._position = len(self._history) - 1
+        else:
+            self._history[self._position] = response.url
+        self._document = parse_html(response.text)
+        self._elements = {}
+        self._element_ids = {}
+
+    def _go(self, offset):
+        position = self._position + offset
+        if 0 <= position < len(self._history):
+            self._position = position
+            self._load(self._history[position], history=False)
+
+    # Elements
+
+    def _web_element(self, node):
+        try:
+            element_id = self._element_ids[id(node)]
+        except KeyError:
+            element_id = 'html-{0}'.format(next(self._ids))
+            self._element_ids[id(node)] = element_id
+            self._elements[element_id] = node
+        return {'ELEMENT': element_id}
+
+    def _node(self, params):
+        try:
+            return self._elements[params['id']]
+        except KeyError:
+            raise StaleElementReferenceException(
+                'Element is no longer attached to the DOM')
+
+    def _search(self, root, using, value):
+        """Return all nodes below root found with the locator strategy"""
+        if using == By.CSS_SELECTOR:
+            try:
+                return root.select(value)
+            except SelectorError as exc:
+                raise InvalidSelectorException(str(exc))
+        if using == By.ID:
+            return [n for n in root.iter() if n.attrs.get('id') == value]
+        if using == By.NAME:
+            return [n for n in root.iter() if n.attrs.get('name') == value]
+        if using == By.CLASS_NAME:
+            return [n for n in root.iter() if value in n.classes]
+        if using == By.TAG_NAME:
+            return [n for n in root.iter() if n.tag == value.lower()]
+        if using == By.LINK_TEXT:
+            return [n for n in root.iter()
+                    if n.tag == 'a' and n.text.strip() == value]
+        if using == By.PARTIAL_LINK_TEXT:
+            return [n for n in root.iter() if n.tag == 'a' and value in n.text]
+        if using == By.XPATH:
+            match = _OPTION_XPATH.match(value)
+            if match:
+                text = match.group('text')
+                exact = value.startswith('.//option[normalize')
+                return [
+                    n for n in root.iter() if n.tag == 'option' and (
+                        ' '.join(n.text.split()) == text if exact
+                        else text in n.text)
+                ]
+        raise InvalidSelectorException(
+            'HtmlDriver can not find elements by {0} "{1}"'.format(
+                using, value))
+
+    def _find(self, params, root=None):
+        nodes = self._search(
+            root or self._document, params['using'], params['value'])
+        if not nodes:
+            raise NoSuchElementException(
+                'Unable to locate element: {0} "{1}"'.format(
+                    params['using'], params['value']))
+        return self._web_element(nodes[0])
+
+    def _find_all(self, params, root=None):
+        return [
+            self._web_element(node) for node in self._search(
+                root or self._document, params['using'], params['value'])
+        ]
+
+    def serialize_element(self, element):
+        """Serialize an element like keteparaha.snapshot.SNAPSHOT_SCRIPT"""
+        return _serialize_node(self._node({'id': element.id}))
+
+    # Element properties
+
+    def _attribute(self, node, name):
+        name = name.lower()
+        if name == 'value':
+            return _value(node)
+        if name in ('checked', 'selected'):
+            return 'true' if _selected(node) else None
+        if name in _BOOLEAN_ATTRIBUTES:
+            return 'true' if name in node.attrs else None
+        if name in _URL_ATTRIBUTES and name in node.attrs:
+            return urljoin(self._url, node.attrs[name])
+        if name in ('textcontent', 'innertext'):
+            return node.text
+        return node.attrs.get(name)
+
+    # Forms
+
+    def _form(self, node):
+        for ancestor in node.ancestors():
+            if ancestor.tag == 'form':
+                return ancestor
+
+    def _controls(self, form, submitter=None):
+        """The name, value pairs a form submits"""
+        data = []
+        for node in form.iter():
+            name = node.attrs.get('name')
+            if not name or 'disabled' in node.attrs:
+                continue
+            kind = node.attrs.get('type', '').lower()
+            if node.tag == 'input' and kind in ('checkbox', 'radio'):
+                if 'checked' in node.attrs:
+                    data.append((name, node.attrs.get('value', 'on')))
+            elif (node.tag == 'input' and kind in (
+                    'submit', 'image', 'button', 'reset', 'file')) or (
+                    node.tag == 'button'):
+                if node is submitter:
+                    data.append((name, node.attrs.get('value', '')))
+            elif node.tag == 'select':
+                for option in _selected_options(node):
+                    data.append((name, _value(option)))
+            elif node.tag in ('input', 'textarea'):
+                data.append((name, _value(node)))
+        return data
+
+    def _submit(self, form, submitter=None):
+        data = urlencode([
+            (key.encode('utf-8'), value.encode('utf-8'))
+            for key, value in self._controls(form, submitter)
+        ])
+        action = (submitter is not None and submitter.attrs.get(
+            'formaction')) or form.attrs.get('action') or self._url
+        action = urljoin(self._url, action)
+        method = form.attrs.get('method', 'get').upper()
+        if method == 'POST':
+            self._load(action, 'POST', data.encode('ascii'), [
+                ('Content-Type', 'application/x-www-form-urlencoded')])
+        else:
+            self._load(urldefrag(action)[0].split('?')[0] + '?' + data)
+
+    def _click(self, node):
+        if 'disabled' in node.attrs:
+            return
+        kind = node.attrs.get('type', '').lower()
+        link = node if node.tag == 'a' else next(
+            (a for a in node.ancestors() if a.tag == 'a'), None)
+        if link is not None and 'href' in link.attrs:
+            href = link.attrs['href']
+            if href.startswith('javascript:'):
+                return
+            if href.startswith('#'):
+                self._history[self._position] = (
+                    urldefrag(self._url)[0] + href)
+                return
+            self._load(href)
+        elif node.tag == 'input' and kind == 'checkbox':
+            _toggle(node, 'checked', 'checked' not in node.attrs)
+        elif node.tag == 'input' and kind == 'radio':
+            form = self._form(node) or node.root
+            for radio in form.select('input[type=radio]'):
+                if radio.attrs.get('name') == node.attrs.get('name'):
+                    _toggle(radio, 'checked', False)
+            _toggle(node, 'checked', True)
+        elif node.tag == 'option':
+            select = next(
+                (s for s in node.ancestors() if s.tag == 'select'), None)
+            if select is not None and 'multiple' in select.attrs:
+                _toggle(node, 'selected', 'selected' not in node.attrs)
+            else:
+                for option in (select or node.parent).select('option'):
+                    _toggle(option, 'selected', False)
+                _toggle(node, 'selected', True)
+        elif (node.tag == 'input' and kind in ('submit', 'image')) or (
+                node.tag == 'button' and kind in ('', 'submit')):
+            form = self._form(node)
+            if form is not None:
+                self._submit(form, node)
+
+    def _send_keys(self, node, keys):
+        text = ''.join(keys)
+        if node.tag not in ('input', 'textarea'):
+            return
+        typed = ''.join(key for key in text if not _is_special_key(key))
+        if node.tag == 'textarea':
+            node.attrs['value'] = _value(node) + typed
+        else:
+            node.attrs['value'] = node.attrs.get('value', '') + typed
+        if node.tag == 'input' and (Keys.ENTER in text or Keys.RETURN in text):
+            form = self._form(node)
+            if form is not None:
+                self._submit(form)
+
+    def _clear(self, node):
+        if 'readonly' in node.attrs or 'disabled' in node.attrs:
+            raise WebDriverException('Element is read-only')
+        node.attrs['value'] = ''
+
+    # The WebDriver wire protocol
+
+    def execute(self, driver_command, params=None):
+        """Answer a WebDriver command from the parsed document"""
+        params = params or {}
+        handler = getattr(self, '_command_{0}'.format(driver_command), None)
+        if handler is None:
+            raise WebDriverException(
+                'HtmlDriver does not support the "{0}" command'.format(
+                    driver_command))
+        value = handler(params)
+        return {'status': 0, 'value': self._unwrap_value(value)}
+
+    def _element_command(method):
+        def command(self, params):
+            return method(self, self._node(params), params)
+        return command
+
+    def _command_get(self, params):
+        self._load(params['url'])
+
+    def _command_getCurrentUrl(self, params):
+        return self._url
+
+    def _command_getTitle(self, params):
+        title = self._document.select_one('title')
+        return ' '.join(title.text.split()) if title is not None else ''
+
+    def _command_getPageSource(self, params):
+        return _serialize(self._document)
+
+    def _command_goBack(self, params):
+        self._go(-1)
+
+    def _command_goForward(self, params):
+        self._go(1)
+
+    def _command_refresh(self, params):
+        self._load(self._url, history=False)
+
+    def _command_findElement(self, params):
+        return self._find(params)
+
+    def _command_findElements(self, params):
+        return self._find_all(params)
+
+    @_element_command
+    def _command_findChildElement(self, node, params):
+        return self._find(params, node)
+
+    @_element_command
+    def _command_findChildElements(self, node, params):
+        return self._find_all(params, node)
+
+    @_element_command
+    def _command_getElementText(self, node, params):
+        return node.text if node.displayed else ''
+
+    @_element_command
+    def _command_getElementAttribute(self, node, params):
+        return self._attribute(node, params['name'])
+
+    @_element_command
+    def _command_getElementTagName(self, node, params):
+        return node.tag
+
+    @_element_command
+    def _command_isElementEnabled(self, node, params):
+        return 'disabled' not in node.attrs
+
+    @_element_command
+    def _command_isElementDisplayed(self, node, params):
+        return node.displayed
+
+    @_element_command
+    def _command_isElementSelected(self, node, params):
+        return _selected(node)
+
+    @_element_command
+    def _command_getElementValueOfCssProperty(self, node, params):
+        for declaration in node.attrs.get('style', '').split(';'):
+            key, _, value = declaration.partition(':')
+            if key.strip().lower() == params['propertyName'].lower():
+                return value.strip()
+        return ''
+
+    @_element_command
+    def _command_getElementSize(self, node, params):
+        return {'width': 0, 'height': 0}
+
+    @_element_command
+    def _command_getElementLocation(self, node, params):
+        return {'x': 0, 'y': 0}
+
+    _command_getElementLocationOnceScrolledIntoView = \
+        _command_getElementLocation
+
+    @_element_command
+    def _command_clickElement(self, node, params):
+        self._click(node)
+
+    @_element_command
+    def _command_submitElement(self, node, params):
+        form = node if node.tag == 'form' else self._form(node)
+        if form is not None:
+            self._submit(form)
+
+    @_element_command
+    def _command_sendKeysToElement(self, node, params):
+        self._send_keys(node, params.get('value') or params.get('text', ''))
+
+    @_element_command
+    def _command_clearElement(self, node, params):
+        self._clear(node)
+
+    def _command_executeScript(self, params):
+        raise WebDriverException('HtmlDriver does not run JavaScript')
+
+    _command_executeAsyncScript = _command_executeScript
+
+    def _cookie_jar(self):
+        if self.transport is None:
+            raise WebDriverException('HtmlDriver has no transport for cookies')
+        return self.transport.cookies
+
+    def _command_getCookies(self, params):
+        return [
+            {
+                'name': cookie.name,
+                'value': cookie.value,
+                'domain': cookie.domain,
+                'path': cookie.path,
+                'secure': bool(cookie.secure),
+                'expiry': cookie.expires,
+                'httpOnly': cookie.has_nonstandard_attr('HttpOnly'),
+            }
+            for cookie in self._cookie_jar()
+        ]
+
+    def _command_addCookie(self, params):
+        cookie = params['cookie']
+        host = urlsplit(self._url).hostname or 'localhost'
+        domain = cookie.get('domain') or host
+        self._cookie_jar().set_cookie(Cookie(
+            0, cookie['name'], cookie['value'], None, False,
+            domain, bool(cookie.get('domain')), domain.startswith('.'),
+            cookie.get('path', '/'), True, bool(cookie.get('secure')),
+            cookie.get('expiry'), False, None, None,
+            {'HttpOnly': None} if cookie.get('httpOnly') else {}
+        ))
+
+    def _command_deleteCookie(self, params):
+        jar = self._cookie_jar()
+        for cookie in list(jar):
+            if cookie.name == params['name']:
+                jar.clear(cookie.domain, cookie.path, cookie.name)
+
+    def _command_deleteAllCookies(self, params):
+        self._cookie_jar().clear()
+
+    def _command_getWindowSize(self, params):
+        return dict(self._window_size)
+
+    def _command_setWindowSize(self, params):
+        self._window_size = {
+            'width': params['width'], 'height': params['height']}
+
+    def _command_close(self, params):
+        pass
+
+    _command_quit = _command_close
+
+    del _element_command
+
+
+def _is_special_key(key):
+    return '\ue000' <= key <= '\uf8ff'
+
+
+def _toggle(node, attribute, on):
+    if on:
+        node.attrs[attribute] = attribute
+    else:
+        node.attrs.pop(attribute, None)
+
+
+def _selected_options(select):
+    options = select.select('option')
+    selected = [o for o in options if 'selected' in o.attrs]
+    if selected or 'multiple' in select.attrs or not options:
+        return selected
+    return options[:1]
+
+
+def _selected(node):
+    if node.tag == 'option':
+        select = next((s for s in node.ancestors() if s.tag == 'select'), None)
+        if select is not None:
+            return node in _selected_options(select)
+        return 'selected' in node.attrs
+    return 'checked' in node.attrs
+
+
+def _value(node):
+    """The current value of a form control"""
+    if node.tag == 'textarea':
+        return node.attrs.get('value', ''.join(
+            child for child in node.children if not hasattr(child, 'tag')))
+    if node.tag == 'option':
+        return node.attrs.get('value', ' '.join(node.text.split()))
+    if node.tag == 'select':
+        options = _selected_options(node)
+        return _value(options[0]) if options else ''
+    value = node.attrs.get('value')
+    if value is None and node.tag == 'input' and node.attrs.get(
+            'type', '').lower() in ('checkbox', 'radio'):
+        return 'on'
+    return value
+
+
+def _serialize_node(node):
+    attrs = dict(node.attrs)
+    if node.tag in ('input', 'option', 'select', 'textarea'):
+        attrs['value'] = _value(node)
+    return {
+        'tag': node.tag,
+        'attrs': attrs,
+        'children': [
+            _serialize_node(child) if hasattr(child, 'tag') else child
+            for child in node.children
+        ],
+        'displayed': node.displayed,
+        'rect': {'x': 0, 'y': 0, 'width': 0, 'height': 0},
+    }
+
+
+def _serialize(node):
+    """Return the markup for a node and its children"""
+    parts = []
+    for child in node.children:
+        if hasattr(child, 'tag'):
+            attrs = ''.join(
+                ' {0}="{1}"'.format(key, value.replace('"', '&quot;'))
+                for key, value in child.attrs.items())
+            parts.append('<{0}{1}>'.format(child.tag, attrs))
+            if child.tag not in VOID_ELEMENTS:
+                parts.append(_serialize(child))
+                parts.append('</{0}>'.format(child.tag))
+        else:
+            parts.append(child.replace('&', '&amp;').replace('<', '&lt;'))
+    return ''.join(parts)
@@ -33,43 +33,259 @@ Example:
 """
 from __future__ import unicode_literals
 import collections
+try:
+    from collections.abc import MutableMapping
+except ImportError:  # Python 2
+    from collections import MutableMapping
 from inspect import isclass
 import time
 from selenium.common import exceptions
-from selenium.webdriver.common.action_chains import ActionChains
-from selenium.webdriver.common.by import By
-from selenium.webdriver.remote.webdriver import WebDriver
-from selenium.webdriver.support import expected_conditions as ec
-from selenium.webdriver.support.select import Select
-from selenium.webdriver.support.wait import TimeoutException, WebDriverWait
-from six import with_metaclass
-from urlparse import parse_qs, urlparse
+from selenium.common.exceptions import TimeoutException
+from six import text_type, with_metaclass
+from six.moves.urllib.parse import parse_qs, urlparse
 import re
 
 from .expectations import (
+    WaitDiagnostics,
     _wait_for_condition,
     component_to_be_clickable,
     text_to_be_present_in_component
 )
 from . import flow
+from .actions import ActionSequence
+from .flight import recorded
+from .profiler import measure
+from .snapshot import snapshot_element
+from .visual import assert_visually_matches
 
 ELEMENT_TIMEOUT = 10
 """ (int): The seconds that a component will wait to be visible, clickable, or
     present before raising a TimeoutException
 """
 
+SELECTOR_CHAIN_SCRIPT = """
+var node = document;
+var chain = arguments[0];
+for (var i = 0; i < chain.length && node; i++) {
+    if (chain[i][1] === null) {
+        node = node.querySelector(chain[i][0]);
+    } else {
+        node = node.querySelectorAll(chain[i][0])[chain[i][1]] || null;
+    }
+}
+return node;
+"""
+""" (str): Script that finds the element at the end of a selector chain"""
+
+NAVIGATE_SCRIPT = """
+var target = document.createElement('a');
+target.href = arguments[0];
+var withoutHash = function (url) { return url.split('#')[0]; };
+// Only a new document clears the flag, so moving to a fragment of this
+// document must not set it
+window.__keteparahaUnloading = !(target.hash &&
+    withoutHash(target.href) === withoutHash(window.location.href));
+window.location.href = arguments[0];
+"""
+""" (str): Script that starts loading a url without waiting for it"""
+
+SELECT_OPTIONS_SCRIPT = """
+var select = arguments[0], by = arguments[1], wanted = arguments[2];
+var found = Object.create(null);
+for (var i = 0; i < select.options.length; i++) {
+    var option = select.options[i];
+    var key = by === 'index' ? String(option.index) :
+        by === 'value' ? option.value :
+        option.textContent.replace(/\\s+/g, ' ').trim();
+    (found[key] = found[key] || []).push(option);
+}
+var missing = [], chosen = [];
+for (var j = 0; j < wanted.length; j++) {
+    var options = found[String(wanted[j])];
+    if (!options) {
+        missing.push(wanted[j]);
+    } else {
+        chosen.push.apply(
+            chosen, select.multiple ? options : options.slice(0, 1));
+    }
+}
+if (missing.length) {
+    return missing;
+}
+var changed = false;
+for (var k = 0; k < chosen.length; k++) {
+    changed = changed || !chosen[k].selected;
+    chosen[k].selected = true;
+}
+if (changed) {
+    ['input', 'change'].forEach(function (type) {
+        var event = document.createEvent('HTMLEvents');
+        event.initEvent(type, true, false);
+        select.dispatchEvent(event);
+    });
+}
+return missing;
+"""
+""" (str): Selects the options of a select element matching a list of
+    visible texts, values or indexes in one command, returning those that
+    did not match anything
+"""
+
+ITER_ROWS_SCRIPT = """
+var root = arguments[0], selector = arguments[1], key = arguments[2],
+    scroll = arguments[3], settle = arguments[4],
+    done = arguments[arguments.length - 1];
+var page = document.scrollingElement || document.documentElement;
+var scroller = root;
+while (scroller && scroller !== page && !(
+        scroller.scrollHeight > scroller.clientHeight &&
+        /auto|scroll/.test(getComputedStyle(scroller).overflowY))) {
+    scroller = scroller.parentElement;
+}
+scroller = scroller || page;
+var before = scroller.scrollTop;
+if (scroll) {
+    var height = scroller === page ?
+        window.innerHeight : scroller.clientHeight;
+    scroller.scrollTop = before + Math.max(height * 0.8, 1);
+}
+var moved = scroller.scrollTop !== before;
+setTimeout(function () {
+    var top = scroller === page ? 0 : scroller.getBoundingClientRect().top;
+    var nodes = root.querySelectorAll(selector), rows = [];
+    for (var i = 0; i < nodes.length; i++) {
+        if (nodes[i].getBoundingClientRect().bottom > top) {
+            rows.push([key ? nodes[i].getAttribute(key) :
+                       nodes[i].textContent.trim(), nodes[i]]);
+        }
+    }
+    done({rows: rows, end: Boolean(scroll) && !moved});
+}, scroll ? settle : 0);
+"""
+""" (str): Scrolls the scrolling container of an element down, if asked,
+    waits for rows to render and returns the key and element of the matching
+    rows that have not been scrolled past
+"""
+
+LOADED_SCRIPT = """
+return !window.__keteparahaUnloading && (
+    arguments[0] === 'none' || document.readyState !== 'loading');
+"""
+""" (str): Script checking the new page has replaced the old one"""
+
+IDLE_SCRIPT = """
+var quiet = arguments[0], timeout = arguments[1],
+    done = arguments[arguments.length - 1];
+var tracker = window.__keteparahaIdle;
+if (!tracker) {
+    tracker = window.__keteparahaIdle = {
+        requests: 0, timers: {}, last: Date.now(), unloading: false,
+        setTimeout: window.setTimeout, clearTimeout: window.clearTimeout
+    };
+    var busy = function () { tracker.last = Date.now(); };
+    var finished = function () { tracker.requests--; busy(); };
+    var send = XMLHttpRequest.prototype.send;
+    XMLHttpRequest.prototype.send = function () {
+        tracker.requests++;
+        busy();
+        this.addEventListener('loadend', finished);
+        try {
+            return send.apply(this, arguments);
+        } catch (error) {
+            this.removeEventListener('loadend', finished);
+            finished();
+            throw error;
+        }
+    };
+    if (window.fetch) {
+        var fetch = window.fetch;
+        window.fetch = function () {
+            tracker.requests++;
+            busy();
+            try {
+                var response = fetch.apply(this, arguments);
+            } catch (error) {
+                finished();
+                throw error;
+            }
+            response.then(finished, finished);
+            return response;
+        };
+    }
+    window.setTimeout = function (callback, delay) {
+        if (typeof callback !== 'function' || (delay || 0) > 1000) {
+            return tracker.setTimeout.apply(window, arguments);
+        }
+        var args = Array.prototype.slice.call(arguments, 2);
+        var id = tracker.setTimeout.call(window, function () {
+            delete tracker.timers[id];
+            busy();
+            return callback.apply(this, args);
+        }, delay);
+        tracker.timers[id] = true;
+        return id;
+    };
+    window.clearTimeout = function (id) {
+        delete tracker.timers[id];
+        return tracker.clearTimeout.call(window, id);
+    };
+    window.addEventListener('beforeunload', function () {
+        tracker.unloading = true;
+    });
+}
+var pending = function () {
+    var animations = !document.getAnimations ? [] :
+        document.getAnimations().filter(function (animation) {
+            return animation.playState === 'running' &&
+                animation.effect.getTiming().iterations !== Infinity;
+        });
+    return {
+        requests: tracker.requests,
+        timers: Object.keys(tracker.timers).length,
+        animations: animations.length,
+        loading: tracker.unloading || document.readyState !== 'complete'
+    };
+};
+var started = Date.now();
+(function check() {
+    var now = Date.now(), state = pending();
+    if (state.requests || state.timers || state.animations || state.loading) {
+        tracker.last = now;
+    }
+    if (now - tracker.last >= quiet) {
+        done({idle: true});
+    } else if (now - started >= timeout) {
+        done({idle: false, pending: state});
+    } else {
+        tracker.setTimeout.call(window, check, 10);
+    }
+})();
+"""
+""" (str): Async script that waits until the app has been quiet for a
+    number of milliseconds, with no requests, timers of up to a second or
+    finite animations pending. A tracker of them is installed in the page
+    the first time it runs
+"""
+
 __all__ = ['Component', 'Page']
 
 
 # Workaround for backwards compatibility with Python 2.7
 try:
-    unicode = unicode
+    basestring = basestring
 except NameError:
     basestring = (str, bytes)
 
 
 def match_url(url, candidates):
+    """Return the candidate that best matches the path of url
+
+    The candidate matching the longest part of the path wins, earlier
+    candidates win ties. Returns None if nothing matches, otherwise a tuple of
+    the candidate and the args and kwargs captured from the url.
+    """
     parsed = urlparse(url)
+    best = None
     for candidate in candidates:
         if not isinstance(candidate, basestring):
             continue
@@ -78,63 +294,237 @@ def match_url(url, candidates):
         else:
             candidate_path = candidate
         match = re.match(candidate_path, parsed.path)
-        if match:
-            kwargs = match.groupdict()
-            args = tuple(set(match.groups()) - set(kwargs.values()))
-            if parsed.query:
-                kwargs['_query'] = parse_qs(parsed.query)
-            if parsed.fragment:
-                kwargs['_fragment'] = parsed.fragment
-            return candidate, args, kwargs
+        if match and (best is None or match.end() > best[1].end()):
+            best = candidate, match
+    if best:
+        candidate, match = best
+        kwargs = match.groupdict()
+        args = tuple(set(match.groups()) - set(kwargs.values()))
+        if parsed.query:
+            kwargs['_query'] = parse_qs(parsed.query)
+        if parsed.fragment:
+            kwargs['_fragment'] = parsed.fragment
+        return candidate, args, kwargs
+
+
+def _runs_javascript(driver):
+    """Whether driver can run the scripts the fast paths use
+
+    W3C drivers don't report javascriptEnabled at all, so only a driver that
+    says it has no JavaScript, like HtmlDriver, is taken to have none.
+    """
+    capabilities = getattr(driver, 'capabilities', None) or {}
+    return bool(capabilities.get('javascriptEnabled', True))
+
+
+class _AsyncScripts(object):
+    """Runs a driver's async scripts, giving them longer if they time out
+
+    Some drivers default to no time at all for async scripts. The first time
+    one times out the script timeout is raised to seconds, and restore puts
+    back the one the session had. W3C drivers report it, drivers speaking the
+    JSON wire protocol only time out straight away with their default of 0.
+    """
+
+    def __init__(self, driver, seconds):
+        self.driver = driver
+        self.seconds = seconds
+        self.previous = None
+
+    def run(self, script, *args):
+        try:
+            return self.driver.execute_async_script(script, *args)
+        except exceptions.TimeoutException:
+            if self.previous is not None:
+                raise
+        self.previous = self._timeout()
+        self.driver.set_script_timeout(self.seconds)
+        return self.driver.execute_async_script(script, *args)
+
+    def restore(self):
+        if self.previous is not None:
+            self.driver.set_script_timeout(self.previous)
+            self.previous = None
+
+    def _timeout(self):
+        if not getattr(self.driver, 'w3c', False):
+            return 0
+        try:
+            timeouts = self.driver.execute('getTimeouts')['value']
+            return timeouts['script'] / 1000.0
+        except (exceptions.WebDriverException, KeyError, TypeError):
+            return 0
+
+
+class _Registry(MutableMapping):
+    """A named registry of pages and components
+
+    Pages are stored by url and components by selector, each in their own
+    namespace. Registries form a hierarchy, a lookup that misses in a
+    registry is retried in its parent, so components registered for a page
+    shadow those registered for the whole site.
+
+    The mapping interface works on the urls of the pages visible from this
+    registry, its own and its ancestors', like lookups do. Setting or
+    deleting a url only changes this registry, deleting an inherited url
+    raises KeyError.
+    """
+    URL = 'url'
+    SELECTOR = 'selector'
 
+    def __init__(self, name='', parent=None, key=None):
+        self.name = name
+        self.key = name if key is None else key
+        self.parent = parent
+        self.children = {}
+        self.namespaces = {self.URL: {}, self.SELECTOR: {}}
 
-class _Registry(collections.MutableMapping):
-    """A singleton registry for pages and components"""
-    store = dict()
+    def __repr__(self):
+        return '_Registry({0!r})'.format(self.path)
+
+    @property
+    def path(self):
+        """The dotted name of this registry from the root registry"""
+        if self.parent is None or not self.parent.name:
+            return self.name
+        return '{0}.{1}'.format(self.parent.path, self.name)
 
     def __delitem__(self, key):
-        pass
+        del self.namespaces[self.URL][key]
 
     def __getitem__(self, key):
-        return self.store[key]
+        return self.lookup(self.URL, key)
+
+    def __contains__(self, key):
+        try:
+            self.lookup(self.URL, key)
+        except KeyError:
+            return False
+        return True
 
     def __iter__(self):
-        for value in self.store.values():
-            yield value
+        return self.urls()
 
     def __setitem__(self, key, value):
-        self.store[key] = value
+        self.namespaces[self.URL][key] = value
 
     def __len__(self):
-        return len(self.store)
+        return sum(1 for _ in self.urls())
 
     def __call__(self, selector):
         try:
-            return self.store[selector]
+            return self.lookup(self.SELECTOR, selector)
         except KeyError:
             return self.make_class(selector)
 
     def make_class(self, selector):
+        """Create a component class that is not added to any registry"""
+        attrs = {'selector': selector, '_unregistered': True}
         try:
-            return type(
-                'DynamicComponent', (Component,), {'selector': selector})
+            return type('DynamicComponent', (Component,), attrs)
         except TypeError:  # Python < 3
-            return type(
-                b'DynamicComponent', (Component,), {'selector': selector})
-            return
+            return type(b'DynamicComponent', (Component,), attrs)
 
-    def keys(self):
-        return self.store.keys()
+    def child(self, key):
+        """Return the child registry for key, creating it if needed
+
+        key is a name, or the page class whose components the child holds.
+        Page classes are their own key, so pages with the same name in
+        different modules don't share their components.
+        """
+        try:
+            return self.children[key]
+        except KeyError:
+            name = key if isinstance(key, basestring) else key.__name__
+            registry = self.children[key] = _Registry(
+                name, parent=self, key=key)
+            return registry
+
+    def scope(self, path):
+        """Return the descendant registry identified by a dotted path"""
+        registry = self
+        for name in path.split('.'):
+            registry = registry.child(name)
+        return registry
+
+    def walk(self):
+        """Yield this registry and all of its descendants"""
+        stack = [self]
+        while stack:
+            registry = stack.pop()
+            yield registry
+            stack.extend(registry.children.values())
+
+    def remove(self):
+        """Detach this registry, and everything registered in it"""
+        if self.parent is not None:
+            self.parent.children.pop(self.key, None)
+            self.parent = None
+
+    def lookup(self, namespace, key):
+        """Return the class registered under key, searching up the hierarchy
+        """
+        registry = self
+        while registry is not None:
+            try:
+                return registry.namespaces[namespace][key]
+            except KeyError:
+                registry = registry.parent
+        raise KeyError(key)
+
+    def urls(self):
+        """All the urls visible from this registry, nearest first"""
+        seen = set()
+        registry = self
+        while registry is not None:
+            for url in registry.namespaces[self.URL]:
+                if url not in seen:
+                    seen.add(url)
+                    yield url
+            registry = registry.parent
+
+    def register(self, cls):
+        """Add a page by its url, or a component by its selector"""
+        if isinstance(getattr(cls, 'url', None), basestring):
+            self.namespaces[self.URL][cls.url] = cls
+        elif getattr(cls, 'selector', None):
+            self.namespaces[self.SELECTOR][cls.selector] = cls
+
+    def unregister(self, cls):
+        """Remove a page or component that was previously registered"""
+        for namespace in self.namespaces.values():
+            for key, value in list(namespace.items()):
+                if value is cls:
+                    del namespace[key]
+
+
+_root_registry = _Registry()
 
 
 class _RegistryMeta(type):
-    """Add our pages and components to a central registry"""
+    """Add our pages and components to the registry for their scope
+
+    A class can set scope to the dotted name of a registry, for example the
+    name of the site or app it belongs to. A component can also set its scope
+    to a page class, it is then only found from that page and its components.
+    Without a scope classes are registered where their base class was.
+    """
 
     def __init__(cls, name, bases, dct):
+        scope = dct.get('scope')
+        if isclass(scope) and issubclass(scope, Page):
+            cls._registry = scope._components
+        elif scope:
+            cls._registry = _root_registry.scope(scope)
+
         if dct.get('url'):
-            cls._registry[dct.get('url')] = cls
-        elif dct.get('selector'):
-            cls._registry[dct.get('selector')] = cls
+            cls._components = cls._registry.child(cls)
+        elif 'scope' in dct or not hasattr(cls, '_components'):
+            cls._components = cls._registry
+
+        if not dct.get('_unregistered') and (
+                dct.get('url') or dct.get('selector')):
+            cls._registry.register(cls)
 
         return super(_RegistryMeta, cls).__init__(name, bases, dct)
 
@@ -158,8 +548,16 @@ class _SeleniumWrapper(object):
         if isclass(component_or_selector) and issubclass(
                 component_or_selector, Component):
             return component_or_selector
-        return self._registry(component_or_selector)
+        return self._scope(component_or_selector)
 
+    @property
+    def _scope(self):
+        """The registry used to look up the pages and components this
+        object opens
+        """
+        return self.page._components
+
+    @recorded
     def get_component(self, component_or_selector):
         """Return an initialised component present in page
 
@@ -177,18 +575,26 @@ class _SeleniumWrapper(object):
                 '"{0}" could not be found in page'.format(
                     ComponentClass.selector))
 
-    def get_components(self, component_or_selector):
+    @recorded
+    def get_components(self, component_or_selector, wait=True):
         """Return an list of initialised components present in page
 
-        Returns an empty list if no components could be found
+        Returns an empty list if no components could be found. That takes
+        the whole ELEMENT_TIMEOUT, unless wait is False, when the page is
+        only checked once. Use that when the components are expected to be
+        missing.
         """
         ComponentClass = self._get_component_class(component_or_selector)
 
         components = []
-        try:
-            elements = self.get_elements(ComponentClass.selector)
-        except TimeoutException:
-            return components
+        if not wait:
+            elements = self._element.find_elements_by_css_selector(
+                ComponentClass.selector)
+        else:
+            try:
+                elements = self.get_elements(ComponentClass.selector)
+            except TimeoutException:
+                return components
 
         for idx, element in enumerate(elements):
             comp_inst = self._get_component_class(
@@ -198,68 +604,174 @@ class _SeleniumWrapper(object):
 
         return components
 
+    def iter_components(self, component_or_selector, key=None,
+                        settle=0.05, idle_timeout=2, max_seen=1000):
+        """Yield the components of a long list, scrolling through it
+
+        For virtualised and infinitely scrolling lists, where only some rows
+        are in the page at a time. The list is scrolled a little less than a
+        screen at a time, and each batch of rows is read in one command.
+        Only rows not seen before are yielded, use them straight away as
+        virtualised lists reuse rows once they are scrolled out of view.
+
+        key -- the attribute telling rows apart, their text by default
+        settle -- the seconds to wait for rows to render after scrolling
+        idle_timeout -- stop after this many seconds without new rows
+        max_seen -- the number of keys remembered to tell which rows are new
+        """
+        ComponentClass = self._get_component_class(component_or_selector)
+        seen = set()
+        order = collections.deque()
+
+        def is_new(row_key):
+            if row_key in seen:
+                return False
+            if len(order) >= max_seen:
+                seen.discard(order.popleft())
+            order.append(row_key)
+            seen.add(row_key)
+            return True
+
+        def bound(element):
+            component = ComponentClass(self, find_by='element')
+            component._bound_element = element
+            return component
+
+        driver = self.page._driver
+        if not _runs_javascript(driver):
+            for element in self._element.find_elements_by_css_selector(
+                    ComponentClass.selector):
+                if is_new(element.get_attribute(key) if key else element.text):
+                    yield bound(element)
+            return
+
+        root, scroll, idle_since = self._element, False, None
+        scripts = _AsyncScripts(driver, ELEMENT_TIMEOUT)
+        try:
+            while True:
+                batch = scripts.run(
+                    ITER_ROWS_SCRIPT, root, ComponentClass.selector, key,
+                    scroll, int(settle * 1000))
+                progress = scroll and not batch['end']
+                for row_key, element in batch['rows']:
+                    if is_new(row_key):
+                        progress = True
+                        yield bound(element)
+                if progress:
+                    idle_since = None
+                elif idle_since is None:
+                    idle_since = time.time()
+                elif time.time() - idle_since > idle_timeout:
+                    return
+                else:
+                    time.sleep(settle)
+                scroll = True
+        finally:
+            scripts.restore()
+
     def get_element(self, selector, driver=None):
         """Get the DOM element identified by the css selector"""
+        from selenium.webdriver.common.by import By
+        from selenium.webdriver.support import expected_conditions as ec
         return _wait_for_condition(
             ec.presence_of_element_located((By.CSS_SELECTOR, selector)),
             self,
-            message='No element found with selector "{0}".'.format(selector),
+            message=WaitDiagnostics(
+                'No element found with selector "{selector}".', selector),
             driver=driver
         )
 
     def get_clickable_element(self, selector, driver=None):
         """Return an element that can be clicked, or raise an error"""
+        from selenium.webdriver.common.by import By
+        from selenium.webdriver.support import expected_conditions as ec
         return _wait_for_condition(
             ec.element_to_be_clickable((By.CSS_SELECTOR, selector)),
             self,
-            message='No clickable element found with selector "{0}".'.format(
+            message=WaitDiagnostics(
+                'No clickable element found with selector "{selector}".',
                 selector),
             driver=driver
         )
 
     def get_visible_element(self, selector):
         """Return an element that is visible, or raise an error"""
+        from selenium.webdriver.common.by import By
+        from selenium.webdriver.support import expected_conditions as ec
         return _wait_for_condition(
             ec.visibility_of_element_located((By.CSS_SELECTOR, selector)),
             self,
-            message='No visible element found with selector "{0}".'.format(
+            message=WaitDiagnostics(
+                'No visible element found with selector "{selector}".',
                 selector)
         )
 
     def get_element_by_link_text(self, link_text):
         """Get the DOM element identified by the css selector"""
+        from selenium.webdriver.common.by import By
+        from selenium.webdriver.support import expected_conditions as ec
         return _wait_for_condition(
             ec.presence_of_element_located((By.LINK_TEXT, link_text)),
             self,
-            message='No link with text "{0}".'.format(link_text)
+            message=WaitDiagnostics(
+                'No link with text "{selector}".', link_text)
         )
 
     def get_elements(self, selector):
         """Get a list of elements identified by the css selector"""
+        from selenium.webdriver.common.by import By
+        from selenium.webdriver.support import expected_conditions as ec
         return _wait_for_condition(
             ec.presence_of_all_elements_located((By.CSS_SELECTOR, selector)),
-            self
+            self,
+            message=WaitDiagnostics(
+                'No elements found with selector "{selector}".', selector)
         )
 
     def get_attribute(self, attribute):
         """Return the value of an attribute of the component"""
         return self._element.get_attribute(attribute)
 
+    def snapshot(self):
+        """Return an immutable snapshot of the component's DOM
+
+        The whole subtree is read in a single command, and can then be
+        queried with CSS selectors locally, see keteparaha.snapshot.
+        """
+        return snapshot_element(self._element)
+
+    def assert_visually_matches(self, baseline, **options):
+        """Assert a screenshot of the page or component matches a baseline
+
+        See keteparaha.visual, the options are passed on to
+        assert_visually_matches.
+        """
+        return assert_visually_matches(self, baseline, **options)
+
     def wait_for_invisibility(self, selector):
         """Pause until the element identified by selector is invisible"""
+        from selenium.webdriver.common.by import By
+        from selenium.webdriver.support import expected_conditions as ec
         return _wait_for_condition(
             ec.invisibility_of_element_located((By.CSS_SELECTOR, selector)),
-            self
+            self,
+            message=WaitDiagnostics(
+                'Element with selector "{selector}" is still visible.',
+                selector)
         )
 
     def text_in_element(self, selector, text):
         """Return whether the text is in the element identified by selector"""
+        from selenium.webdriver.common.by import By
+        from selenium.webdriver.support import expected_conditions as ec
         return _wait_for_condition(
             ec.text_to_be_present_in_element(
                 (By.CSS_SELECTOR, selector), text),
             self,
-            message='"{0}" not found in "{1}".'.format(
-                text, self.get_component(selector).text)
+            message=WaitDiagnostics(
+                '"{expected}" not found in "{actual}".', selector, text,
+                actual=lambda: self._element.find_element_by_css_selector(
+                    selector).text)
         )
 
     def has_text(self, text):
@@ -267,8 +779,9 @@ class _SeleniumWrapper(object):
         return _wait_for_condition(
             text_to_be_present_in_component(self, text),
             self,
-            message='"{0}" not found in "{1}".'.format(
-                text, self._element.text)
+            message=WaitDiagnostics(
+                '"{expected}" not found in "{actual}".', expected=text,
+                actual=lambda: self._element.text)
         )
 
     def _click(self, component, opens=None):
@@ -282,13 +795,25 @@ class _SeleniumWrapper(object):
 
         _wait_for_condition(
             component_to_be_clickable(component), component,
-            message='"{0}" was never clickable'.format(self)
+            message=WaitDiagnostics(
+                '"{selector}" was never clickable.', component)
         )
 
         component._element.click()
+        return self._opened(opens)
+
+    def _opened(self, opens=None):
+        """Return what an action opened
+
+        opens -- a keteparaha.page.Component to initialise and return
+        returns -- either a new Page object if the url changes, the initialised
+        Component passed in as opens, or itself
+        """
+        if self.page.wait_for_idle:
+            self.page.wait_until_idle()
         if opens and isinstance(opens, basestring):
             # open is a string look it up in registry
-            return self._registry(opens)(self)
+            return self._scope(opens)(self)
         if opens and issubclass(opens, Component) and isclass(opens):
             # open is an Component class, use it
             return opens(self)
@@ -296,22 +821,22 @@ class _SeleniumWrapper(object):
             # open is an initialised component, use it
             return opens
 
-        if self.url != self.location() and self.location() in self._registry:
-             # We have a page with a simple url
-            return self._registry(self.location())(driver=self._driver)
-        if (not match_url(self.url, (self.location(),))
-            and match_url(self.location(), self._registry.keys())):
-            # We have a page with a complex url that's in the registry
-                match, args, kwargs = match_url(
-                    self.location(),
-                    self._registry.keys()
-                )
-                page = self._registry[match](driver=self._driver)
+        location = self.location()
+        if self.url != location and location in self._scope:
+            # We have a page with a simple url
+            return self._scope[location](driver=self._driver)
+        if not match_url(self.url, (location,)):
+            matched = match_url(location, self._scope.urls())
+            if matched:
+                # We have a page with a complex url that's in the registry
+                match, args, kwargs = matched
+                page = self._scope[match](driver=self._driver)
                 page.setup(*args, **kwargs)
                 return page
 
         return self
 
+    @recorded
     def click(self, selector=None, opens=None):
         """Main method for interacting with a page or component
 
@@ -323,7 +848,7 @@ class _SeleniumWrapper(object):
         """
         if isinstance(selector, basestring):
             # selector passed in, get component class from registry
-            component = self._registry(selector)(self)
+            component = self._scope(selector)(self)
             return self._click(component, opens)
         elif isinstance(selector, Component) and isclass(selector):
             # We already have a component class, so just use it
@@ -341,11 +866,13 @@ class _SeleniumWrapper(object):
             'selector, "{0}", not a string or Component instance.'.format(
                 selector))
 
+    @recorded
     def click_link(self, link_text, opens=None):
         component = Component(self, find_by='link_text')
         component.selector = link_text
         return self._click(component, opens)
 
+    @recorded
     def click_button(self, button_text, opens=None):
         """Find buttons on the page and click the first one with the text"""
         component = Component(self, find_by='button_text')
@@ -356,23 +883,57 @@ class _SeleniumWrapper(object):
         """The current page location without any query parameters"""
         return self.page._driver.current_url
 
-    def select_option(self, selector, option_text):
-        """Select option in dropdown identified by selector with given text"""
+    @recorded
+    def select_option(self, selector, option_text=None, value=None,
+                      index=None):
+        """Select options in the dropdown identified by selector
 
-        def find_and_select(selector, option_text):
-            return Select(
-                self.get_element(selector)
-            ).select_by_visible_text(option_text),
+        Options are chosen by their visible text, value or index. Pass a list
+        to select several options of a multiple select at once. In browsers
+        with JavaScript the options are found and selected in one command,
+        however many options the dropdown has, and input and change events
+        are fired.
+        """
+        by, wanted = next(
+            ((by, wanted) for by, wanted in (
+                ('text', option_text), ('value', value), ('index', index))
+             if wanted is not None),
+            (None, None))
+        if by is None:
+            raise ValueError('Pass the option_text, value or index to select')
+        if not isinstance(wanted, (list, tuple)):
+            wanted = [wanted]
+
+        def find_and_select(selector, by, wanted):
+            element = self.get_element(selector)
+            if _runs_javascript(self.page._driver):
+                missing = element.parent.execute_script(
+                    SELECT_OPTIONS_SCRIPT, element, by, list(wanted))
+                if missing:
+                    raise exceptions.NoSuchElementException(
+                        'No option with {0} {1} in "{2}"'.format(
+                            by, ', '.join(map(repr, missing)), selector))
+                return
+            from selenium.webdriver.support.select import Select
+            select = Select(element)
+            choose = {
+                'text': select.select_by_visible_text,
+                'value': select.select_by_value,
+                'index': select.select_by_index,
+            }[by]
+            for option in wanted:
+                choose(option)
 
         retryable_find_and_select = flow.retry(
             find_and_select, exceptions.NoSuchElementException
         )
-        return retryable_find_and_select(selector, option_text)
+        return retryable_find_and_select(selector, by, wanted)
 
     def scroll_into_view(self):
         """Scroll the window until the component is visible"""
         self._element.location_once_scrolled_into_view
 
+    @recorded
     def clear(self, selector):
         """Clear text out of input identified by CSS selector"""
         try:
@@ -382,13 +943,27 @@ class _SeleniumWrapper(object):
             raise exceptions.WebDriverException(
                 'You cannot clear that element')
 
+    def actions(self):
+        """Start a sequence of mouse and keyboard actions
+
+        The elements they target are found first and the actions are then
+        performed in one go, see keteparaha.actions.
+        """
+        return ActionSequence(self)
+
+    @recorded
     def hover(self, selector, opens=None):
-        """Hover over element identified by CSS selector"""
-        ActionChains(self._driver).move_to_element(
-            self.get_element(selector)).perform()
-        if opens:
-            return self._get_component_class(opens)(self)
+        """Hover over element identified by CSS selector
+
+        Returns what hovering opened, if opens is given.
+        """
+        actions = ActionSequence(self).hover(selector)
+        if opens is None:
+            actions._perform()
+        else:
+            return actions.perform(opens)
 
+    @recorded
     def enter_text(self, selector, text):
         """Enter text into DOM element identified by selector
 
@@ -403,7 +978,7 @@ class _SeleniumWrapper(object):
                 value_in_place = element.get_attribute("value") or element.text
             except exceptions.StaleElementReferenceException:
                 return
-            expected = "".join([unicode(v) for v in text])
+            expected = "".join([text_type(v) for v in text])
             if value_in_place == expected:
                 return
             try:
@@ -416,28 +991,76 @@ class _SeleniumWrapper(object):
         raise AssertionError("Unable to correctly type {0}".format(text))
 
 
+def _selector_chain(component):
+    """The (selector, index) of component and each component it is in
+
+    The chain starts with the outermost component. Returns None if any of
+    them is not found with a CSS selector.
+    """
+    chain = []
+    while isinstance(component, Component):
+        if component._find_by == 'selector':
+            chain.append((component.selector, None))
+        elif component._find_by == 'index_position':
+            chain.append((component.selector, component._index_position))
+        else:
+            return None
+        component = component._parent
+    chain.reverse()
+    return chain
+
+
+def _find_by_selector_chain(component):
+    """Find a nested component's element with a single command
+
+    Otherwise every component it is inside would be found in turn. Returns
+    None when that isn't possible, or the element isn't there (yet).
+    """
+    chain = _selector_chain(component)
+    if not chain or len(chain) < 2:
+        return None
+    driver = component.page._driver
+    if not _runs_javascript(driver):
+        return None
+    try:
+        element = driver.execute_script(SELECTOR_CHAIN_SCRIPT, chain)
+    except exceptions.WebDriverException:
+        return None
+    from selenium.webdriver.remote.webelement import WebElement
+    return element if isinstance(element, WebElement) else None
+
+
 class _WebElementProxy(object):
-    """A proxy to the Selenium WebElement identified by obj's selector"""
+    """A proxy to the Selenium WebElement identified by obj's selector
+
+    Nested components that are all found by CSS selector are resolved in one
+    command. Otherwise each component is found inside its parent's element.
+    """
     def __init__(self):
         self.selector = 'html'
 
     def __get__(self, obj, owner):
         selector = obj.selector if hasattr(obj, 'selector') else self.selector
 
+        element = _find_by_selector_chain(obj)
+        if element is not None:
+            return element
+
         if obj._find_by == 'selector':
             try:
                 return obj._driver.find_element_by_css_selector(selector)
             except exceptions.NoSuchElementException:
-                return WebDriverWait(obj._driver, ELEMENT_TIMEOUT).until(
+                from selenium.webdriver.common.by import By
+                from selenium.webdriver.support import (
+                    expected_conditions as ec)
+                return _wait_for_condition(
                     ec.presence_of_element_located(
-                        (
-                            By.CSS_SELECTOR,
-                            selector
-                        )
-                    ),
-                    'No element "{0}", waited {1} seconds'.format(
-                        selector, ELEMENT_TIMEOUT
-                    )
+                        (By.CSS_SELECTOR, selector)),
+                    obj,
+                    message=WaitDiagnostics('No element "{selector}".',
+                                            selector),
+                    driver=obj._driver,
+                    timeout=ELEMENT_TIMEOUT
                 )
 
         elif obj._find_by == 'button_text':
@@ -452,18 +1075,21 @@ class _WebElementProxy(object):
             try:
                 return obj._driver.find_element_by_link_text(selector)
             except exceptions.NoSuchElementException:
-                return WebDriverWait(obj._driver, ELEMENT_TIMEOUT).until(
-                    ec.presence_of_element_located(
-                        (
-                            By.LINK_TEXT,
-                            selector
-                        )
-                    ),
-                    'No link with text "{0}", waited {1} seconds'.format(
-                        selector, ELEMENT_TIMEOUT
-                    )
+                from selenium.webdriver.common.by import By
+                from selenium.webdriver.support import (
+                    expected_conditions as ec)
+                return _wait_for_condition(
+                    ec.presence_of_element_located((By.LINK_TEXT, selector)),
+                    obj,
+                    message=WaitDiagnostics('No link with text "{selector}".',
+                                            selector),
+                    driver=obj._driver,
+                    timeout=ELEMENT_TIMEOUT
                 )
 
+        elif obj._find_by == 'element':
+            return obj._bound_element
+
         elif obj._find_by == 'index_position':
             idx = obj._index_position
             return obj._driver.find_elements_by_css_selector(selector)[idx]
@@ -475,14 +1101,24 @@ class _WebElementProxy(object):
         raise AttributeError()
 
 class WebDriverOnly(object):
-    """This attribute must be a WebDriver instance"""
+    """This attribute must be a WebDriver instance
+
+    The driver is kept on each instance, so pages driving different browsers
+    at the same time do not share it.
+    """
     def __set__(self, obj, value):
+        from selenium.webdriver.remote.webdriver import WebDriver
         if not isinstance(value, WebDriver):
             raise TypeError('driver must be an instance of WebDriver')
-        self.driver = value
+        obj.__dict__['_webdriver'] = value
 
     def __get__(self, obj, owner):
-        return self.driver
+        if obj is None:
+            return self
+        try:
+            return obj.__dict__['_webdriver']
+        except KeyError:
+            raise AttributeError('No driver has been set')
 
 
 class _BaseComponent(object):
@@ -520,7 +1156,7 @@ class Component(
 
     """
 
-    _registry = _Registry()
+    _registry = _root_registry
     selector = None
 
     def __repr__(self):
@@ -563,9 +1199,23 @@ class Page(
             self.enter_text("input[name=username]", username)
             self.enter_text("input[name=password]", password)
             return self.click("input[type=submit]")
+
+    page_load_strategy decides how long visiting the page waits for:
+    "normal" waits until it has loaded, "eager" only until its DOM is ready,
+    without waiting for images, stylesheets and other resources, and "none"
+    until the browser has started on the new page. Only "normal" is
+    possible without JavaScript.
+
+    Set wait_for_idle to wait, after the page is visited and after clicks
+    and other actions on it, until the app has finished its requests,
+    timers and animations and been quiet for idle_quiet seconds. Waiting
+    is done in the browser, by a single script.
     """
     _driver = WebDriverOnly()
-    _registry = _Registry()
+    _registry = _root_registry
+    page_load_strategy = 'normal'
+    wait_for_idle = False
+    idle_quiet = 0.1
 
     def __init__(self, driver=None):
         self._find_by = 'selector'
@@ -575,7 +1225,86 @@ class Page(
         except TypeError:   # Driver was a WebElement, not WebDriver
             self._driver = driver.parent
         if self.location() != self.url:
-            self._driver.get(self.url)
+            self.visit(self.url)
+
+    @recorded
+    def visit(self, url):
+        """Load url in the browser, waiting as set by page_load_strategy"""
+        with measure('navigation', url, page=type(self).__name__,
+                     strategy=self.page_load_strategy):
+            self._visit(url)
+        if self.wait_for_idle:
+            self.wait_until_idle()
+
+    @recorded
+    def wait_until_idle(self, timeout=ELEMENT_TIMEOUT):
+        """Wait until the app has no requests, timers or animations pending
+
+        XMLHttpRequest and fetch requests, timers of up to a second and
+        animations that end are tracked once this has been called on a
+        page. Requests started before that, while a new page loads, are
+        waited for by waiting for the page to finish loading. Drivers
+        without JavaScript return straight away.
+        """
+        driver = self._driver
+        if not _runs_javascript(driver):
+            return
+        start = time.time()
+        state = {}
+        scripts = _AsyncScripts(driver, timeout + 1)
+        try:
+            with measure('wait', 'app idle', condition='app_idle',
+                         timeout=timeout) as details:
+                while time.time() - start < timeout:
+                    remaining = timeout - (time.time() - start)
+                    try:
+                        state = scripts.run(
+                            IDLE_SCRIPT, int(self.idle_quiet * 1000),
+                            int(remaining * 1000))
+                    except exceptions.WebDriverException:
+                        time.sleep(0.05)  # The page was unloaded meanwhile
+                    else:
+                        if state['idle']:
+                            return
+                        break
+                details['timed_out'] = True
+        finally:
+            scripts.restore()
+        pending = state.get('pending', {})
+        diagnostics = WaitDiagnostics(
+            'The app at "{selector}" was still busy: {actual}.', self.url,
+            actual=lambda: ', '.join(
+                '{0} {1}'.format(name, pending[name])
+                for name in sorted(pending)) or 'no answer from the page')
+        diagnostics.condition = 'app_idle'
+        diagnostics.timeout = timeout
+        diagnostics.waited = time.time() - start
+        error = exceptions.TimeoutException(text_type(diagnostics))
+        error.diagnostics = diagnostics
+        raise error
+
+    def _visit(self, url):
+        driver = self._driver
+        if self.page_load_strategy == 'normal' or not _runs_javascript(
+                driver):
+            return driver.get(url)
+        driver.execute_script(NAVIGATE_SCRIPT, url)
+
+        def loaded(driver):
+            try:
+                return driver.execute_script(
+                    LOADED_SCRIPT, self.page_load_strategy)
+            except exceptions.WebDriverException:
+                return False  # The old page is being unloaded
+
+        _wait_for_condition(
+            loaded,
+            self,
+            message=WaitDiagnostics(
+                'The page at "{selector}" did not load.', url),
+            driver=driver,
+            timeout=ELEMENT_TIMEOUT
+        )
 
     def setup(self, *args, **kwargs):
         raise NotImplementedError(
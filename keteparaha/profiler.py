@@ -0,0 +1,248 @@
+# -*- coding: utf-8 -*-
+"""Where the time in browser tests goes
+
+When KETEPARAHA_PROFILE is set to a file path, every BrowserTestCase test
+records a timeline of the browsers it started, the pages it visited, the
+waits it made and the snapshots it took. When the test run ends a JSON
+report with every timeline, the slowest tests and the slowest waits is
+written to that path, for tracking over time.
+
+Waits record how long they took, how much of that was spent checking the
+condition rather than sleeping between checks, and whether they timed out.
+
+Waits are also totalled by selector and the line of test code that waited,
+and the report lists those that always time out, wasting their whole
+timeout, and those that always succeed on the first check.
+
+Test runners with several processes can put {pid} in the path, it is
+replaced with the id of each process.
+
+Example:
+    KETEPARAHA_PROFILE=profile.json python -m pytest tests/
+
+    {"tests": [...], "slowest_tests": [...], "slowest_waits": [...]}
+
+"""
+from __future__ import unicode_literals
+import atexit
+import json
+import os
+import sys
+import threading
+import time
+
+__all__ = ['Profiler', 'Timeline', 'WaitStats', 'measure', 'profiler']
+
+PROFILE_ENV = 'KETEPARAHA_PROFILE'
+""" (str): The environment variable holding the path of the report"""
+
+
+class Timeline(object):
+    """The events recorded during one test"""
+
+    def __init__(self, test_id):
+        self.test_id = test_id
+        self.start = time.time()
+        self.duration = None
+        self.events = []
+
+    def __repr__(self):
+        return 'Timeline({0!r}, {1} events)'.format(
+            self.test_id, len(self.events))
+
+    def record(self, kind, name, start, duration, **details):
+        event = dict(details, kind=kind, name=name,
+                     offset=start - self.start, duration=duration)
+        self.events.append(event)
+        return event
+
+    def total(self, kind):
+        """The seconds spent in events of a kind"""
+        return sum(
+            event['duration'] for event in self.events
+            if event['kind'] == kind
+        )
+
+    def to_dict(self):
+        return {
+            'test': self.test_id,
+            'duration': self.duration,
+            'totals': dict(
+                (kind, self.total(kind))
+                for kind in sorted(set(e['kind'] for e in self.events))
+            ),
+            'events': self.events,
+        }
+
+
+def call_site():
+    """The file and line of the code outside keteparaha that called in"""
+    package = os.path.dirname(os.path.abspath(__file__))
+    frame = sys._getframe(1)
+    while frame is not None and os.path.dirname(
+            os.path.abspath(frame.f_code.co_filename)) == package:
+        frame = frame.f_back
+    if frame is None:
+        return None
+    return '{0}:{1}'.format(frame.f_code.co_filename, frame.f_lineno)
+
+
+class WaitStats(object):
+    """The outcomes of waits, by selector and call site"""
+
+    def __init__(self):
+        self.waits = {}
+        self._lock = threading.Lock()
+
+    def record(self, selector, site, duration, timed_out, checks):
+        """Add the outcome of a wait
+
+        checks is the number of times its condition was checked, a wait that
+        succeeds on the first check never slept.
+        """
+        with self._lock:
+            stats = self.waits.get((selector, site))
+            if stats is None:
+                stats = self.waits[(selector, site)] = {
+                    'selector': selector, 'call_site': site, 'calls': 0,
+                    'timeouts': 0, 'instant': 0, 'total': 0.0, 'max': 0.0,
+                }
+            stats['calls'] += 1
+            stats['timeouts'] += bool(timed_out)
+            stats['instant'] += not timed_out and checks <= 1
+            stats['total'] += duration
+            stats['max'] = max(stats['max'], duration)
+
+    def report(self, min_calls=2):
+        """Waits that always timed out, or always succeeded straight away
+
+        Only waits made at least min_calls times are listed. Both lists are
+        ordered by the total time spent in the wait.
+        """
+        waits = sorted(
+            self.waits.values(), key=lambda w: w['total'], reverse=True)
+        return {
+            'always_time_out': [
+                dict(wait) for wait in waits
+                if wait['calls'] >= min_calls
+                and wait['timeouts'] == wait['calls']
+            ],
+            'always_instant': [
+                dict(wait) for wait in waits
+                if wait['calls'] >= min_calls
+                and wait['instant'] == wait['calls']
+            ],
+            'waits': [dict(wait) for wait in waits],
+        }
+
+
+class _Measurement(object):
+    """Records the time spent inside a with block as an event"""
+
+    def __init__(self, timeline, kind, name, details):
+        self.timeline = timeline
+        self.kind = kind
+        self.name = name
+        self.details = details
+
+    def __enter__(self):
+        self.start = time.time()
+        return self.details
+
+    def __exit__(self, *exc_info):
+        self.timeline.record(
+            self.kind, self.name, self.start, time.time() - self.start,
+            **self.details)
+
+
+class _NotMeasured(object):
+
+    def __enter__(self):
+        return {}
+
+    def __exit__(self, *exc_info):
+        pass
+
+
+_not_measured = _NotMeasured()
+
+
+class Profiler(object):
+    """Keeps a Timeline for each test run"""
+
+    def __init__(self):
+        self.timelines = []
+        self.current = None
+        self.wait_stats = WaitStats()
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return bool(os.environ.get(PROFILE_ENV))
+
+    def start_test(self, test_id):
+        if self.enabled:
+            self.current = Timeline(test_id)
+
+    def stop_test(self):
+        timeline, self.current = self.current, None
+        if timeline is not None:
+            timeline.duration = time.time() - timeline.start
+            with self._lock:
+                self.timelines.append(timeline)
+        return timeline
+
+    def measure(self, kind, name, **details):
+        """Context manager recording the time spent in it to the test
+
+        Details are stored with the event, the dict of them is returned by
+        entering the context so more can be added. Nothing is recorded
+        outside of a test.
+        """
+        timeline = self.current
+        if timeline is None:
+            return _not_measured
+        return _Measurement(timeline, kind, name, details)
+
+    def report(self, count=20):
+        """The report of all the timelines so far"""
+        timelines = [timeline.to_dict() for timeline in self.timelines]
+        waits = [
+            dict(event, test=timeline['test'])
+            for timeline in timelines for event in timeline['events']
+            if event['kind'] == 'wait'
+        ]
+        return {
+            'tests': timelines,
+            'slowest_tests': [
+                {'test': timeline['test'], 'duration': timeline['duration'],
+                 'totals': timeline['totals']}
+                for timeline in sorted(
+                    timelines, key=lambda t: t['duration'], reverse=True
+                )[:count]
+            ],
+            'slowest_waits': sorted(
+                waits, key=lambda e: e['duration'], reverse=True)[:count],
+            'wait_budget': self.wait_stats.report(),
+        }
+
+    def write(self, path=None):
+        """Write the report as JSON to path, or KETEPARAHA_PROFILE"""
+        path = path or os.environ.get(PROFILE_ENV)
+        if not path or not self.timelines:
+            return None
+        path = path.replace('{pid}', str(os.getpid()))
+        with open(path, 'w') as f:
+            json.dump(self.report(), f, indent=2, sort_keys=True)
+        return path
+
+
+profiler = Profiler()
+""" (Profiler): The profiler BrowserTestCase records to"""
+
+measure = profiler.measure
+
+
+@atexit.register
+def _write_report():
+    profiler.write()
@@ -0,0 +1,262 @@
+# -*- coding: utf-8 -*-
+"""Browser profiles and options that start quickly and stay quiet
+
+A new Firefox profile is built from scratch for every session, and on its
+first run the browser reports telemetry, fetches studies and opens welcome
+pages. firefox_profile_template writes a user.js turning that off once, on
+disk, in KETEPARAHA_CACHE or ~/.cache/keteparaha, and rewrites it whenever
+its preferences change. It is only the preferences, not a profile Firefox
+has already started with. Every session still gets a copy of it, which
+FirefoxProfile writes its own preferences into, so what is saved is the
+network chatter of a first run, not the time to create the profile.
+
+Options objects are built once for each combination of driver, headless
+mode, window size, image loading and blocked urls, and each call gets a
+copy of them.
+
+Requests to blocked urls, like analytics, fonts and third party widgets, are
+sent by a proxy auto-config script to a closed local port, so they fail
+straight away instead of holding up the page load.
+
+Example:
+    driver = webdriver.Firefox(
+        **driver_options('Firefox', webdriver.Firefox, images=False))
+
+"""
+from __future__ import unicode_literals
+import base64
+import copy
+import hashlib
+import inspect
+import json
+import os
+import shutil
+import tempfile
+import threading
+
+from six.moves.urllib.request import pathname2url
+
+__all__ = [
+    'CHROME_ARGUMENTS',
+    'DRIVERS',
+    'FIREFOX_PREFERENCES',
+    'blocking_pac',
+    'browser_options',
+    'driver_options',
+    'firefox_profile',
+    'firefox_profile_template',
+]
+
+DRIVERS = ('Chrome', 'Firefox')
+""" (tuple): The drivers that profiles and options are built for"""
+
+FIREFOX_PREFERENCES = {
+    'app.normandy.enabled': False,
+    'browser.aboutwelcome.enabled': False,
+    'datareporting.policy.firstRunURL': '',
+    'network.prefetch-next': False,
+    'toolkit.telemetry.reportingpolicy.firstRun': False,
+    'toolkit.telemetry.unified': False,
+}
+""" (dict): Firefox preferences turning off first run pages, studies,
+    telemetry and prefetching. FirefoxProfile already turns off updates.
+"""
+
+CHROME_ARGUMENTS = (
+    '--disable-background-networking',
+    '--disable-component-update',
+    '--disable-default-apps',
+    '--disable-sync',
+    '--no-default-browser-check',
+    '--no-first-run',
+)
+""" (tuple): Chrome arguments turning off updates, syncing and first run
+    pages
+"""
+
+BLOCKED_PROXY = 'PROXY 127.0.0.1:9'
+""" (str): Where requests to blocked urls are sent, nothing listens there"""
+
+PAC_SCRIPT = """function FindProxyForURL(url, host) {{
+    var blocked = {0};
+    for (var i = 0; i < blocked.length; i++) {{
+        if (shExpMatch(url, blocked[i]) || shExpMatch(host, blocked[i])) {{
+            return '{1}';
+        }}
+    }}
+    return 'DIRECT';
+}}
+"""
+
+_templates = {}
+_options = {}
+_lock = threading.Lock()
+
+
+def cache_directory():
+    """The directory profile templates are kept in"""
+    return os.environ.get('KETEPARAHA_CACHE') or os.path.join(
+        os.path.expanduser('~'), '.cache', 'keteparaha')
+
+
+def _firefox_preferences(images):
+    preferences = dict(FIREFOX_PREFERENCES)
+    if not images:
+        preferences['permissions.default.image'] = 2
+    return preferences
+
+
+def firefox_profile_template(images=True):
+    """Return the path of the Firefox profile template, building it if needed
+
+    images -- whether the profile loads images
+    """
+    preferences = _firefox_preferences(images)
+    user_js = ''.join(
+        'user_pref("{0}", {1});\n'.format(key, json.dumps(value))
+        for key, value in sorted(preferences.items())
+    )
+    key = hashlib.sha1(user_js.encode('utf-8')).hexdigest()[:12]
+    with _lock:
+        path = _templates.get(key)
+        if path is not None and os.path.isdir(path):
+            return path
+        path = os.path.join(cache_directory(), 'firefox-profile-' + key)
+        if not os.path.isdir(path):
+            if not os.path.isdir(cache_directory()):
+                os.makedirs(cache_directory())
+            # Built beside the template and moved into place, so other
+            # processes never see a half written one
+            building = tempfile.mkdtemp(dir=cache_directory())
+            with open(os.path.join(building, 'user.js'), 'w') as f:
+                f.write(user_js)
+            try:
+                os.rename(building, path)
+            except OSError:
+                shutil.rmtree(building, ignore_errors=True)
+        _templates[key] = path
+        return path
+
+
+def firefox_profile(images=True):
+    """A FirefoxProfile for one session, copied from the template"""
+    from selenium import webdriver
+    return webdriver.FirefoxProfile(firefox_profile_template(images))
+
+
+def blocking_pac(blocked):
+    """A proxy auto-config script blocking urls matching the patterns
+
+    Patterns are shell style, e.g. "*.google-analytics.com", and are matched
+    against both the url and its host.
+    """
+    return PAC_SCRIPT.format(json.dumps(list(blocked)), BLOCKED_PROXY)
+
+
+def _arguments(name, headless, size, blocked=()):
+    arguments = []
+    if headless:
+        arguments.append('-headless' if name == 'Firefox' else '--headless')
+    if size and (headless or name == 'Chrome'):
+        arguments.append('--window-size={0},{1}'.format(*size))
+    if name == 'Chrome':
+        arguments.extend(CHROME_ARGUMENTS)
+        if blocked:
+            arguments.append(
+                '--proxy-pac-url=data:application/x-ns-proxy-autoconfig;'
+                'base64,' + base64.b64encode(
+                    blocking_pac(blocked).encode('utf-8')).decode('ascii'))
+    return arguments
+
+
+def _build_options(name, headless, size, images, blocked):
+    from selenium import webdriver
+    if name == 'Chrome':
+        options = webdriver.ChromeOptions()
+        if not images:
+            options.add_experimental_option('prefs', {
+                'profile.managed_default_content_settings.images': 2})
+    else:
+        options = webdriver.firefox.options.Options()
+    for argument in _arguments(name, headless, size, blocked):
+        options.add_argument(argument)
+    return options
+
+
+def browser_options(name, headless=False, size=None, images=True,
+                    blocked=()):
+    """The options object for the named driver, built once for each key
+
+    Options are changed by the drivers they are given to, and may be by the
+    caller, so each call returns a copy of them.
+    """
+    key = (name, headless, tuple(size) if size else None, images,
+           tuple(blocked))
+    with _lock:
+        options = _options.get(key)
+        if options is None:
+            options = _options[key] = _build_options(*key)
+    return copy.deepcopy(options)
+
+
+def _options_keyword(driver, names):
+    """The name of the keyword argument driver takes its options as
+
+    Older versions of Selenium name it after the browser.
+    """
+    argspec = getattr(inspect, 'getfullargspec', None) or inspect.getargspec
+    try:
+        args = argspec(driver.__init__).args
+    except TypeError:
+        return names[0]
+    for name in names:
+        if name in args:
+            return name
+    return names[-1]
+
+
+def _firefox_session_profile(images, blocked):
+    profile = firefox_profile(images)
+    if blocked:
+        pac = os.path.join(profile.path, 'blocked.pac')
+        with open(pac, 'w') as f:
+            f.write(blocking_pac(blocked))
+        profile.set_preference('network.proxy.type', 2)
+        profile.set_preference(
+            'network.proxy.autoconfig_url', 'file://' + pathname2url(pac))
+    return profile
+
+
+def driver_options(name, driver, headless=False, size=None, images=True,
+                   blocked=(), page_load_strategy=None):
+    """Keyword arguments that start the named driver with cached options
+
+    name -- "Firefox" or "Chrome"
+    driver -- the driver class, its arguments are named differently in
+        different versions of Selenium
+    headless -- start the browser in its native headless mode
+    size -- the (width, height) of the window
+    images -- whether the browser loads images
+    blocked -- shell style patterns of urls the browser must not load
+    page_load_strategy -- "normal", "eager" or "none", how long navigating
+        waits for pages to load
+    """
+    from selenium import webdriver
+    options = browser_options(name, headless, size, images, blocked)
+    if name == 'Chrome':
+        kwargs = {
+            _options_keyword(driver, ('options', 'chrome_options')): options}
+        if page_load_strategy:
+            kwargs['desired_capabilities'] = dict(
+                webdriver.DesiredCapabilities.CHROME,
+                pageLoadStrategy=page_load_strategy)
+        return kwargs
+    kwargs = {
+        _options_keyword(driver, ('options', 'firefox_options')): options,
+        'firefox_profile': _firefox_session_profile(images, blocked),
+    }
+    if page_load_strategy:
+        kwargs['capabilities'] = dict(
+            webdriver.DesiredCapabilities.FIREFOX,
+            pageLoadStrategy=page_load_strategy)
+    return kwargs
@@ -0,0 +1,232 @@
+# -*- coding: utf-8 -*-
+"""Recording the WebDriver commands of a test and replaying them offline
+
+Every WebDriver command, from the driver or its elements, goes through the
+driver's execute method. A Recorder wraps it, logging each command and its
+response, or the error it raised, to a file of JSON lines, compressed if the
+path ends in .gz.
+
+A ReplayDriver answers the same commands from the file, in order, without a
+browser. Page object changes can be checked against a recorded flow in
+milliseconds, and any difference in the commands issued raises a
+ReplayMismatch saying where the flow diverged.
+
+Only commands from the thread that started recording are recorded, so the
+flight recorder's screenshots, taken in the background, are left out.
+
+Example:
+    recorder = Recorder(driver, 'login.jsonl.gz').start()
+    Login(driver).login('a@b.com', 'xxxxx')
+    recorder.stop()
+
+    driver = ReplayDriver('login.jsonl.gz')
+    Login(driver).login('a@b.com', 'xxxxx')
+    driver.command_counts
+
+"""
+from __future__ import unicode_literals
+from collections import Counter
+import gzip
+import io
+import json
+import threading
+
+from selenium.common import exceptions
+from selenium.webdriver.remote.webdriver import WebDriver
+from selenium.webdriver.remote.webelement import WebElement
+
+__all__ = [
+    'Recorder',
+    'ReplayDriver',
+    'ReplayMismatch',
+    'command_counts',
+    'load_recording'
+]
+
+
+class ReplayMismatch(AssertionError):
+    """Raised when a replayed flow issues a different command"""
+
+
+def _serialize(value):
+    """Make a command's params or response JSON serializable"""
+    if isinstance(value, WebElement):
+        return {'ELEMENT': value.id}
+    if isinstance(value, dict):
+        return dict(
+            (key, _serialize(item)) for key, item in value.items()
+            if key != 'sessionId'
+        )
+    if isinstance(value, (list, tuple)):
+        return [_serialize(item) for item in value]
+    return value
+
+
+def _atoms():
+    """The JavaScript atoms selenium runs for element attributes and
+    visibility on W3C browsers, by the name recorded instead of them
+    """
+    from selenium.webdriver.remote import webelement
+    if getattr(webelement, '_load_js', None) and (
+            webelement.getAttribute_js is None):
+        webelement._load_js()
+    return dict(
+        (getattr(webelement, name + '_js'), '<{0} atom>'.format(name))
+        for name in ('getAttribute', 'isDisplayed')
+        if getattr(webelement, name + '_js', None)
+    )
+
+
+def _params(params):
+    """Serialize a command's params, naming any atom instead of including
+    its many kilobytes of source in every command that runs it
+    """
+    params = _serialize(params or {})
+    script = params.get('script')
+    if script:
+        for source, name in _atoms().items():
+            if source in script:
+                params['script'] = name
+    return params
+
+
+def _open(path, mode):
+    return (gzip.open if path.endswith('.gz') else io.open)(path, mode)
+
+
+def load_recording(path):
+    """Return the header and the list of commands in a recording"""
+    with _open(path, 'rb') as f:
+        lines = [
+            json.loads(line) for line in f.read().decode('utf-8').splitlines()
+            if line.strip()
+        ]
+    return lines[0], lines[1:]
+
+
+def command_counts(path):
+    """A Counter of the commands in a recording, to compare versions"""
+    return Counter(entry['command'] for entry in load_recording(path)[1])
+
+
+class Recorder(object):
+    """Records the commands executed by a driver
+
+    The driver's execute method is replaced while recording, so commands
+    from its elements are recorded too.
+    """
+
+    def __init__(self, driver, path):
+        self.driver = driver
+        self.path = path
+        self.entries = []
+        self._execute = None
+        self._thread = None
+
+    def __repr__(self):
+        return 'Recorder({0!r}, {1} commands)'.format(
+            self.path, len(self.entries))
+
+    def start(self):
+        if self._execute is None:
+            self._execute = self.driver.execute
+            self._thread = threading.current_thread()
+            self.driver.execute = self
+        return self
+
+    def __call__(self, driver_command, params=None):
+        if threading.current_thread() is not self._thread:
+            return self._execute(driver_command, params)
+        entry = {'command': driver_command, 'params': _params(params)}
+        self.entries.append(entry)
+        try:
+            response = self._execute(driver_command, params)
+        except exceptions.WebDriverException as exc:
+            entry['error'] = type(exc).__name__
+            entry['message'] = exc.msg
+            raise
+        entry['value'] = _serialize(response.get('value'))
+        return response
+
+    def stop(self):
+        """Stop recording and save the recording"""
+        if self._execute is not None:
+            del self.driver.execute
+            self._execute = None
+        self.save()
+        return self
+
+    def save(self):
+        header = {
+            'capabilities': _serialize(
+                getattr(self.driver, 'capabilities', None) or {}),
+            'w3c': bool(getattr(self.driver, 'w3c', False)),
+        }
+        with _open(self.path, 'wb') as f:
+            for entry in [header] + self.entries:
+                f.write(json.dumps(
+                    entry, sort_keys=True, separators=(',', ':')
+                ).encode('utf-8') + b'\n')
+
+
+class ReplayDriver(WebDriver):
+    """A WebDriver answering commands from a recording
+
+    strict -- also compare the params of each command with the recording,
+        otherwise only the command names are compared
+    """
+
+    def __init__(self, path, strict=True):
+        header, self.entries = load_recording(path)
+        self.path = path
+        self.strict = strict
+        self.position = 0
+        self.command_counts = Counter()
+        self.session_id = 'replay'
+        self.w3c = header.get('w3c', False)
+        self._is_remote = False
+        self._capabilities = header.get('capabilities', {})
+        self._thread = threading.current_thread()
+
+    def __repr__(self):
+        return 'ReplayDriver({0!r})'.format(self.path)
+
+    @property
+    def capabilities(self):
+        """The capabilities of the recorded browser"""
+        return self._capabilities
+
+    @property
+    def remaining(self):
+        """The number of recorded commands not replayed yet"""
+        return len(self.entries) - self.position
+
+    def execute(self, driver_command, params=None):
+        """Answer the command with the next recorded response"""
+        if threading.current_thread() is not self._thread:
+            raise exceptions.WebDriverException(
+                'Commands from other threads were not recorded')
+        if self.position >= len(self.entries):
+            raise ReplayMismatch(
+                'Command {0} "{1}" was not recorded, the recording has '
+                'ended'.format(self.position, driver_command))
+        entry = self.entries[self.position]
+        params = _params(params)
+        if entry['command'] != driver_command or (
+                self.strict and entry['params'] != params):
+            raise ReplayMismatch(
+                'Command {0} was "{1}" {2!r}, but the recording has "{3}" '
+                '{4!r}'.format(self.position, driver_command, params,
+                               entry['command'], entry['params']))
+        self.position += 1
+        self.command_counts[driver_command] += 1
+        if 'error' in entry:
+            error = getattr(
+                exceptions, entry['error'], exceptions.WebDriverException)
+            raise error(entry.get('message'))
+        return {'status': 0, 'value': self._unwrap_value(entry['value'])}
+
+    def quit(self):
+        pass
+
+    close = quit
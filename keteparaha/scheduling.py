@@ -0,0 +1,136 @@
+# -*- coding: utf-8 -*-
+"""Running tests that start from the same browser state back to back
+
+Test methods run in alphabetical order, so consecutive tests bounce between
+users and pages, and each one logs in and loads its first page again.
+Marking a test with the page and user it starts from lets GroupingLoader
+run tests sharing a start state one after another, and a BrowserTestCase
+with reuse_browsers set hands the same warm browser from one to the next,
+still logged in and usually already on the right page.
+
+Example:
+    class OrdersTest(BrowserTestCase):
+        reuse_browsers = True
+
+        def log_in(self, browser, user):
+            LoginPage(browser).login(user, 'xxxxx')
+
+        @starts_on(OrdersPage, user='a@b.com')
+        def test_orders_are_listed(self):
+            orders = self.start_page()
+
+    unittest.main(testLoader=GroupingLoader())
+
+"""
+from __future__ import unicode_literals
+import atexit
+from collections import OrderedDict
+import threading
+import unittest
+
+__all__ = ['BrowserPool', 'GroupingLoader', 'start_state', 'starts_on']
+
+
+def starts_on(page=None, user=None):
+    """Decorator recording the page class and user a test starts from"""
+    def decorate(test):
+        test.start_state = (page, user)
+        return test
+    return decorate
+
+
+def start_state(test):
+    """The (page, user) a test starts from, either may be None
+
+    Set with starts_on, or for every test in a class with the start_page and
+    start_user class attributes.
+    """
+    return _start_state(type(test), test._testMethodName)
+
+
+def _start_state(cls, name):
+    state = getattr(getattr(cls, name, None), 'start_state', None)
+    if state is not None:
+        return state
+    page = getattr(cls, 'start_page', None)
+    # Without the attribute this is BrowserTestCase.start_page itself
+    return (page if isinstance(page, type) else None,
+            getattr(cls, 'start_user', None))
+
+
+def _group_key(state):
+    page, user = state
+    return (
+        user is not None, user or '',
+        page is not None, getattr(page, 'url', None) or '',
+    )
+
+
+class GroupingLoader(unittest.TestLoader):
+    """Loads the tests of each class grouped by the state they start from
+
+    Tests starting as the same user are run together, and within them those
+    starting on the same page. Otherwise tests keep their usual order.
+    Classes are not interleaved, so setUpClass and tearDownClass still run
+    once per class.
+    """
+
+    def getTestCaseNames(self, testCaseClass):
+        names = super(GroupingLoader, self).getTestCaseNames(testCaseClass)
+        return sorted(names, key=lambda name: _group_key(
+            _start_state(testCaseClass, name)))
+
+
+class BrowserPool(object):
+    """Idle browsers kept between tests, by the state they were left in
+
+    max_idle -- the number of idle browsers kept, the least recently used
+        are quit when there are more
+    """
+
+    def __init__(self, max_idle=2):
+        self.max_idle = max_idle
+        self._idle = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return sum(len(browsers) for browsers in self._idle.values())
+
+    def acquire(self, key):
+        """Return an idle browser left in state key, or None"""
+        with self._lock:
+            browsers = self._idle.get(key)
+            if not browsers:
+                return None
+            browser = browsers.pop()
+            if not browsers:
+                del self._idle[key]
+            return browser
+
+    def release(self, key, browser):
+        """Keep browser for the next test starting from state key"""
+        with self._lock:
+            self._idle.setdefault(key, []).append(browser)
+            self._idle[key] = self._idle.pop(key)
+            surplus = []
+            while len(self) > self.max_idle:
+                oldest = next(iter(self._idle))
+                surplus.append(self._idle[oldest].pop(0))
+                if not self._idle[oldest]:
+                    del self._idle[oldest]
+        for browser in surplus:
+            browser.quit()
+
+    def close(self):
+        """Quit every idle browser"""
+        with self._lock:
+            browsers = [b for idle in self._idle.values() for b in idle]
+            self._idle.clear()
+        for browser in browsers:
+            browser.quit()
+
+
+browser_pool = BrowserPool()
+""" (BrowserPool): The pool BrowserTestCase reuses browsers from"""
+
+atexit.register(browser_pool.close)
@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+"""A live server for the WSGI application under test
+
+Real browsers need the application served over HTTP. live_server starts the
+application in a threaded server on an ephemeral port, once per process, and
+keeps it running until the process exits. Test runners that use several
+worker processes get a server, on its own port, in every worker.
+
+Pages are usually written with the url of a deployed site. rebase_pages
+rewrites the urls of registered pages to point at the live server instead.
+
+Example:
+    server = live_server(my_wsgi_app)
+    rebase_pages('http://www.simple.com', server.url)
+    LoginPage(driver)  # visits http://127.0.0.1:<port>/login/
+
+"""
+import atexit
+import os
+import threading
+from wsgiref.simple_server import WSGIRequestHandler, WSGIServer, make_server
+
+from six.moves.socketserver import ThreadingMixIn
+
+from .page import _root_registry
+
+__all__ = ['LiveServer', 'live_server', 'rebase_pages']
+
+
+class _ThreadingWSGIServer(ThreadingMixIn, WSGIServer):
+    """Handle each request in a thread, so browsers can load in parallel"""
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class _QuietHandler(WSGIRequestHandler):
+
+    def log_message(self, format, *args):
+        pass
+
+
+class LiveServer(object):
+    """A WSGI application served in a background thread"""
+
+    def __init__(self, app, host='127.0.0.1', port=0):
+        self.app = app
+        self.host = host
+        self.port = port
+        self._server = None
+        self._thread = None
+
+    def __repr__(self):
+        return 'LiveServer({0!r})'.format(self.url)
+
+    @property
+    def running(self):
+        return self._server is not None
+
+    @property
+    def url(self):
+        """The base url of the server, without a trailing slash"""
+        return 'http://{0}:{1}'.format(self.host, self.port)
+
+    def start(self):
+        """Start serving, a port of 0 picks a free port"""
+        if self.running:
+            return self
+        self._server = make_server(
+            self.host, self.port, self.app,
+            server_class=_ThreadingWSGIServer, handler_class=_QuietHandler)
+        self.port = self._server.server_port
+        self._thread = threading.Thread(
+            target=self._server.serve_forever, name=repr(self))
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if not self.running:
+            return
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread.join()
+        self._server = self._thread = None
+
+
+_servers = {}
+_servers_lock = threading.Lock()
+
+
+def live_server(app):
+    """Return a running LiveServer for app, started once per process"""
+    key = (os.getpid(), id(app))
+    with _servers_lock:
+        server = _servers.get(key)
+        if server is None or not server.running:
+            server = _servers[key] = LiveServer(app).start()
+        return server
+
+
+@atexit.register
+def _stop_servers():
+    for server in list(_servers.values()):
+        server.stop()
+    _servers.clear()
+
+
+_original_urls = {}
+
+
+def rebase_pages(base_url, new_base_url, registry=_root_registry):
+    """Point registered pages whose url starts with base_url at new_base_url
+
+    Pages keep their original url in mind, so pages can be rebased again,
+    for example to another server. Returns the rebased page classes.
+    """
+    base_url = base_url.rstrip('/')
+    new_base_url = new_base_url.rstrip('/')
+    rebased = []
+    for scope in registry.walk():
+        pages = scope.namespaces[scope.URL]
+        for url, cls in list(pages.items()):
+            original = _original_urls.get(cls, url)
+            if not original.startswith(base_url + '/') and (
+                    original != base_url):
+                continue
+            _original_urls[cls] = original
+            del pages[url]
+            cls.url = new_base_url + original[len(base_url):]
+            pages[cls.url] = cls
+            rebased.append(cls)
+    return rebased
@@ -0,0 +1,230 @@
+# -*- coding: utf-8 -*-
+"""Saving a logged in browser session and restoring it in other browsers
+
+Logging in through the login form in every test is slow. SessionState
+captures the cookies, localStorage and sessionStorage of a browser after
+logging in, and restores them into another browser, which is then logged in
+too. SessionCache keeps the states on disk, by user, so they are shared
+between tests and test runs until they expire.
+
+Example:
+    cache = SessionCache(max_age=3600)
+
+    def login(driver):
+        LoginPage(driver).login('a@b.com', 'xxxxx')
+
+    cache.restore('a@b.com', driver, login)
+    Dashboard(driver)  # Already logged in
+
+"""
+from __future__ import unicode_literals
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+
+from six.moves.urllib.parse import urlsplit, urlunsplit
+
+from .page import _runs_javascript
+
+__all__ = ['SessionCache', 'SessionState']
+
+CAPTURE_STORAGE_SCRIPT = """
+function read(storage) {
+    var items = {};
+    for (var i = 0; i < storage.length; i++) {
+        items[storage.key(i)] = storage.getItem(storage.key(i));
+    }
+    return items;
+}
+return {
+    local: read(window.localStorage),
+    session: read(window.sessionStorage)
+};
+"""
+""" (str): Script that reads localStorage and sessionStorage"""
+
+RESTORE_STORAGE_SCRIPT = """
+function write(storage, items) {
+    storage.clear();
+    for (var key in items) { storage.setItem(key, items[key]); }
+}
+write(window.localStorage, arguments[0]);
+write(window.sessionStorage, arguments[1]);
+"""
+""" (str): Script that replaces localStorage and sessionStorage"""
+
+_COOKIE_KEYS = ('name', 'value', 'path', 'domain', 'secure', 'httpOnly',
+                'expiry')
+
+
+class SessionState(object):
+    """The cookies and web storage of a browser on one site
+
+    url -- the url the state was captured on
+    cookies -- a list of cookie dicts, as returned by get_cookies
+    local_storage -- a dict of the localStorage items
+    session_storage -- a dict of the sessionStorage items
+    created -- the time the state was captured
+    """
+
+    def __init__(self, url, cookies, local_storage=None,
+                 session_storage=None, created=None):
+        self.url = url
+        self.cookies = cookies
+        self.local_storage = local_storage or {}
+        self.session_storage = session_storage or {}
+        self.created = time.time() if created is None else created
+
+    def __repr__(self):
+        return 'SessionState({0!r}, {1} cookies)'.format(
+            self.url, len(self.cookies))
+
+    @classmethod
+    def capture(cls, driver):
+        """Capture the state of the site the browser is on"""
+        storage = {}
+        if _runs_javascript(driver):
+            storage = driver.execute_script(CAPTURE_STORAGE_SCRIPT) or {}
+        return cls(
+            driver.current_url,
+            [
+                dict((key, cookie[key]) for key in _COOKIE_KEYS
+                     if cookie.get(key) is not None)
+                for cookie in driver.get_cookies()
+            ],
+            storage.get('local'),
+            storage.get('session')
+        )
+
+    @property
+    def origin(self):
+        """The scheme and host the state belongs to"""
+        parts = urlsplit(self.url)
+        return urlunsplit((parts.scheme, parts.netloc, '', '', ''))
+
+    def expired(self, max_age=None, now=None):
+        """Whether the state is older than max_age seconds, or any of its
+        cookies have expired
+        """
+        now = time.time() if now is None else now
+        if max_age is not None and now - self.created > max_age:
+            return True
+        return any(
+            cookie['expiry'] <= now for cookie in self.cookies
+            if cookie.get('expiry')
+        )
+
+    def restore(self, driver, path='/'):
+        """Replace the browser's state on the site with this one
+
+        Cookies can only be set on the site the browser is on, so the
+        browser first loads path on the site, unless it is already there.
+        """
+        if urlsplit(driver.current_url)[:2] != urlsplit(self.url)[:2]:
+            driver.get(self.origin + path)
+        driver.delete_all_cookies()
+        for cookie in self.cookies:
+            driver.add_cookie(dict(cookie))
+        if _runs_javascript(driver):
+            driver.execute_script(
+                RESTORE_STORAGE_SCRIPT, self.local_storage,
+                self.session_storage)
+        return driver
+
+    def to_dict(self):
+        return {
+            'url': self.url,
+            'cookies': self.cookies,
+            'local_storage': self.local_storage,
+            'session_storage': self.session_storage,
+            'created': self.created,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(**data)
+
+
+class SessionCache(object):
+    """Session states kept by key, usually the user they are logged in as
+
+    directory -- where states are saved, defaults to a sessions directory in
+        KETEPARAHA_CACHE or ~/.cache/keteparaha. None keeps them in memory
+        only
+    max_age -- the seconds after which a state is captured again
+    """
+
+    def __init__(self, directory='', max_age=3600):
+        if directory == '':
+            from .profiles import cache_directory
+            directory = os.path.join(cache_directory(), 'sessions')
+        self.directory = directory
+        self.max_age = max_age
+        self._states = {}
+        self._locks = {}
+        self._lock = threading.Lock()
+
+    def path(self, key):
+        """The file the state for key is saved in"""
+        name = hashlib.sha1(key.encode('utf-8')).hexdigest()
+        return os.path.join(self.directory, name + '.json')
+
+    def get(self, key):
+        """The unexpired state saved for key, or None"""
+        state = self._states.get(key)
+        if state is None and self.directory:
+            try:
+                with open(self.path(key)) as f:
+                    state = SessionState.from_dict(json.load(f))
+            except (IOError, OSError, ValueError, TypeError):
+                return None
+        if state is None or state.expired(self.max_age):
+            return None
+        self._states[key] = state
+        return state
+
+    def set(self, key, state):
+        """Save the state for key"""
+        self._states[key] = state
+        if not self.directory:
+            return
+        if not os.path.isdir(self.directory):
+            try:
+                os.makedirs(self.directory)
+            except OSError:
+                pass  # Made by another process
+        # Written beside the state file and moved into place, so other
+        # processes never read a half written one
+        fd, temp = tempfile.mkstemp(dir=self.directory)
+        with os.fdopen(fd, 'w') as f:
+            json.dump(state.to_dict(), f)
+        os.rename(temp, self.path(key))
+
+    def delete(self, key):
+        self._states.pop(key, None)
+        if self.directory and os.path.exists(self.path(key)):
+            os.remove(self.path(key))
+
+    def _key_lock(self, key):
+        with self._lock:
+            return self._locks.setdefault(key, threading.Lock())
+
+    def restore(self, key, driver, create, path='/'):
+        """Restore the state saved for key into driver
+
+        If there is no unexpired state create(driver) is called, e.g. to log
+        in, and the resulting state saved. Returns the state. States for
+        different keys are created at the same time, each key only once.
+        """
+        with self._key_lock(key):
+            state = self.get(key)
+            if state is None:
+                create(driver)
+                state = SessionState.capture(driver)
+                self.set(key, state)
+                return state
+        state.restore(driver, path)
+        return state
@@ -0,0 +1,136 @@
+# -*- coding: utf-8 -*-
+"""Immutable snapshots of a component's DOM
+
+Reading text and attributes through WebDriver costs a command, and a round
+trip to the browser, for every value read. A snapshot serializes a
+component's whole subtree, with the attributes, text, visibility and bounding
+box of every element, in a single command. The snapshot can then be queried
+with CSS selectors locally, as often as needed.
+
+Snapshots do not change when the page does, take a new one to see changes.
+
+Example:
+    table = dashboard.get_component('#orders').snapshot()
+    totals = [row.text for row in table.select('tr td.total')]
+    table.select_one('tr.selected').get_attribute('data-id')
+
+"""
+from __future__ import unicode_literals
+
+from .dom import Node
+from .profiler import measure
+
+__all__ = ['SnapshotNode', 'snapshot_element']
+
+SNAPSHOT_SCRIPT = """
+function serialize(element) {
+    var style = window.getComputedStyle(element);
+    var box = element.getBoundingClientRect();
+    var attrs = {};
+    for (var i = 0; i < element.attributes.length; i++) {
+        attrs[element.attributes[i].name] = element.attributes[i].value;
+    }
+    if (typeof element.value === 'string' && 'form' in element) {
+        attrs.value = element.value;
+    }
+    if (element.checked) { attrs.checked = 'checked'; }
+    if (element.selected) { attrs.selected = 'selected'; }
+    var children = [];
+    for (var node = element.firstChild; node; node = node.nextSibling) {
+        if (node.nodeType === 3) {
+            children.push(node.nodeValue);
+        } else if (node.nodeType === 1) {
+            children.push(serialize(node));
+        }
+    }
+    return {
+        tag: element.tagName.toLowerCase(),
+        attrs: attrs,
+        children: children,
+        displayed: (
+            element.getClientRects().length > 0
+            && style.visibility !== 'hidden'
+            && style.display !== 'none'),
+        rect: {
+            x: box.left, y: box.top, width: box.width, height: box.height}
+    };
+}
+return serialize(arguments[0]);
+"""
+""" (str): Script that serializes the element passed to it"""
+
+
+class _FrozenDict(dict):
+    """A dict that can not be changed after it is created"""
+
+    def _immutable(self, *args, **kwargs):
+        raise TypeError('Snapshots can not be changed')
+
+    __setitem__ = __delitem__ = clear = pop = popitem = _immutable
+    setdefault = update = _immutable
+
+
+class SnapshotNode(Node):
+    """An element in a snapshot
+
+    Visibility comes from the browser, so text only includes the text the
+    browser displayed when the snapshot was taken. rect is the element's
+    bounding box, with x, y, width and height keys.
+    """
+
+    def __init__(self, data, parent=None):
+        super(SnapshotNode, self).__init__(
+            data['tag'], data.get('attrs'), parent)
+        self.attrs = _FrozenDict(self.attrs)
+        self.rect = _FrozenDict(data.get('rect') or {})
+        self._displayed = data.get('displayed', True)
+        self.children = tuple(
+            SnapshotNode(child, self) if isinstance(child, dict) else child
+            for child in data.get('children', ())
+        )
+        self._frozen = True
+
+    def __setattr__(self, name, value):
+        if getattr(self, '_frozen', False):
+            raise AttributeError('Snapshots can not be changed')
+        super(SnapshotNode, self).__setattr__(name, value)
+
+    @property
+    def hidden(self):
+        return not self._displayed
+
+    @property
+    def displayed(self):
+        return self._displayed
+
+    @property
+    def text(self):
+        """The displayed text of the element, like WebElement.text"""
+        if not self._displayed:
+            return ''
+        return super(SnapshotNode, self).text
+
+    def get_attribute(self, name):
+        """Return the value of an attribute of the element, or None"""
+        return self.attrs.get(name)
+
+    def has_text(self, text):
+        """Whether the text is in the element"""
+        return text in self.text
+
+
+def snapshot_element(element):
+    """Return a SnapshotNode of a WebElement and everything inside it
+
+    Drivers that have the document locally, like the HtmlDriver, can
+    serialize the element themselves, otherwise SNAPSHOT_SCRIPT is run in the
+    browser.
+    """
+    driver = element.parent
+    serialize = getattr(driver, 'serialize_element', None)
+    with measure('snapshot', 'snapshot'):
+        if serialize is not None:
+            data = serialize(element)
+        else:
+            data = driver.execute_script(SNAPSHOT_SCRIPT, element)
+        return SnapshotNode(data)
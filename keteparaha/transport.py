@@ -0,0 +1,332 @@
+# -*- coding: utf-8 -*-
+"""Transports that load pages for the HtmlDriver without a network
+
+A transport takes a request for a url and returns the final Response after
+following any redirects. Cookies set by responses are kept in the transport's
+cookie jar and sent with later requests, like a browser would.
+
+WSGI and ASGI applications are called directly in this process, no server or
+sockets are involved.
+
+Example:
+    transport = app_transport(my_wsgi_or_asgi_app)
+    response = transport.request('GET', 'http://localhost/login/')
+    response.url, response.status, response.text
+
+"""
+from __future__ import unicode_literals
+from inspect import isclass
+import io
+import os
+import sys
+
+import six
+from six.moves.http_cookiejar import CookieJar
+from six.moves.urllib.parse import unquote, urljoin, urlsplit
+from six.moves.urllib.request import Request, url2pathname
+
+__all__ = [
+    'ASGITransport',
+    'FileTransport',
+    'Response',
+    'TransportError',
+    'WSGITransport',
+    'app_transport'
+]
+
+REDIRECT_STATUSES = frozenset([301, 302, 303, 307, 308])
+
+
+class TransportError(Exception):
+    """Raised when a request can not be answered"""
+
+
+class Response(object):
+    """The final response to a request"""
+
+    def __init__(self, url, status, headers, body):
+        self.url = url
+        self.status = status
+        self.headers = headers
+        self.body = body
+
+    def __repr__(self):
+        return 'Response({0!r}, {1})'.format(self.url, self.status)
+
+    def header(self, name, default=None):
+        """The value of the first header called name"""
+        values = self.get_all(name)
+        return values[0] if values else default
+
+    def get_all(self, name, default=None):
+        """All the values of headers called name"""
+        values = [
+            value for key, value in self.headers
+            if key.lower() == name.lower()
+        ]
+        return values or default
+
+    def getheaders(self, name):
+        # The cookie jar reads headers from the response's info()
+        return self.get_all(name, [])
+
+    def info(self):
+        return self
+
+    @property
+    def charset(self):
+        content_type = self.header('Content-Type', '')
+        for param in content_type.split(';')[1:]:
+            key, _, value = param.strip().partition('=')
+            if key.lower() == 'charset':
+                return value.strip('"\'')
+        return 'utf-8'
+
+    @property
+    def text(self):
+        return self.body.decode(self.charset, 'replace')
+
+
+class _Transport(object):
+    """Base transport, subclasses implement sending a single request"""
+
+    max_redirects = 20
+
+    def __init__(self):
+        self.cookies = CookieJar()
+
+    def request(self, method, url, body=None, headers=None):
+        """Send a request, following redirects, and return the Response"""
+        headers = list(headers or [])
+        for _ in range(self.max_redirects + 1):
+            cookie_request = Request(str(url))
+            self.cookies.add_cookie_header(cookie_request)
+            cookie = cookie_request.get_header('Cookie')
+            response = self.send(method, url, body, [
+                (key, value) for key, value in headers
+                if key.lower() != 'cookie'
+            ] + ([('Cookie', cookie)] if cookie else []))
+            self.cookies.extract_cookies(response, cookie_request)
+            location = response.header('Location')
+            if response.status not in REDIRECT_STATUSES or not location:
+                return response
+            url = urljoin(url, location)
+            if response.status in (301, 302, 303) and method != 'HEAD':
+                method, body = 'GET', None
+                headers = [
+                    (key, value) for key, value in headers
+                    if key.lower() not in ('content-type', 'content-length')
+                ]
+        raise TransportError('Too many redirects loading "{0}"'.format(url))
+
+    def send(self, method, url, body, headers):
+        raise NotImplementedError
+
+
+class FileTransport(_Transport):
+    """Load pages from file:// urls"""
+
+    def send(self, method, url, body, headers):
+        if method != 'GET':
+            raise TransportError(
+                'Can not {0} to a file, "{1}"'.format(method, url))
+        path = url2pathname(urlsplit(url).path)
+        if os.path.isdir(path):
+            path = os.path.join(path, 'index.html')
+        try:
+            with open(path, 'rb') as f:
+                return Response(url, 200, [], f.read())
+        except IOError:
+            return Response(url, 404, [], b'')
+
+
+class WSGITransport(_Transport):
+    """Send requests straight to a WSGI application in this process"""
+
+    def __init__(self, app):
+        super(WSGITransport, self).__init__()
+        self.app = app
+
+    def environ(self, method, url, body, headers):
+        """Build the WSGI environ for a request"""
+        parts = urlsplit(url)
+        body = body or b''
+        environ = dict((str(key), _wsgi_string(value)) for key, value in {
+            'REQUEST_METHOD': method,
+            'SCRIPT_NAME': '',
+            'QUERY_STRING': parts.query,
+            'SERVER_NAME': parts.hostname or 'localhost',
+            'SERVER_PORT': parts.port or (
+                443 if parts.scheme == 'https' else 80),
+            'SERVER_PROTOCOL': 'HTTP/1.1',
+            'HTTP_HOST': parts.netloc or 'localhost',
+            'CONTENT_LENGTH': len(body),
+            'wsgi.url_scheme': parts.scheme or 'http',
+        }.items())
+        environ.update({
+            str('PATH_INFO'): _path_info(parts.path or '/'),
+            str('wsgi.version'): (1, 0),
+            str('wsgi.input'): io.BytesIO(body),
+            str('wsgi.errors'): sys.stderr,
+            str('wsgi.multithread'): False,
+            str('wsgi.multiprocess'): False,
+            str('wsgi.run_once'): False,
+        })
+        for key, value in headers:
+            key = key.upper().replace('-', '_')
+            if key not in ('CONTENT_TYPE', 'CONTENT_LENGTH'):
+                key = 'HTTP_' + key
+            environ[str(key)] = _wsgi_string(value)
+        return environ
+
+    def send(self, method, url, body, headers):
+        state = {}
+
+        def start_response(status, response_headers, exc_info=None):
+            if exc_info and state:
+                six.reraise(*exc_info)
+            state['status'] = int(status.split(' ', 1)[0])
+            state['headers'] = list(response_headers)
+            return lambda data: chunks.append(data)
+
+        chunks = []
+        result = self.app(
+            self.environ(method, url, body, headers), start_response)
+        try:
+            chunks.extend(result)
+        finally:
+            if hasattr(result, 'close'):
+                result.close()
+        return Response(url, state['status'], state['headers'],
+                        b''.join(chunks))
+
+
+class ASGITransport(_Transport):
+    """Send requests straight to an ASGI application in this process
+
+    Each request runs the application to completion in an asyncio event loop
+    owned by the transport. Only available on Python 3.
+    """
+
+    def __init__(self, app):
+        super(ASGITransport, self).__init__()
+        self.app = app
+        self._loop = None
+
+    @property
+    def loop(self):
+        import asyncio
+        if self._loop is None or self._loop.is_closed():
+            self._loop = asyncio.new_event_loop()
+        return self._loop
+
+    def scope(self, method, url, headers):
+        """Build the ASGI connection scope for a request"""
+        parts = urlsplit(url)
+        scheme = parts.scheme or 'http'
+        return {
+            'type': 'http',
+            'asgi': {'version': '3.0', 'spec_version': '2.1'},
+            'http_version': '1.1',
+            'method': method,
+            'scheme': scheme,
+            'path': unquote(parts.path or '/'),
+            'raw_path': (parts.path or '/').encode('latin-1'),
+            'query_string': parts.query.encode('latin-1'),
+            'root_path': '',
+            'headers': [
+                (key.lower().encode('latin-1'), value.encode('latin-1'))
+                for key, value in [('Host', parts.netloc or 'localhost')]
+                + list(headers)
+            ],
+            'client': ('127.0.0.1', 0),
+            'server': (parts.hostname or 'localhost', parts.port or (
+                443 if scheme == 'https' else 80)),
+        }
+
+    def send(self, method, url, body, headers):
+        loop = self.loop
+        requests = [{
+            'type': 'http.request', 'body': body or b'', 'more_body': False}]
+        state = {'status': None, 'headers': [], 'body': []}
+        disconnects = []
+
+        def done(value=None):
+            future = loop.create_future()
+            future.set_result(value)
+            return future
+
+        def receive():
+            if requests:
+                return done(requests.pop())
+            # The request has been read, the client disconnects once the
+            # response is complete
+            future = loop.create_future()
+            if state.get('complete'):
+                future.set_result({'type': 'http.disconnect'})
+            else:
+                disconnects.append(future)
+            return future
+
+        def send_message(message):
+            if message['type'] == 'http.response.start':
+                state['status'] = message['status']
+                state['headers'] = [
+                    (key.decode('latin-1'), value.decode('latin-1'))
+                    for key, value in message.get('headers', [])
+                ]
+            elif message['type'] == 'http.response.body':
+                state['body'].append(message.get('body', b''))
+                if not message.get('more_body'):
+                    state['complete'] = True
+                    for future in disconnects:
+                        future.set_result({'type': 'http.disconnect'})
+            return done()
+
+        loop.run_until_complete(
+            self.app(self.scope(method, url, headers), receive, send_message))
+        if state['status'] is None:
+            raise TransportError(
+                'The application did not respond to "{0}"'.format(url))
+        return Response(
+            url, state['status'], state['headers'], b''.join(state['body']))
+
+    def close(self):
+        if self._loop is not None:
+            self._loop.close()
+
+
+def app_transport(app):
+    """Return a transport that calls the WSGI or ASGI app in process
+
+    app can also be a transport, which is returned as it is.
+    """
+    if isinstance(app, _Transport):
+        return app
+    if is_asgi_app(app):
+        return ASGITransport(app)
+    return WSGITransport(app)
+
+
+def is_asgi_app(app):
+    """Whether app looks like an ASGI application rather than WSGI"""
+    if six.PY2:
+        return False
+    from asyncio import iscoroutinefunction
+    return iscoroutinefunction(app) or (
+        not isclass(app) and iscoroutinefunction(
+            getattr(app, '__call__', None)))
+
+
+def _path_info(path):
+    """The unquoted path as a WSGI native string"""
+    if six.PY2:
+        return unquote(_wsgi_string(path))
+    return unquote(path, encoding='latin-1')
+
+
+def _wsgi_string(value):
+    """WSGI environ values are native strings, latin-1 encoded"""
+    if six.PY2 and isinstance(value, six.text_type):
+        return value.encode('latin-1')
+    return str(value)
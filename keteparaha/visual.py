@@ -0,0 +1,294 @@
+# -*- coding: utf-8 -*-
+"""Visual regression checks against stored baseline screenshots
+
+assert_visually_matches takes a screenshot of a page or component and
+compares it with a baseline image. If there is no baseline yet the
+screenshot becomes the baseline. If they differ the screenshot and an image
+highlighting the differences are saved beside the baseline.
+
+Pixels differ when their difference in perceived brightness, weighting red,
+green and blue by how sensitive the eye is to them, is over tolerance. The
+images match if no more than max_diff_ratio of the pixels differ. Regions
+that always change, like dates or adverts, can be masked out.
+
+Comparisons are vectorized with NumPy. Identical screenshots are spotted
+straight away, a downscaled comparison rejects images that are clearly
+different, and otherwise bands of the image are compared until enough
+pixels differ to fail.
+
+Requires NumPy and Pillow, install them with:
+
+    pip install keteparaha[visual]
+
+Example:
+    assert_visually_matches(
+        page.get_component('#basket'), 'basket.png',
+        masks=[(0, 0, 200, 40)])
+
+"""
+from __future__ import division, unicode_literals
+import io
+import os
+
+from selenium.common.exceptions import WebDriverException
+
+__all__ = [
+    'Comparison',
+    'VisualMismatch',
+    'assert_visually_matches',
+    'compare_images',
+    'screenshot'
+]
+
+BASELINE_ENV = 'KETEPARAHA_BASELINES'
+""" (str): Environment variable with the directory baselines are kept in"""
+
+UPDATE_ENV = 'KETEPARAHA_UPDATE_BASELINES'
+""" (str): Set to replace baselines with new screenshots instead of
+    comparing them
+"""
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+""" (bytes): The first bytes of every png, to tell them from paths"""
+
+DEVICE_PIXEL_RATIO_SCRIPT = 'return window.devicePixelRatio;'
+""" (str): Script returning how many screenshot pixels there are to a CSS
+    pixel
+"""
+
+LUMA = (0.299, 0.587, 0.114)
+""" (tuple): How much red, green and blue contribute to perceived brightness
+"""
+
+
+def _numpy():
+    try:
+        import numpy
+    except ImportError:
+        raise ImportError(
+            'Visual comparisons need NumPy and Pillow, '
+            'pip install keteparaha[visual]')
+    return numpy
+
+
+def _pillow():
+    try:
+        from PIL import Image
+    except ImportError:
+        raise ImportError(
+            'Visual comparisons need NumPy and Pillow, '
+            'pip install keteparaha[visual]')
+    return Image
+
+
+class VisualMismatch(AssertionError):
+    """Raised when a screenshot does not match its baseline"""
+
+    def __init__(self, message, comparison, actual_path=None,
+                 diff_path=None):
+        super(VisualMismatch, self).__init__(message)
+        self.comparison = comparison
+        self.actual_path = actual_path
+        self.diff_path = diff_path
+
+
+class Comparison(object):
+    """The result of comparing two images
+
+    different -- the number of differing pixels counted. Comparisons stop
+        counting once enough pixels differ to fail
+    ratio -- different as a fraction of all the pixels
+    """
+
+    def __init__(self, matches, different, ratio, reason=''):
+        self.matches = matches
+        self.different = different
+        self.ratio = ratio
+        self.reason = reason
+
+    def __bool__(self):
+        return self.matches
+
+    __nonzero__ = __bool__
+
+    def __repr__(self):
+        return 'Comparison(matches={0}, ratio={1:.5f})'.format(
+            self.matches, self.ratio)
+
+
+def load_image(image):
+    """An RGB array of an image, from png bytes, a path or an array"""
+    numpy = _numpy()
+    if isinstance(image, numpy.ndarray):
+        return image
+    if isinstance(image, bytes) and image.startswith(PNG_SIGNATURE):
+        image = io.BytesIO(image)
+    return numpy.asarray(_pillow().open(image).convert('RGB'))
+
+
+def save_image(array, path):
+    """Save an RGB array as an image, creating its directory if needed"""
+    directory = os.path.dirname(path)
+    if directory and not os.path.isdir(directory):
+        os.makedirs(directory)
+    _pillow().fromarray(_numpy().ascontiguousarray(array)).save(path)
+
+
+def _mask(shape, masks):
+    """A boolean array, True for the pixels that are compared"""
+    numpy = _numpy()
+    compared = numpy.ones(shape[:2], dtype=bool)
+    for x, y, width, height in masks:
+        compared[max(y, 0):y + height, max(x, 0):x + width] = False
+    return compared
+
+
+def _delta(actual, baseline):
+    """The perceived difference of each pair of pixels"""
+    numpy = _numpy()
+    difference = numpy.abs(
+        actual.astype(numpy.int16) - baseline.astype(numpy.int16))
+    return difference.dot(numpy.array(LUMA, dtype=numpy.float32))
+
+
+def _downscale(array, factor):
+    """Average factor by factor blocks of the array, dropping the edges"""
+    height = array.shape[0] // factor * factor
+    width = array.shape[1] // factor * factor
+    blocks = array[:height, :width].reshape(
+        height // factor, factor, width // factor, factor, -1)
+    return blocks.mean(axis=(1, 3))
+
+
+def compare_images(actual, baseline, tolerance=8, max_diff_ratio=0.001,
+                   masks=(), band=64, downscale=8):
+    """Compare two images, returning a Comparison
+
+    actual, baseline -- png bytes, file paths or RGB arrays
+    tolerance -- how much a pixel's perceived brightness, from 0 to 255,
+        can differ before it counts as different
+    max_diff_ratio -- the fraction of pixels that can differ
+    masks -- (x, y, width, height) regions that are not compared
+    band -- the number of rows compared at a time
+    downscale -- the block size of the downscaled comparison
+    """
+    numpy = _numpy()
+    actual = load_image(actual)
+    baseline = load_image(baseline)
+    if actual.shape != baseline.shape:
+        return Comparison(False, actual.shape[0] * actual.shape[1], 1.0,
+                          'The image is {0}x{1}, the baseline {2}x{3}'.format(
+                              actual.shape[1], actual.shape[0],
+                              baseline.shape[1], baseline.shape[0]))
+    pixels = actual.shape[0] * actual.shape[1]
+    if numpy.array_equal(actual, baseline):
+        return Comparison(True, 0, 0.0)
+
+    compared = _mask(actual.shape, masks) if masks else None
+    allowed = int(pixels * max_diff_ratio)
+
+    # A block whose average differs by more than tolerance has at least one
+    # differing pixel, so the differing blocks are a lower bound
+    if downscale and min(actual.shape[:2]) >= downscale * 4:
+        blocks = _downscale(actual, downscale) - _downscale(
+            baseline, downscale)
+        block_delta = numpy.abs(blocks).dot(numpy.array(LUMA))
+        if compared is not None:
+            # Only blocks with nothing masked are a lower bound
+            block_delta[_downscale(
+                compared[..., None].astype(numpy.float32), downscale
+            )[..., 0] < 1] = 0
+        different = int(numpy.count_nonzero(block_delta > tolerance))
+        if different > allowed:
+            return Comparison(False, different, different / pixels,
+                              'The downscaled images differ')
+
+    different = 0
+    for top in range(0, actual.shape[0], band):
+        differs = _delta(
+            actual[top:top + band], baseline[top:top + band]) > tolerance
+        if compared is not None:
+            differs &= compared[top:top + band]
+        different += int(numpy.count_nonzero(differs))
+        if different > allowed:
+            return Comparison(False, different, different / pixels,
+                              'Over {0} pixels differ'.format(allowed))
+    return Comparison(True, different, different / pixels)
+
+
+def diff_image(actual, baseline, tolerance=8, masks=()):
+    """The baseline, faded, with differing pixels in red"""
+    numpy = _numpy()
+    actual = load_image(actual)
+    baseline = load_image(baseline)
+    differs = _delta(actual, baseline) > tolerance
+    if masks:
+        differs &= _mask(actual.shape, masks)
+    image = (baseline // 3 + 170).astype(numpy.uint8)
+    image[differs] = (255, 0, 0)
+    return image
+
+
+def screenshot(target):
+    """An RGB array of a screenshot of a driver's page or of an element
+
+    Elements are cropped from a screenshot of the page by drivers that
+    can't take screenshots of elements. Their position is in CSS pixels, so
+    it is scaled by the device pixel ratio of the screenshot.
+    """
+    if hasattr(target, 'get_screenshot_as_png'):
+        return load_image(target.get_screenshot_as_png())
+    try:
+        return load_image(target.screenshot_as_png)
+    except WebDriverException:
+        pass
+    driver = target.parent
+    page = load_image(driver.get_screenshot_as_png())
+    try:
+        ratio = float(driver.execute_script(DEVICE_PIXEL_RATIO_SCRIPT) or 1)
+    except WebDriverException:
+        ratio = 1.0
+    location, size = target.location, target.size
+    x, y = int(location['x'] * ratio), int(location['y'] * ratio)
+    return page[y:y + int(size['height'] * ratio),
+                x:x + int(size['width'] * ratio)]
+
+
+def baseline_directory():
+    """The directory baselines are kept in by default"""
+    return os.environ.get(BASELINE_ENV) or 'visual_baselines'
+
+
+def assert_visually_matches(target, baseline, directory=None, **options):
+    """Assert a screenshot of target matches the baseline image
+
+    target -- a WebDriver, WebElement, Page or Component
+    baseline -- the file name of the baseline, in directory
+    directory -- where baselines are kept, KETEPARAHA_BASELINES or
+        visual_baselines by default
+    options -- passed on to compare_images
+    """
+    if hasattr(target, 'page'):
+        target = target._driver if target.page is target else target._element
+    path = os.path.join(directory or baseline_directory(), baseline)
+    actual = screenshot(target)
+    if os.environ.get(UPDATE_ENV) or not os.path.exists(path):
+        save_image(actual, path)
+        return Comparison(True, 0, 0.0, 'The baseline was saved')
+    comparison = compare_images(actual, path, **options)
+    if comparison:
+        return comparison
+    root, ext = os.path.splitext(path)
+    actual_path = root + '.actual' + ext
+    diff_path = root + '.diff' + ext
+    save_image(actual, actual_path)
+    if comparison.ratio < 1.0:
+        save_image(diff_image(
+            actual, path, options.get('tolerance', 8),
+            options.get('masks', ())), diff_path)
+    else:
+        diff_path = None
+    raise VisualMismatch(
+        '{0} does not match the baseline: {1}. The screenshot was saved to '
+        '{2}'.format(baseline, comparison.reason, actual_path),
+        comparison, actual_path, diff_path)
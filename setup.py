@@ -62,6 +62,9 @@ setup(
     install_requires=[
         'imapclient',
         'pyvirtualdisplay',
-        'selenium'
+        'selenium>=2.53,<4',
     ],
+    extras_require={
+        'visual': ['numpy', 'Pillow'],
+    },
 )
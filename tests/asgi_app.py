@@ -0,0 +1,21 @@
+"""An ASGI application for the transport tests, only importable on Python 3
+"""
+
+
+async def app(scope, receive, send):
+    message = await receive()
+    await send({
+        'type': 'http.response.start',
+        'status': 200,
+        'headers': [(b'set-cookie', b'visited=yes; Path=/')],
+    })
+    headers = dict(scope['headers'])
+    await send({
+        'type': 'http.response.body',
+        'body': b' '.join([
+            scope['method'].encode('ascii'),
+            scope['path'].encode('ascii'),
+            message['body'],
+            headers.get(b'cookie', b''),
+        ]),
+    })
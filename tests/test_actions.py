@@ -0,0 +1,147 @@
+from unittest import TestCase
+
+from selenium.webdriver.remote.command import Command
+from selenium.webdriver.remote.webdriver import WebDriver
+
+from keteparaha.actions import W3C_ACTIONS, W3C_ELEMENT, W3C_RELEASE_ACTIONS
+from keteparaha.page import Component, Page
+
+
+class RecordingDriver(WebDriver):
+    """Answers element searches with an element named after the selector"""
+
+    capabilities = {}
+
+    def __init__(self, w3c=False):
+        self.session_id = 'recording'
+        self.w3c = w3c
+        self._is_remote = False
+        self.current_url_value = MenuPage.url
+        self.commands = []
+
+    def execute(self, driver_command, params=None):
+        self.commands.append((driver_command, params or {}))
+        if driver_command in (
+                Command.FIND_ELEMENT, Command.FIND_CHILD_ELEMENT):
+            value = {'ELEMENT': params['value']}
+        elif driver_command == Command.GET_CURRENT_URL:
+            value = self.current_url_value
+        else:
+            value = None
+        return {'status': 0, 'value': self._unwrap_value(value)}
+
+    def names(self):
+        """The commands after the elements were found"""
+        return [
+            command for command, _ in self.commands
+            if command not in (
+                Command.FIND_ELEMENT, Command.FIND_CHILD_ELEMENT)
+        ]
+
+    def found(self):
+        return [
+            params['value'] for command, params in self.commands
+            if command in (Command.FIND_ELEMENT, Command.FIND_CHILD_ELEMENT)
+            and params['value'] != 'html'
+        ]
+
+
+class MenuPage(Page):
+    scope = 'actions_tests'
+    url = 'http://testserver/menu/'
+
+
+class ReportsPage(Page):
+    scope = 'actions_tests'
+    url = 'http://testserver/reports/'
+
+
+class Menu(Component):
+    scope = MenuPage
+    selector = '#menu'
+
+
+class ActionSequenceTest(TestCase):
+
+    def test_w3c_actions_are_sent_in_one_request(self):
+        driver = RecordingDriver(w3c=True)
+        page = MenuPage(driver)
+        driver.commands = []
+
+        page.actions().hover('#menu').pause(0.1).click('.reports').perform()
+
+        self.assertEqual(driver.names(), [
+            W3C_ACTIONS, W3C_RELEASE_ACTIONS, Command.GET_CURRENT_URL])
+        self.assertEqual(driver.found(), ['#menu', '.reports'])
+        pointer, keys = driver.commands[-3][1]['actions']
+        self.assertEqual(
+            [action['type'] for action in pointer['actions']],
+            ['pointerMove', 'pause', 'pointerMove', 'pointerDown',
+             'pointerUp'])
+        self.assertEqual(
+            pointer['actions'][2]['origin'][W3C_ELEMENT], '.reports')
+        self.assertEqual(len(keys['actions']), len(pointer['actions']))
+
+    def test_elements_are_found_once_before_performing(self):
+        driver = RecordingDriver(w3c=True)
+        page = MenuPage(driver)
+        driver.commands = []
+
+        page.actions().hover('#menu').click('#menu').send_keys('ab').perform()
+
+        self.assertEqual(driver.found(), ['#menu'])
+        self.assertEqual(driver.names()[0], W3C_ACTIONS)
+        _, keys = driver.commands[-3][1]['actions']
+        self.assertEqual(
+            [(a['type'], a.get('value')) for a in keys['actions'][-4:]],
+            [('keyDown', 'a'), ('keyUp', 'a'), ('keyDown', 'b'),
+             ('keyUp', 'b')])
+
+    def test_json_wire_drivers_get_a_chain_of_commands(self):
+        driver = RecordingDriver()
+        menu = MenuPage(driver).get_component(Menu)
+        driver.commands = []
+
+        menu.actions().drag('.card', '.done').perform()
+
+        commands = [command for command, _ in driver.commands]
+        self.assertEqual(commands[-5:], [
+            Command.MOVE_TO, Command.MOUSE_DOWN, Command.MOVE_TO,
+            Command.MOUSE_UP, Command.GET_CURRENT_URL])
+        self.assertEqual(driver.found()[-1], '.done')
+
+    def test_perform_returns_the_page_opened(self):
+        driver = RecordingDriver(w3c=True)
+        page = MenuPage(driver)
+        driver.current_url_value = ReportsPage.url
+
+        reports = page.actions().click('.reports').perform()
+
+        self.assertIsInstance(reports, ReportsPage)
+
+    def test_perform_returns_the_component_opened(self):
+        driver = RecordingDriver(w3c=True)
+        page = MenuPage(driver)
+
+        menu = page.actions().hover('#menu').perform(opens=Menu)
+
+        self.assertIsInstance(menu, Menu)
+
+    def test_hover_performs_a_sequence_and_returns_what_it_opened(self):
+        driver = RecordingDriver(w3c=True)
+        page = MenuPage(driver)
+        driver.commands = []
+
+        menu = page.hover('#menu', opens=Menu)
+
+        self.assertIsInstance(menu, Menu)
+        self.assertEqual(driver.names()[0], W3C_ACTIONS)
+        self.assertEqual(driver.found(), ['#menu'])
+
+    def test_hover_without_opens_returns_nothing(self):
+        driver = RecordingDriver(w3c=True)
+        page = MenuPage(driver)
+        driver.commands = []
+
+        self.assertIsNone(page.hover('#menu'))
+        self.assertEqual(driver.names(), [W3C_ACTIONS, W3C_RELEASE_ACTIONS])
@@ -1,11 +1,22 @@
 from unittest import TestCase
 from mock import call, patch, Mock
 
+import threading
+import time
+
 from keteparaha.browser import (
+    BrowserErrors,
     BrowserTestCase,
     HeadlessBrowserTestCase,
     snapshot_on_error
 )
+from keteparaha.html_driver import HtmlDriver
+from keteparaha.scheduling import BrowserPool
+
+
+def hello_app(environ, start_response):
+    start_response('200 OK', [('Content-Type', 'text/html')])
+    return [b'<h1>Hello</h1>']
 
 
 class SubClassed(BrowserTestCase):
@@ -28,6 +39,102 @@ class BrowserTestCaseTest(TestCase):
 
         self.assertEqual(btc.browser, 'b3')
 
+    def test_start_html_driver_loads_pages_from_app(self):
+
+        class AppTest(SubClassed):
+            app = hello_app
+
+        btc = AppTest('do_nothing')
+
+        browser = btc.start_browser(driver='HtmlDriver')
+        browser.get('http://testserver/')
+
+        self.assertIsInstance(browser, HtmlDriver)
+        self.assertEqual(
+            browser.find_element_by_tag_name('h1').text, 'Hello')
+
+    def test_start_browsers_starts_browsers_at_the_same_time(self):
+        all_started = threading.Condition()
+        threads = set()
+
+        class AppTest(SubClassed):
+            app = hello_app
+
+            def _html_driver(self):
+                # Only returns once all three are being started at once
+                with all_started:
+                    threads.add(threading.current_thread().name)
+                    all_started.notify_all()
+                    deadline = time.time() + 5
+                    while len(threads) < 3 and time.time() < deadline:
+                        all_started.wait(1)
+                return HtmlDriver(app=hello_app)
+
+        btc = AppTest('do_nothing')
+
+        browsers = btc.start_browsers(3, driver='HtmlDriver')
+
+        self.assertEqual(len(browsers), 3)
+        self.assertEqual(btc.browsers, browsers)
+        self.assertEqual(len(threads), 3)
+
+    def test_start_browsers_quits_started_browsers_if_one_fails(self):
+        browsers = [Mock(), Mock()]
+        lock = threading.Lock()
+
+        class FailingTest(SubClassed):
+
+            def _html_driver(self):
+                with lock:
+                    if not browsers:
+                        raise RuntimeError('No browser')
+                    return browsers.pop()
+
+        quitting = list(browsers)
+        btc = FailingTest('do_nothing')
+
+        with self.assertRaises(RuntimeError):
+            btc.start_browsers(3, driver='HtmlDriver')
+
+        self.assertEqual(btc.browsers, [])
+        for browser in quitting:
+            self.assertTrue(browser.quit.called)
+
+    def test_for_each_browser_returns_results_in_browser_order(self):
+        btc = SubClassed('do_nothing')
+        btc.browsers.extend(['b1', 'b2', 'b3'])
+
+        self.assertEqual(
+            btc.for_each_browser(lambda browser: browser.upper()),
+            ['B1', 'B2', 'B3'])
+
+    def test_for_each_browser_raises_a_single_error_unchanged(self):
+        btc = SubClassed('do_nothing')
+        btc.browsers.extend(['b1', 'b2'])
+
+        def fail_in_b2(browser):
+            if browser == 'b2':
+                raise KeyError(browser)
+
+        with self.assertRaises(KeyError):
+            btc.for_each_browser(fail_in_b2)
+
+    def test_for_each_browser_gathers_several_errors(self):
+        btc = SubClassed('do_nothing')
+        btc.browsers.extend(['b1', 'b2', 'b3'])
+
+        def fail(browser):
+            if browser != 'b2':
+                raise KeyError(browser)
+            return browser
+
+        with self.assertRaises(BrowserErrors) as context:
+            btc.for_each_browser(fail)
+
+        self.assertEqual(
+            [idx for idx, _ in context.exception.errors], [0, 2])
+        self.assertEqual(context.exception.results, [None, 'b2', None])
+
 
 @patch('keteparaha.browser.os.makedirs')
 class SnapshotOnErrorDecorator(TestCase):
@@ -108,7 +215,9 @@ class SnapshotOnErrorDecorator(TestCase):
 
 
 
-@patch('keteparaha.browser.webdriver')
+@patch('selenium.webdriver')
+@patch('keteparaha.profiles.firefox_profile_template', Mock())
+@patch.dict('keteparaha.profiles._options', clear=True)
 class HeadlessBrowserTestCaseTest(TestCase):
 
     def test_start_browser(self, mock_webdriver):
@@ -124,3 +233,97 @@ class HeadlessBrowserTestCaseTest(TestCase):
         tc.start_browser()
 
         self.assertEqual(tc._driver, mock_webdriver.Firefox.return_value)
+
+    def test_firefox_runs_natively_headless_at_size(self, mock_webdriver):
+
+        class SampleTC(HeadlessBrowserTestCase):
+
+            def runTest(self):
+                pass
+
+        tc = SampleTC()
+
+        tc.start_browser(size=(800, 600))
+
+        options = mock_webdriver.firefox.options.Options.return_value
+        self.assertEqual(options.add_argument.call_args_list, [
+            call('-headless'), call('--window-size=800,600')])
+        self.assertNotIn(
+            'firefox_binary', mock_webdriver.Firefox.call_args[1])
+        self.assertFalse(tc._driver.set_window_size.called)
+        self.assertIsNone(tc._display)
+        self.assertEqual(
+            [(name, mode) for name, mode, _ in tc.startup_times],
+            [('Firefox', 'native')])
+
+    def test_chrome_runs_natively_headless_at_size(self, mock_webdriver):
+
+        class SampleTC(HeadlessBrowserTestCase):
+
+            def runTest(self):
+                pass
+
+        tc = SampleTC()
+
+        tc.start_browser(size=(800, 600), driver='Chrome')
+
+        options = mock_webdriver.ChromeOptions.return_value
+        self.assertEqual(options.add_argument.call_args_list[:2], [
+            call('--headless'), call('--window-size=800,600')])
+        self.assertEqual(tc._driver, mock_webdriver.Chrome.return_value)
+
+    def test_other_drivers_run_in_xvfb(self, mock_webdriver):
+
+        class SampleTC(HeadlessBrowserTestCase):
+            native_headless = False
+
+            def runTest(self):
+                pass
+
+        tc = SampleTC()
+
+        with patch('pyvirtualdisplay.Display') as display:
+            tc.start_browser(size=(800, 600))
+
+        self.assertEqual(
+            display.call_args, call(visible=0, size=(800, 600)))
+        self.assertTrue(display.return_value.start.called)
+        self.assertEqual(
+            tc._driver.set_window_size.call_args, call(800, 600))
+        self.assertEqual(tc.startup_times[0][1], 'xvfb')
+
+    def test_reused_browsers_are_pooled_by_headless_mode(self, mock_webdriver):
+        pool = BrowserPool()
+
+        class SampleTC(HeadlessBrowserTestCase):
+            browser_pool = pool
+            reuse_browsers = True
+
+            def runTest(self):
+                pass
+
+        tc = SampleTC()
+        browser = tc.start_page()
+        tc.doCleanups()
+
+        self.assertIs(pool.acquire(('Firefox', (1300, 1080), None, 'native')),
+                      browser)
+
+    def test_browsers_in_xvfb_are_not_reused(self, mock_webdriver):
+
+        class SampleTC(HeadlessBrowserTestCase):
+            native_headless = False
+            reuse_browsers = True
+            browser_pool = BrowserPool()
+
+            def runTest(self):
+                pass
+
+        tc = SampleTC()
+
+        with patch('pyvirtualdisplay.Display') as display:
+            with self.assertRaises(ValueError):
+                tc.start_page()
+
+        self.assertFalse(display.called)
+        self.assertFalse(mock_webdriver.Firefox.called)
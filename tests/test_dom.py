@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+from unittest import TestCase
+
+from keteparaha.dom import SelectorError, parse_html
+
+
+DOCUMENT = '''
+<html>
+<head><title>Title</title><script>var hidden = true;</script></head>
+<body>
+  <div id="main" class="content wide">
+    <p>Hello <b>world</b>
+    <p class="second">Fish &amp; chips
+    <ul>
+      <li>One
+      <li class="last" data-id="2">Two
+    </ul>
+  </div>
+  <div style="display: none"><span>Hidden</span></div>
+  <table><tr><td>1<td>2</tr></table>
+  <input type="text" name="email" value="a@b.com">
+</body>
+</html>
+'''
+
+
+class ParseHtmlTest(TestCase):
+
+    def setUp(self):
+        self.document = parse_html(DOCUMENT)
+
+    def test_closes_implied_end_tags(self):
+        items = self.document.select('ul > li')
+
+        self.assertEqual([li.text for li in items], ['One', 'Two'])
+
+    def test_text_is_rendered_text(self):
+        self.assertEqual(
+            self.document.select_one('#main').text,
+            'Hello world\nFish & chips\nOne\nTwo'
+        )
+        self.assertEqual(self.document.select_one('table').text, '1 2')
+
+    def test_hidden_elements_are_not_displayed(self):
+        self.assertFalse(self.document.select_one('span').displayed)
+        self.assertFalse(self.document.select_one('script').displayed)
+        self.assertTrue(self.document.select_one('b').displayed)
+
+    def test_void_elements_have_no_children(self):
+        email = self.document.select_one('input')
+
+        self.assertEqual(email.children, [])
+        self.assertEqual(email.parent.tag, 'body')
+
+
+class SelectorTest(TestCase):
+
+    def setUp(self):
+        self.document = parse_html(DOCUMENT)
+
+    def select(self, selector):
+        return [
+            node.attrs.get('class') or node.tag
+            for node in self.document.select(selector)
+        ]
+
+    def test_simple_selectors(self):
+        self.assertEqual(self.select('div.content.wide'), ['content wide'])
+        self.assertEqual(self.select('#main > p'), ['p', 'second'])
+        self.assertEqual(self.select('[data-id="2"]'), ['last'])
+        self.assertEqual(self.select('input[name = email]'), ['input'])
+        self.assertEqual(self.select('[class^=con]'), ['content wide'])
+        self.assertEqual(self.select('[class~=wide]'), ['content wide'])
+
+    def test_combinators(self):
+        self.assertEqual(self.select('div li'), ['li', 'last'])
+        self.assertEqual(self.select('p + p'), ['second'])
+        self.assertEqual(self.select('p ~ ul'), ['ul'])
+        self.assertEqual(self.select('body > li'), [])
+
+    def test_pseudo_classes(self):
+        self.assertEqual(self.select('li:first-child'), ['li'])
+        self.assertEqual(self.select('li:nth-child(2)'), ['last'])
+        self.assertEqual(self.select('td:nth-child(odd)'), ['td'])
+        self.assertEqual(self.select('li:not(.last)'), ['li'])
+
+    def test_selector_groups_are_returned_in_document_order(self):
+        self.assertEqual(self.select('li.last, b'), ['b', 'last'])
+
+    def test_invalid_selector(self):
+        with self.assertRaises(SelectorError):
+            self.document.select('li:hover')
+        with self.assertRaises(SelectorError):
+            self.document.select('li >')
@@ -0,0 +1,70 @@
+from unittest import TestCase
+
+from selenium.common.exceptions import TimeoutException
+
+from keteparaha.expectations import WaitDiagnostics, _wait_for_condition
+
+
+def never(driver):
+    return False
+
+
+class WaitDiagnosticsTest(TestCase):
+
+    def test_message_is_formatted_with_selector_and_expected(self):
+        message = WaitDiagnostics(
+            '"{expected}" not in "{selector}".', '.title', 'Hello')
+
+        self.assertEqual(str(message), '"Hello" not in ".title".')
+
+    def test_actual_is_only_called_when_message_needs_it(self):
+        calls = []
+        message = WaitDiagnostics(
+            'No element "{selector}".', '.title',
+            actual=lambda: calls.append(1))
+
+        str(message)
+
+        self.assertEqual(calls, [])
+
+    def test_actual_errors_are_reported_not_raised(self):
+        def actual():
+            raise ValueError()
+        message = WaitDiagnostics('Found "{actual}".', actual=actual)
+
+        self.assertEqual(str(message), 'Found "<unavailable, ValueError>".')
+
+
+class WaitForConditionTest(TestCase):
+
+    def test_message_is_not_built_when_the_wait_succeeds(self):
+        calls = []
+        message = WaitDiagnostics(
+            'Found "{actual}".', actual=lambda: calls.append(1))
+
+        result = _wait_for_condition(
+            lambda driver: 'done', None, message, driver=object())
+
+        self.assertEqual(result, 'done')
+        self.assertEqual(calls, [])
+
+    def test_timeout_includes_diagnostics(self):
+        message = WaitDiagnostics(
+            '"{expected}" not found in "{actual}".', '.title', 'Hello',
+            actual=lambda: 'Goodbye')
+
+        with self.assertRaises(TimeoutException) as context:
+            _wait_for_condition(
+                never, None, message, driver=object(), timeout=0)
+
+        self.assertIs(context.exception.diagnostics, message)
+        self.assertEqual(message.condition, 'function')
+        self.assertTrue(context.exception.msg.startswith(
+            '"Hello" not found in "Goodbye". Waited 0.'))
+
+    def test_plain_string_messages_still_work(self):
+        with self.assertRaises(TimeoutException) as context:
+            _wait_for_condition(
+                never, None, 'Never happened', driver=object(), timeout=0)
+
+        self.assertEqual(context.exception.msg, 'Never happened')
@@ -0,0 +1,170 @@
+import json
+import os
+import shutil
+import tempfile
+import time
+from unittest import TestCase, TestResult
+
+from mock import patch
+from selenium.common.exceptions import WebDriverException
+from selenium.webdriver.remote.command import Command
+from selenium.webdriver.remote.webdriver import WebDriver
+
+from keteparaha.browser import BrowserTestCase
+from keteparaha.flight import flight_recorder
+from keteparaha.page import Page
+
+PIXEL = (
+    'iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR42mNkYPhfDwAChwGA'
+    '60e6kgAAAABJRU5ErkJggg=='
+)
+
+
+class FlightDriver(WebDriver):
+    """Answers every command, with a one pixel PNG for screenshots"""
+
+    capabilities = {}
+
+    def __init__(self):
+        self.session_id = 'flight'
+        self.w3c = False
+        self._is_remote = False
+        self.current_url_value = ''
+
+    def execute(self, driver_command, params=None):
+        if driver_command in (
+                Command.FIND_ELEMENT, Command.FIND_CHILD_ELEMENT):
+            value = {'ELEMENT': params['value']}
+        elif driver_command == Command.GET_CURRENT_URL:
+            value = self.current_url_value
+        elif driver_command == Command.GET:
+            if 'broken' in params['url']:
+                raise WebDriverException('Could not load the page')
+            value = self.current_url_value = params['url']
+        elif driver_command == Command.SCREENSHOT:
+            value = PIXEL
+        else:
+            value = True
+        return {'status': 0, 'value': self._unwrap_value(value)}
+
+
+class ShopPage(Page):
+    scope = 'flight_tests'
+    url = 'http://testserver/shop/'
+
+
+class BrokenPage(Page):
+    scope = 'flight_tests'
+    url = 'http://testserver/broken/'
+
+
+class FlightRecorderTest(TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.addCleanup(flight_recorder.stop_test)
+
+    def test_actions_are_recorded_with_their_page_and_target(self):
+        flight_recorder.start_test('test_shop')
+
+        ShopPage(FlightDriver()).click('#buy')
+
+        actions = flight_recorder.actions()
+        self.assertEqual(
+            [(a['action'], a['target'], a['page']) for a in actions],
+            [('visit', ShopPage.url, 'ShopPage'),
+             ('click', '#buy', 'ShopPage')])
+        self.assertEqual(actions[1]['url'], ShopPage.url)
+        self.assertIsNone(actions[1]['error'])
+        self.assertLessEqual(actions[0]['start'], actions[1]['start'])
+
+    def test_errors_are_recorded(self):
+        flight_recorder.start_test('test_broken')
+
+        with self.assertRaises(WebDriverException):
+            BrokenPage(FlightDriver())
+
+        self.assertEqual(
+            flight_recorder.actions()[-1]['error'], 'WebDriverException')
+
+    def test_only_the_last_actions_are_kept(self):
+        with patch.object(flight_recorder, 'size', 2):
+            flight_recorder.start_test('test_shop')
+        page = ShopPage(FlightDriver())
+        for selector in ('#one', '#two', '#three'):
+            page.click(selector)
+
+        with open(flight_recorder.dump(self.directory)) as f:
+            dump = json.load(f)
+
+        self.assertEqual(
+            [action['target'] for action in dump['actions']],
+            ['#two', '#three'])
+        self.assertEqual(dump['dropped'], 2)
+
+    def test_nothing_is_recorded_outside_a_test(self):
+        ShopPage(FlightDriver()).click('#buy')
+
+        self.assertEqual(flight_recorder.actions(), [])
+
+    def test_screenshots_are_taken_in_the_background(self):
+        flight_recorder.start_test('test_shop', screenshots=1, interval=0)
+        driver = FlightDriver()
+        ShopPage(driver).click('#buy')
+        for _ in range(100):
+            if flight_recorder.screenshots.images:
+                break
+            time.sleep(0.01)
+
+        with open(flight_recorder.dump(self.directory)) as f:
+            screenshots = json.load(f)['screenshots']
+        flight_recorder.stop_test()
+
+        self.assertEqual(len(screenshots), 1)
+        self.assertTrue(os.path.exists(screenshots[0]['path']))
+        self.assertNotIn('execute', driver.__dict__)
+
+
+class FailedTestDumpTest(TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def run_case(self, name):
+        directory = self.directory
+
+        class Test(BrowserTestCase):
+            flight_log = directory
+
+            def test_fails(self):
+                ShopPage(FlightDriver()).click('#buy')
+                self.fail('Not bought')
+
+            def test_passes(self):
+                ShopPage(FlightDriver()).click('#buy')
+
+        test = Test(name)
+        result = TestResult()
+        test.run(result)
+        return test, result
+
+    def test_failed_tests_are_dumped(self):
+        test, result = self.run_case('test_fails')
+
+        self.assertEqual(len(result.failures), 1)
+        path = os.path.join(self.directory, test.id() + '-flight.json')
+        with open(path) as f:
+            dump = json.load(f)
+        self.assertEqual(dump['test'], test.id())
+        self.assertEqual(
+            [action['action'] for action in dump['actions']],
+            ['visit', 'click'])
+        self.assertIsNone(flight_recorder.current)
+
+    def test_passing_tests_are_not(self):
+        _, result = self.run_case('test_passes')
+
+        self.assertTrue(result.wasSuccessful())
+        self.assertEqual(os.listdir(self.directory), [])
@@ -59,3 +59,13 @@ class RetryTest(TestCase):
 
         with self.assertRaises(Exception):
             wrapped(*a, **k)
+
+    def test_raises_the_last_error(self):
+
+        def test_func():
+            raise KeyError('missing')
+
+        wrapped = retry(test_func, KeyError, attempts=2)
+
+        with self.assertRaises(KeyError):
+            wrapped()
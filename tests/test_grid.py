@@ -0,0 +1,220 @@
+import gzip
+import io
+import json
+import threading
+from unittest import TestCase, TestResult
+
+from selenium import webdriver
+from six.moves import BaseHTTPServer, socketserver
+
+from keteparaha.browser import BrowserTestCase
+from keteparaha.grid import CommandStats, PooledConnection, connection_pool
+
+
+class StubGridHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    """Answers every command with success, like a grid with one session"""
+
+    protocol_version = 'HTTP/1.1'
+
+    def setup(self):
+        BaseHTTPServer.BaseHTTPRequestHandler.setup(self)
+        self.server.connections += 1
+
+    def log_message(self, *args):
+        pass
+
+    def respond(self):
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        if self.headers.get('content-encoding') == 'gzip':
+            body = gzip.GzipFile(fileobj=io.BytesIO(body)).read()
+        self.server.requests.append(
+            (self.command, self.path,
+             dict((k.lower(), v) for k, v in self.headers.items()), body))
+        path = self.path.replace('/wd/hub', '', 1)
+        if path == '/session/abc/moved':
+            self.send_response(303)
+            self.send_header('Location', 'url')
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        if path == '/session/abc/elsewhere':
+            self.send_response(303)
+            self.send_header('Location', self.server.elsewhere)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        value = None
+        if self.command == 'POST' and path == '/session':
+            value = json.loads(body.decode('utf-8'))['desiredCapabilities']
+        elif path == '/session/abc/url':
+            value = self.server.url
+        content = json.dumps(
+            {'sessionId': 'abc', 'status': 0, 'value': value}).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json;charset=UTF-8')
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    do_GET = do_POST = do_DELETE = respond
+
+
+class StubGrid(socketserver.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    daemon_threads = True
+
+    def __init__(self):
+        BaseHTTPServer.HTTPServer.__init__(
+            self, ('127.0.0.1', 0), StubGridHandler)
+        self.connections = 0
+        self.requests = []
+        self.url = 'http://testserver/'
+        self.elsewhere = None
+        self.grid_url = 'http://127.0.0.1:{0}/wd/hub'.format(
+            self.server_address[1])
+
+
+class GridTestCase(TestCase):
+
+    def setUp(self):
+        self.grid = self.start_grid()
+
+    def start_grid(self):
+        grid = StubGrid()
+        thread = threading.Thread(
+            target=grid.serve_forever, kwargs={'poll_interval': 0.05})
+        thread.daemon = True
+        thread.start()
+        self.addCleanup(grid.server_close)
+        self.addCleanup(grid.shutdown)
+        self.addCleanup(connection_pool(grid.grid_url).close)
+        return grid
+
+    def remote(self, **kwargs):
+        return webdriver.Remote(
+            command_executor=PooledConnection(
+                self.grid.grid_url, stats=self.stats, **kwargs),
+            desired_capabilities={'browserName': 'stub'})
+
+    def paths(self):
+        return [(method, path) for method, path, _, _ in self.grid.requests]
+
+
+class PooledConnectionTest(GridTestCase):
+
+    def setUp(self):
+        super(PooledConnectionTest, self).setUp()
+        self.stats = CommandStats()
+
+    def test_commands_are_sent_over_one_connection(self):
+        driver = self.remote()
+        driver.get('http://testserver/')
+        self.assertEqual(driver.current_url, 'http://testserver/')
+        driver.quit()
+
+        self.assertEqual(self.paths(), [
+            ('POST', '/wd/hub/session'),
+            ('POST', '/wd/hub/session/abc/url'),
+            ('GET', '/wd/hub/session/abc/url'),
+            ('DELETE', '/wd/hub/session/abc'),
+        ])
+        self.assertEqual(self.grid.connections, 1)
+
+    def test_connections_are_shared_by_sessions(self):
+        first, second = self.remote(), self.remote()
+        first.get('http://testserver/')
+        second.get('http://testserver/')
+
+        self.assertEqual(len(self.grid.requests), 4)
+        self.assertEqual(self.grid.connections, 1)
+        self.assertIs(
+            first.command_executor.pool, second.command_executor.pool)
+
+    def test_closed_connections_are_reopened(self):
+        driver = self.remote()
+        connection, _ = driver.command_executor.pool.get()
+        connection.sock.close()
+        driver.command_executor.pool.put(connection)
+
+        driver.get('http://testserver/')
+
+        self.assertEqual(self.grid.connections, 2)
+        self.assertEqual(
+            self.paths()[-1], ('POST', '/wd/hub/session/abc/url'))
+
+    def test_relative_redirects_are_followed(self):
+        connection = PooledConnection(self.grid.grid_url, stats=self.stats)
+
+        response = connection._request(
+            'GET', self.grid.grid_url + '/session/abc/moved')
+
+        self.assertEqual(response['value'], 'http://testserver/')
+        self.assertEqual(self.paths(), [
+            ('GET', '/wd/hub/session/abc/moved'),
+            ('GET', '/wd/hub/session/abc/url'),
+        ])
+
+    def test_redirects_to_other_servers_use_their_own_pool(self):
+        other = self.start_grid()
+        other.url = 'http://elsewhere/'
+        self.grid.elsewhere = other.grid_url + '/session/abc/url'
+        connection = PooledConnection(self.grid.grid_url, stats=self.stats)
+
+        response = connection._request(
+            'GET', self.grid.grid_url + '/session/abc/elsewhere')
+
+        self.assertEqual(response['value'], 'http://elsewhere/')
+        self.assertEqual(self.paths(), [
+            ('GET', '/wd/hub/session/abc/elsewhere')])
+        self.assertEqual(other.connections, 1)
+
+    def test_command_latency_is_recorded(self):
+        driver = self.remote()
+        driver.get('http://testserver/')
+        driver.get('http://testserver/')
+
+        report = self.stats.report()
+
+        self.assertEqual(
+            sorted((s['command'], s['count']) for s in report),
+            [('get', 2), ('newSession', 1)])
+        for stats in report:
+            self.assertGreater(stats['total'], 0)
+            self.assertLessEqual(stats['mean'], stats['max'])
+
+    def test_large_commands_are_compressed(self):
+        driver = self.remote(compress=True, compress_min=100)
+        driver.get('http://testserver/')
+        driver.get('http://testserver/' + 'a' * 100)
+
+        (_, _, small, _), (_, _, large, body) = self.grid.requests[-2:]
+
+        self.assertNotIn('content-encoding', small)
+        self.assertEqual(large['content-encoding'], 'gzip')
+        self.assertIn(b'a' * 100, body)
+
+
+class RemoteBrowserTest(GridTestCase):
+
+    def test_remote_browsers_are_started_on_the_grid(self):
+        grid = self.grid
+        started = []
+
+        class Test(BrowserTestCase):
+            remote_url = grid.grid_url
+            remote_capabilities = {'browserName': 'stub'}
+
+            def test_remote(self):
+                browser = self.start_browser(driver='Remote')
+                started.append(browser.capabilities)
+
+        result = TestResult()
+        Test('test_remote').run(result)
+
+        self.assertTrue(result.wasSuccessful(), result.errors)
+        self.assertEqual(started, [{'browserName': 'stub'}])
+        self.assertEqual(self.paths()[0], ('POST', '/wd/hub/session'))
+        self.assertEqual(self.grid.connections, 1)
+
+    def test_remote_browsers_need_a_grid(self):
+        with self.assertRaises(ValueError):
+            BrowserTestCase('run')._remote_driver()
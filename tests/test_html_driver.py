@@ -0,0 +1,215 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+import os
+import shutil
+import tempfile
+import time
+from unittest import TestCase
+
+from selenium.common.exceptions import (
+    NoSuchElementException,
+    StaleElementReferenceException,
+    WebDriverException
+)
+from selenium.webdriver.support.select import Select
+from six.moves.urllib.parse import parse_qs
+
+from keteparaha.html_driver import HtmlDriver
+from keteparaha.page import Component, Page
+
+BASE_URL = 'http://testserver'
+
+PAGES = {
+    '/': '''
+        <html><head><title>Home</title></head><body>
+        <a href="/login/">Log in</a>
+        <div id="news"><ul><li>First</li><li>Second</li></ul></div>
+        </body></html>''',
+    '/login/': '''
+        <html><body>
+        <form method="post" action="/session/">
+          <input name="email">
+          <input name="password" type="password">
+          <select name="team">
+            <option value="r">Red</option><option value="b">Blue</option>
+          </select>
+          <input type="checkbox" name="remember" value="yes">
+          <button type="submit">Log in</button>
+        </form>
+        </body></html>''',
+}
+
+
+def app(environ, start_response):
+    path = environ['PATH_INFO']
+    if path == '/session/' and environ['REQUEST_METHOD'] == 'POST':
+        body = environ['wsgi.input'].read(int(environ['CONTENT_LENGTH']))
+        data = parse_qs(body.decode('utf-8'))
+        start_response(str('302 Found'), [(str('Location'), str(
+            '/dashboard/?user={0}&team={1}&remember={2}'.format(
+                data['email'][0], data['team'][0],
+                data.get('remember', ['no'])[0])))])
+        return [b'']
+    if path == '/dashboard/':
+        start_response(str('200 OK'), [
+            (str('Content-Type'), str('text/html; charset=utf-8'))])
+        return [
+            '<html><body><p class="user">{0}</p></body></html>'.format(
+                environ['QUERY_STRING']).encode('utf-8')
+        ]
+    if path in PAGES:
+        start_response(str('200 OK'), [])
+        return [PAGES[path].encode('utf-8')]
+    start_response(str('404 Not Found'), [])
+    return [b'Not found']
+
+
+class Home(Page):
+    scope = 'html_driver_tests'
+    url = BASE_URL + '/'
+
+
+class Login(Page):
+    scope = 'html_driver_tests'
+    url = BASE_URL + '/login/'
+
+    def login(self, email):
+        self.enter_text('input[name=email]', email)
+        self.enter_text('input[name=password]', 'secret')
+        self.select_option('select[name=team]', 'Blue')
+        self.click('input[name=remember]')
+        return self.click_button('Log in')
+
+
+class Dashboard(Page):
+    scope = 'html_driver_tests'
+    url = BASE_URL + '/dashboard/'
+
+    def setup(self, _query):
+        self.query = _query
+
+
+class News(Component):
+    scope = Home
+    selector = '#news'
+
+
+class HtmlDriverPageTest(TestCase):
+
+    def setUp(self):
+        self.driver = HtmlDriver(app=app)
+
+    def test_page_objects_follow_links(self):
+        login = Home(self.driver).click_link('Log in')
+
+        self.assertIsInstance(login, Login)
+        self.assertEqual(self.driver.current_url, Login.url)
+
+    def test_page_objects_submit_forms_and_follow_redirects(self):
+        dashboard = Login(self.driver).login('a@b.com')
+
+        self.assertIsInstance(dashboard, Dashboard)
+        self.assertEqual(dashboard.query, {
+            'user': ['a@b.com'], 'team': ['b'], 'remember': ['yes']})
+
+    def test_components_find_elements_inside_parent(self):
+        news = Home(self.driver).get_component(News)
+
+        self.assertEqual(
+            [item.text for item in news.get_components('li')],
+            ['First', 'Second']
+        )
+
+    def test_get_components_without_waiting(self):
+        news = Home(self.driver).get_component(News)
+
+        start = time.time()
+        self.assertEqual(news.get_components('p', wait=False), [])
+        self.assertLess(time.time() - start, 1)
+        self.assertEqual(
+            len(news.get_components('li', wait=False)), 2)
+
+
+class HtmlDriverTest(TestCase):
+
+    def setUp(self):
+        self.driver = HtmlDriver(app=app)
+        self.driver.get(BASE_URL + '/login/')
+
+    def test_title_and_back_navigation(self):
+        self.driver.get(BASE_URL + '/')
+        self.assertEqual(self.driver.title, 'Home')
+
+        self.driver.back()
+
+        self.assertEqual(self.driver.current_url, BASE_URL + '/login/')
+
+    def test_missing_elements_raise_no_such_element(self):
+        with self.assertRaises(NoSuchElementException):
+            self.driver.find_element_by_css_selector('#missing')
+
+    def test_elements_from_previous_page_are_stale(self):
+        email = self.driver.find_element_by_name('email')
+        self.driver.get(BASE_URL + '/')
+
+        with self.assertRaises(StaleElementReferenceException):
+            email.text
+
+    def test_typing_and_clearing(self):
+        email = self.driver.find_element_by_name('email')
+        email.send_keys('a@b.com')
+        self.assertEqual(email.get_attribute('value'), 'a@b.com')
+
+        email.clear()
+
+        self.assertEqual(email.get_attribute('value'), '')
+
+    def test_select_support_class(self):
+        select = Select(self.driver.find_element_by_name('team'))
+        self.assertEqual(select.first_selected_option.text, 'Red')
+
+        select.select_by_visible_text('Blue')
+
+        self.assertEqual(select.first_selected_option.text, 'Blue')
+
+    def test_iter_components_without_javascript(self):
+        news = Home(self.driver).get_component(News)
+
+        self.assertEqual(
+            [item.text for item in news.iter_components('li')],
+            ['First', 'Second'])
+
+    def test_select_option_by_value_without_javascript(self):
+        login = Home(self.driver).click_link('Log in')
+
+        login.select_option('select[name=team]', value='b')
+
+        select = Select(self.driver.find_element_by_name('team'))
+        self.assertEqual(select.first_selected_option.text, 'Blue')
+
+    def test_javascript_is_not_supported(self):
+        with self.assertRaises(WebDriverException):
+            self.driver.execute_script('return 1')
+
+    def test_loads_files(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        with open(os.path.join(directory, 'index.html'), 'w') as f:
+            f.write('<h1>From a file</h1>')
+
+        self.driver.get('file://' + directory + '/index.html')
+
+        self.assertEqual(
+            self.driver.find_element_by_tag_name('h1').text, 'From a file')
+
+    def test_cookies(self):
+        self.driver.add_cookie({'name': 'session', 'value': 'abc'})
+        self.assertEqual(
+            [(c['name'], c['value'], c['domain'])
+             for c in self.driver.get_cookies()],
+            [('session', 'abc', 'testserver')]
+        )
+
+        self.driver.delete_cookie('session')
+
+        self.assertEqual(self.driver.get_cookies(), [])
@@ -0,0 +1,34 @@
+import subprocess
+import sys
+from unittest import TestCase, skipIf
+
+import keteparaha
+from keteparaha.page import Page
+
+
+class LazyImportTest(TestCase):
+
+    def test_names_are_imported_from_their_modules(self):
+        self.assertIs(keteparaha.Page, Page)
+        self.assertIn('BrowserTestCase', dir(keteparaha))
+
+    def test_unknown_names_raise_attribute_error(self):
+        with self.assertRaises(AttributeError):
+            keteparaha.NoSuchThing
+
+    @skipIf(sys.version_info < (3, 7), 'Modules can only be lazy from 3.7')
+    def test_importing_the_package_does_not_import_selenium(self):
+        output = subprocess.check_output([
+            sys.executable, '-c',
+            'import sys, keteparaha; print("selenium" in sys.modules)'])
+
+        self.assertEqual(output.strip(), b'False')
+
+    @skipIf(sys.version_info < (3, 7), 'Modules can only be lazy from 3.7')
+    def test_importing_pages_and_test_cases_does_not_import_webdriver(self):
+        output = subprocess.check_output([
+            sys.executable, '-c',
+            'import sys, keteparaha.browser, keteparaha.page; '
+            'print("selenium.webdriver" in sys.modules)'])
+
+        self.assertEqual(output.strip(), b'False')
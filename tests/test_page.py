@@ -1,8 +1,26 @@
 from mock import Mock
 from unittest import TestCase
+from selenium.common.exceptions import (
+    NoSuchElementException,
+    TimeoutException,
+    WebDriverException
+)
 from selenium.webdriver.remote.webdriver import WebDriver
-
-from keteparaha.page import Component, Page
+from selenium.webdriver.remote.webelement import WebElement
+
+from keteparaha.html_driver import HtmlDriver
+from keteparaha.page import (
+    IDLE_SCRIPT,
+    LOADED_SCRIPT,
+    NAVIGATE_SCRIPT,
+    SELECTOR_CHAIN_SCRIPT,
+    SELECT_OPTIONS_SCRIPT,
+    Component,
+    Page,
+    _Registry,
+    _runs_javascript,
+    _selector_chain
+)
 
 
 class HomePage(Page):
@@ -47,6 +65,7 @@ class ModalNext(Component):
 
 class MockDriver(WebDriver):
 
+    capabilities = {'javascriptEnabled': False}
     current_url = ''
     session_id = ''
 
@@ -208,3 +227,407 @@ class ComponentTest(TestCase):
             modal.enter_text('selector', 'test text')
 
         self.assertIn("'t', 'e', 's', 't'", exc.exception.args[0], '')
+
+
+class ScriptDriver(MockDriver):
+    capabilities = {'browserName': 'firefox', 'platformName': 'linux'}
+
+    def __init__(self):
+        super(ScriptDriver, self).__init__()
+        self.scripts = []
+
+    def execute_script(self, script, *args):
+        self.scripts.append((script, args))
+        return WebElement(self, 'chained')
+
+
+class SelectorChainTest(TestCase):
+
+    def test_selector_chain_of_nested_components(self):
+        home = HomePage(driver=MockDriver())
+        row = home.get_component('#modal-id').get_components('tr')[2]
+
+        self.assertEqual(
+            _selector_chain(row), [('#modal-id', None), ('tr', 2)])
+
+    def test_no_chain_when_a_level_is_not_found_by_selector(self):
+        home = HomePage(driver=MockDriver())
+        link = Component(home.get_component('#modal-id'), find_by='link_text')
+
+        self.assertIsNone(_selector_chain(link))
+
+    def test_nested_component_is_found_with_one_script(self):
+        driver = ScriptDriver()
+        home = HomePage(driver=driver)
+        row = home.get_component('#modal-id').get_component('tr')
+
+        self.assertEqual(row._element.id, 'chained')
+        self.assertEqual(driver.scripts, [
+            (SELECTOR_CHAIN_SCRIPT, ([('#modal-id', None), ('tr', None)],))
+        ])
+
+    def test_components_in_the_page_are_found_directly(self):
+        driver = ScriptDriver()
+        home = HomePage(driver=driver)
+
+        home.get_component('#modal-id')._element
+
+        self.assertEqual(driver.scripts, [])
+
+    def test_drivers_without_javascript_find_each_level(self):
+        home = HomePage(driver=MockDriver())
+        row = home.get_component('#modal-id').get_component('tr')
+
+        self.assertIsInstance(row._element, Mock)
+
+
+class RunsJavascriptTest(TestCase):
+
+    def test_w3c_drivers_run_javascript(self):
+        self.assertTrue(_runs_javascript(ScriptDriver()))
+
+    def test_drivers_that_say_so_run_javascript(self):
+        self.assertTrue(_runs_javascript(NavigationDriver()))
+
+    def test_drivers_without_javascript_do_not(self):
+        self.assertFalse(_runs_javascript(MockDriver()))
+        self.assertFalse(_runs_javascript(HtmlDriver()))
+
+
+class SelectDriver(ScriptDriver):
+    missing = []
+
+    def find_element_by_css_selector(self, selector):
+        element = WebElement(self, 'select')
+        return Mock(**{'find_element.return_value': element})
+
+    def execute_script(self, script, *args):
+        self.scripts.append((script, args))
+        return self.missing
+
+
+class SelectOptionTest(TestCase):
+
+    def test_option_is_selected_with_one_script(self):
+        driver = SelectDriver()
+        home = HomePage(driver=driver)
+
+        home.select_option('select', 'Blue')
+
+        self.assertEqual(driver.scripts, [(
+            SELECT_OPTIONS_SCRIPT,
+            (WebElement(driver, 'select'), 'text', ['Blue'])
+        )])
+
+    def test_several_options_are_selected_by_value_at_once(self):
+        driver = SelectDriver()
+        home = HomePage(driver=driver)
+
+        home.select_option('select', value=['nz', 'au'])
+
+        self.assertEqual(driver.scripts[0][1][1:], ('value', ['nz', 'au']))
+
+    def test_missing_options_raise_no_such_element(self):
+        driver = SelectDriver()
+        driver.missing = ['Green']
+        home = HomePage(driver=driver)
+
+        with self.assertRaises(NoSuchElementException):
+            home.select_option('select', 'Green')
+
+    def test_something_to_select_is_required(self):
+        home = HomePage(driver=SelectDriver())
+
+        with self.assertRaises(ValueError):
+            home.select_option('select')
+
+
+class ScrollingDriver(ScriptDriver):
+    """A virtualised list of 30 rows showing 10 rows at a time"""
+
+    def __init__(self):
+        super(ScrollingDriver, self).__init__()
+        self.top = 0
+
+    def execute_async_script(self, script, *args):
+        self.scripts.append((script, args))
+        root, selector, key, scroll, settle = args
+        before = self.top
+        if scroll:
+            self.top = min(self.top + 8, 20)
+        return {
+            'rows': [[str(row), WebElement(self, 'row-{0}'.format(row))]
+                     for row in range(self.top, self.top + 10)],
+            'end': bool(scroll) and self.top == before,
+        }
+
+
+class IterComponentsTest(TestCase):
+
+    def test_rows_are_yielded_once_while_scrolling(self):
+        driver = ScrollingDriver()
+        home = HomePage(driver=driver)
+
+        rows = list(home.iter_components(
+            'tr', key='data-id', settle=0, idle_timeout=0))
+
+        self.assertEqual(
+            [row._element.id for row in rows],
+            ['row-{0}'.format(row) for row in range(30)])
+        self.assertEqual(driver.scripts[0][1][1:], ('tr', 'data-id', False, 0))
+        self.assertTrue(all(script[1][3] for script in driver.scripts[1:]))
+
+    def test_only_recent_keys_are_remembered(self):
+        driver = ScrollingDriver()
+        home = HomePage(driver=driver)
+
+        rows = home.iter_components('tr', settle=0, idle_timeout=0,
+                                    max_seen=12)
+
+        self.assertEqual(len(list(rows)), 30)
+
+    def test_script_timeout_is_raised_and_then_restored(self):
+        driver = ShortTimeoutDriver()
+        home = HomePage(driver=driver)
+
+        rows = list(home.iter_components('tr', settle=0, idle_timeout=0))
+
+        self.assertEqual(len(rows), 30)
+        self.assertEqual(driver.script_timeouts, [10, 30.0])
+
+
+class ShortTimeoutDriver(ScrollingDriver):
+    """A W3C driver whose script timeout is too short the first time"""
+
+    w3c = True
+
+    def __init__(self):
+        super(ShortTimeoutDriver, self).__init__()
+        self.script_timeouts = []
+
+    def execute(self, driver_command, params=None):
+        return {'value': {'script': 30000}}
+
+    def execute_async_script(self, script, *args):
+        if not self.script_timeouts:
+            raise TimeoutException('script timeout')
+        return super(ShortTimeoutDriver, self).execute_async_script(
+            script, *args)
+
+    def set_script_timeout(self, timeout):
+        self.script_timeouts.append(timeout)
+
+
+class EagerPage(Page):
+    url = 'https://obviously-not-real.com/eager/'
+    page_load_strategy = 'eager'
+
+
+class NavigationDriver(MockDriver):
+    capabilities = {'javascriptEnabled': True}
+
+    def __init__(self):
+        super(NavigationDriver, self).__init__()
+        self.scripts = []
+
+    def get(self, url):
+        raise AssertionError('Loaded with get')
+
+    def execute_script(self, script, *args):
+        self.scripts.append((script, args))
+        return True
+
+
+class PageLoadStrategyTest(TestCase):
+
+    def test_eager_pages_are_loaded_by_script(self):
+        driver = NavigationDriver()
+
+        EagerPage(driver)
+
+        self.assertEqual(driver.scripts, [
+            (NAVIGATE_SCRIPT, (EagerPage.url,)),
+            (LOADED_SCRIPT, ('eager',)),
+        ])
+
+    def test_drivers_without_javascript_load_normally(self):
+        driver = MockDriver()
+
+        EagerPage(driver)
+
+        self.assertEqual(driver.current_url, EagerPage.url)
+
+
+class IdlePage(Page):
+    url = 'https://obviously-not-real.com/idle/'
+    wait_for_idle = True
+
+
+class IdleDriver(ScriptDriver):
+    """Answers idle checks from a list of results or exceptions"""
+
+    def __init__(self, *answers):
+        super(IdleDriver, self).__init__()
+        self.answers = list(answers)
+        self.script_timeouts = []
+
+    def execute_async_script(self, script, *args):
+        self.scripts.append((script, args))
+        answer = self.answers.pop(0) if self.answers else {'idle': True}
+        if isinstance(answer, Exception):
+            raise answer
+        return answer
+
+    def set_script_timeout(self, timeout):
+        self.script_timeouts.append(timeout)
+
+
+class WaitForIdleTest(TestCase):
+
+    def test_pages_wait_for_idle_after_loading(self):
+        driver = IdleDriver()
+
+        IdlePage(driver)
+
+        self.assertEqual(len(driver.scripts), 1)
+        script, (quiet, timeout) = driver.scripts[0]
+        self.assertEqual(script, IDLE_SCRIPT)
+        self.assertEqual(quiet, 100)
+        self.assertLessEqual(timeout, 10000)
+
+    def test_clicks_wait_for_idle(self):
+        driver = IdleDriver()
+        page = IdlePage(driver)
+        driver.current_url = IdlePage.url
+
+        self.assertIs(page.click(), page)
+        self.assertEqual(
+            [script for script, _ in driver.scripts].count(IDLE_SCRIPT), 2)
+
+    def test_other_pages_do_not_wait(self):
+        driver = IdleDriver()
+        HomePage(driver=driver).click('.btn')
+
+        self.assertEqual(driver.scripts, [])
+
+    def test_unloaded_pages_and_script_timeouts_are_retried(self):
+        driver = IdleDriver(
+            WebDriverException('document unloaded'),
+            TimeoutException('script timeout'))
+
+        IdlePage(driver)
+
+        self.assertEqual(len(driver.scripts), 3)
+        self.assertEqual(driver.script_timeouts, [11, 0])
+
+    def test_busy_apps_time_out(self):
+        driver = IdleDriver()
+        page = IdlePage(driver)
+        driver.answers = [{'idle': False, 'pending': {
+            'requests': 2, 'timers': 0, 'animations': 1, 'loading': False}}]
+
+        with self.assertRaises(TimeoutException) as raised:
+            page.wait_until_idle(timeout=1)
+
+        self.assertIn('requests 2', raised.exception.msg)
+        self.assertEqual(raised.exception.diagnostics.condition, 'app_idle')
+        self.assertEqual(len(driver.scripts), 2)
+
+
+class ShopHome(Page):
+    scope = 'shop'
+    url = 'https://shop.obviously-not-real.com/'
+
+
+class ShopBasket(Page):
+    scope = 'shop'
+    url = 'https://shop.obviously-not-real.com/basket/'
+
+
+class BasketRow(Component):
+    scope = ShopBasket
+    selector = '#modal-id'
+
+
+class RegistryTest(TestCase):
+
+    def test_pages_and_components_are_kept_in_separate_namespaces(self):
+        registry = _Registry()
+        registry.register(CoolPage)
+        registry.register(Modal)
+
+        self.assertIs(registry[CoolPage.url], CoolPage)
+        self.assertIs(registry('#modal-id'), Modal)
+        self.assertNotIn('#modal-id', registry)
+
+    def test_lookups_fall_back_to_parent_registry(self):
+        registry = _Registry()
+        registry.register(CoolPage)
+        child = registry.scope('site.section')
+
+        self.assertIs(child[CoolPage.url], CoolPage)
+        self.assertEqual(list(child.urls()), [CoolPage.url])
+        self.assertEqual(child.path, 'site.section')
+
+    def test_unregister_removes_class(self):
+        registry = _Registry()
+        registry.register(CoolPage)
+        registry.register(Modal)
+
+        registry.unregister(CoolPage)
+        registry.unregister(Modal)
+
+        self.assertNotIn(CoolPage.url, registry)
+        self.assertIsNot(registry('#modal-id'), Modal)
+
+    def test_dynamic_components_are_not_registered(self):
+        registry = _Registry()
+        registry('#not-registered')
+
+        self.assertEqual(registry.namespaces[registry.SELECTOR], {})
+
+    def test_scoped_pages_are_not_visible_from_other_scopes(self):
+        self.assertNotIn(ShopHome.url, HomePage._components)
+        self.assertIn(ShopHome.url, ShopBasket._components)
+        self.assertIn(HomePage.url, ShopBasket._components)
+
+    def test_page_scoped_components_shadow_site_components(self):
+        self.assertIs(ShopBasket._components('#modal-id'), BasketRow)
+        self.assertIs(ShopHome._components('#modal-id'), Modal)
+
+    def test_pages_with_the_same_name_keep_their_own_components(self):
+        def same_page(address):
+            class SamePage(Page):
+                scope = 'same_name'
+                url = address
+
+            return SamePage
+
+        first = same_page('https://first.obviously-not-real.com/')
+        second = same_page('https://second.obviously-not-real.com/')
+
+        class FirstRow(Component):
+            scope = first
+            selector = '.row'
+
+        self.assertIsNot(first._components, second._components)
+        self.assertIs(first._components('.row'), FirstRow)
+        self.assertIsNot(second._components('.row'), FirstRow)
+
+    def test_mapping_interface_agrees_with_lookups(self):
+        registry = _Registry()
+        registry.register(CoolPage)
+        child = registry.scope('site')
+        child.register(ShopHome)
+
+        self.assertEqual(set(child), {CoolPage.url, ShopHome.url})
+        self.assertEqual(len(child), 2)
+        self.assertEqual(len(registry), 1)
+
+        with self.assertRaises(KeyError):
+            del child[CoolPage.url]
+        del child[ShopHome.url]
+
+        self.assertIn(CoolPage.url, child)
+        self.assertIn(CoolPage.url, registry)
+        self.assertNotIn(ShopHome.url, child)
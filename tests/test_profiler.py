@@ -0,0 +1,180 @@
+import json
+import os
+import shutil
+import tempfile
+from unittest import TestCase, TestResult
+
+from mock import patch
+from selenium.common.exceptions import TimeoutException
+
+from keteparaha.browser import BrowserTestCase
+from keteparaha.expectations import WaitDiagnostics, _wait_for_condition
+from keteparaha.page import Page
+from keteparaha.profiler import (
+    PROFILE_ENV,
+    Profiler,
+    WaitStats,
+    call_site,
+    profiler
+)
+
+
+def app(environ, start_response):
+    start_response('200 OK', [('Content-Type', 'text/html')])
+    return [b'<html><body><h1>Profiled</h1></body></html>']
+
+
+class ProfiledPage(Page):
+    scope = 'profiler_tests'
+    url = 'http://testserver/profiled/'
+
+
+class ProfilerTest(TestCase):
+
+    def setUp(self):
+        patcher = patch.dict(os.environ, {PROFILE_ENV: 'profile.json'})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.profiler = Profiler()
+
+    def test_nothing_is_measured_outside_of_tests(self):
+        with self.profiler.measure('wait', 'selector') as details:
+            details['checking'] = 1
+
+        self.assertEqual(self.profiler.timelines, [])
+
+    def test_events_are_recorded_to_the_current_test(self):
+        self.profiler.start_test('test_one')
+        with self.profiler.measure('wait', '.title', timeout=10) as details:
+            details['checking'] = 0.5
+        timeline = self.profiler.stop_test()
+
+        event, = timeline.events
+        self.assertEqual(event['kind'], 'wait')
+        self.assertEqual(event['name'], '.title')
+        self.assertEqual(event['timeout'], 10)
+        self.assertEqual(event['checking'], 0.5)
+        self.assertEqual(self.profiler.timelines, [timeline])
+
+    def test_tests_are_not_recorded_when_disabled(self):
+        with patch.dict(os.environ, {PROFILE_ENV: ''}):
+            self.profiler.start_test('test_one')
+
+        self.assertIsNone(self.profiler.stop_test())
+
+    def test_report_lists_slowest_tests_and_waits(self):
+        for test_id, wait in (('fast', 0.1), ('slow', 2.0)):
+            self.profiler.start_test(test_id)
+            self.profiler.current.record('wait', test_id, 0, wait)
+            timeline = self.profiler.stop_test()
+            timeline.duration = wait * 2
+
+        report = self.profiler.report()
+
+        self.assertEqual(
+            [test['test'] for test in report['slowest_tests']],
+            ['slow', 'fast'])
+        self.assertEqual(
+            [(wait['test'], wait['duration'])
+             for wait in report['slowest_waits']],
+            [('slow', 2.0), ('fast', 0.1)])
+        self.assertEqual(report['slowest_tests'][0]['totals'], {'wait': 2.0})
+
+    def test_report_is_written_as_json(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.profiler.start_test('test_one')
+        self.profiler.stop_test()
+
+        path = self.profiler.write(
+            os.path.join(directory, 'profile-{pid}.json'))
+
+        self.assertEqual(os.path.basename(path), 'profile-{0}.json'.format(
+            os.getpid()))
+        with open(path) as f:
+            self.assertEqual(json.load(f)['tests'][0]['test'], 'test_one')
+
+
+class WaitStatsTest(TestCase):
+
+    def test_report_lists_waits_that_always_time_out(self):
+        stats = WaitStats()
+        for _ in range(3):
+            stats.record('.missing', 'test.py:1', 10, True, 20)
+        stats.record('.sometimes', 'test.py:2', 10, True, 20)
+        stats.record('.sometimes', 'test.py:2', 1, False, 2)
+
+        report = stats.report()
+
+        self.assertEqual(
+            [(wait['selector'], wait['total'])
+             for wait in report['always_time_out']],
+            [('.missing', 30)])
+        self.assertEqual(report['always_instant'], [])
+
+    def test_report_lists_waits_that_always_succeed_on_first_check(self):
+        stats = WaitStats()
+        stats.record('.there', 'test.py:1', 0.01, False, 1)
+        stats.record('.there', 'test.py:1', 0.01, False, 1)
+        stats.record('.there', 'test.py:9', 0.01, False, 1)
+
+        report = stats.report()
+
+        self.assertEqual(
+            [(wait['call_site'], wait['calls'])
+             for wait in report['always_instant']],
+            [('test.py:1', 2)])
+        self.assertEqual(len(report['waits']), 2)
+
+    def test_call_site_is_outside_keteparaha(self):
+        site = call_site()
+
+        self.assertTrue(site.startswith(__file__.rstrip('c')))
+
+
+class BrowserTestCaseProfileTest(TestCase):
+
+    def setUp(self):
+        for patcher in (
+            patch.dict(os.environ, {PROFILE_ENV: 'profile.json'}),
+            patch.object(profiler, 'timelines', []),
+            patch.object(profiler, 'wait_stats', WaitStats()),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_timeline_of_a_browser_test(self):
+
+        class ProfiledTest(BrowserTestCase):
+
+            def test_page(self):
+                page = ProfiledPage(self.start_browser(driver='HtmlDriver'))
+                page.get_element('h1')
+                with self.assertRaises(TimeoutException):
+                    _wait_for_condition(
+                        lambda driver: False, page,
+                        WaitDiagnostics('Never', 'h2'), timeout=0)
+
+        ProfiledTest.app = staticmethod(app)
+        result = TestResult()
+
+        ProfiledTest('test_page').run(result)
+
+        self.assertTrue(result.wasSuccessful(), result.errors)
+        timeline, = profiler.timelines
+        self.assertTrue(timeline.test_id.endswith('ProfiledTest.test_page'))
+        self.assertEqual(
+            [(event['kind'], event['name']) for event in timeline.events], [
+                ('browser_start', 'HtmlDriver'),
+                ('navigation', ProfiledPage.url),
+                ('wait', 'h1'),
+                ('wait', 'h2'),
+            ])
+        self.assertTrue(timeline.events[-1]['timed_out'])
+        self.assertTrue(timeline.events[-1]['call_site'].startswith(
+            __file__.rstrip('c')))
+        self.assertEqual(
+            sorted(wait['selector']
+                   for wait in profiler.report()['wait_budget']['waits']),
+            ['h1', 'h2'])
+        self.assertIsNone(profiler.current)
@@ -0,0 +1,132 @@
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+
+from mock import patch
+from selenium import webdriver
+
+from keteparaha import profiles
+
+
+class ProfileTemplateTest(TestCase):
+
+    def setUp(self):
+        self.cache = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.cache)
+        patcher = patch.dict(os.environ, {'KETEPARAHA_CACHE': self.cache})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = patch.dict(profiles._templates, clear=True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_template_is_built_once_in_the_cache(self):
+        path = profiles.firefox_profile_template()
+
+        self.assertEqual(os.path.dirname(path), self.cache)
+        self.assertEqual(profiles.firefox_profile_template(), path)
+        self.assertEqual(os.listdir(self.cache), [os.path.basename(path)])
+
+    def test_template_turns_off_updates_and_telemetry(self):
+        path = profiles.firefox_profile_template()
+
+        with open(os.path.join(path, 'user.js')) as f:
+            user_js = f.read()
+        self.assertIn(
+            'user_pref("toolkit.telemetry.unified", false);', user_js)
+        self.assertIn(
+            'user_pref("datareporting.policy.firstRunURL", "");', user_js)
+
+    def test_template_leaves_firefox_profile_defaults_alone(self):
+        defaults = webdriver.FirefoxProfile.DEFAULT_PREFERENCES
+
+        for key in profiles.FIREFOX_PREFERENCES:
+            self.assertNotIn(key, defaults['frozen'])
+            self.assertNotIn(key, defaults['mutable'])
+
+    def test_templates_without_images_are_kept_separately(self):
+        with_images = profiles.firefox_profile_template()
+        without_images = profiles.firefox_profile_template(images=False)
+
+        self.assertNotEqual(with_images, without_images)
+        with open(os.path.join(without_images, 'user.js')) as f:
+            self.assertIn('"permissions.default.image", 2', f.read())
+
+    def test_each_session_gets_a_copy_of_the_template(self):
+        template = profiles.firefox_profile_template()
+
+        profile = profiles.firefox_profile()
+
+        self.assertNotEqual(profile.path, template)
+        self.assertFalse(
+            profile.default_preferences['toolkit.telemetry.unified'])
+        shutil.rmtree(profile.tempfolder)
+
+    def test_blocked_urls_are_sent_to_the_blocking_proxy(self):
+        kwargs = profiles.driver_options(
+            'Firefox', webdriver.Firefox, blocked=['*.analytics.com'],
+            page_load_strategy='eager')
+
+        profile = kwargs['firefox_profile']
+        self.addCleanup(shutil.rmtree, profile.tempfolder)
+        self.assertEqual(
+            profile.default_preferences['network.proxy.type'], 2)
+        with open(os.path.join(profile.path, 'blocked.pac')) as f:
+            self.assertIn('"*.analytics.com"', f.read())
+        self.assertEqual(kwargs['capabilities']['pageLoadStrategy'], 'eager')
+
+
+@patch.dict('keteparaha.profiles._options', clear=True)
+class BrowserOptionsTest(TestCase):
+
+    def test_chrome_options_are_built_once_for_each_key(self):
+        with patch.object(
+                profiles, '_build_options',
+                wraps=profiles._build_options) as build:
+            options = profiles.browser_options('Chrome', True, (800, 600))
+            again = profiles.browser_options('Chrome', True, [800, 600])
+
+        self.assertEqual(build.call_count, 1)
+        self.assertEqual(again.arguments, options.arguments)
+        self.assertEqual(options.arguments[:2], [
+            '--headless', '--window-size=800,600'])
+
+    def test_chrome_options_are_copied_for_each_session(self):
+        options = profiles.browser_options('Chrome')
+        options.add_argument('--changed')
+
+        self.assertNotIn(
+            '--changed', profiles.browser_options('Chrome').arguments)
+
+    def test_firefox_options_are_copied_for_each_session(self):
+        options = profiles.browser_options('Firefox', headless=True)
+
+        self.assertIsNot(
+            profiles.browser_options('Firefox', headless=True), options)
+        self.assertEqual(options.arguments, ['-headless'])
+
+    def test_chrome_driver_options(self):
+        kwargs = profiles.driver_options(
+            'Chrome', webdriver.Chrome, images=False)
+
+        options = list(kwargs.values())[0]
+        self.assertIn('--no-first-run', options.arguments)
+        self.assertEqual(options.experimental_options['prefs'], {
+            'profile.managed_default_content_settings.images': 2})
+
+    def test_chrome_blocks_urls_with_a_proxy_auto_config_script(self):
+        options = profiles.browser_options('Chrome', blocked=['*.ads.com'])
+
+        self.assertTrue(options.arguments[-1].startswith(
+            '--proxy-pac-url=data:application/x-ns-proxy-autoconfig;base64,'))
+
+
+class BlockingPacTest(TestCase):
+
+    def test_blocked_patterns_go_to_a_closed_port(self):
+        pac = profiles.blocking_pac(['*.ads.com', '*/tracking.js'])
+
+        self.assertIn('["*.ads.com", "*/tracking.js"]', pac)
+        self.assertIn("return 'PROXY 127.0.0.1:9';", pac)
+        self.assertIn("return 'DIRECT';", pac)
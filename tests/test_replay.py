@@ -0,0 +1,162 @@
+import os
+import shutil
+import tempfile
+import threading
+from unittest import TestCase, TestResult
+
+from selenium.common.exceptions import NoSuchElementException
+from selenium.webdriver.remote.webdriver import WebDriver
+
+from keteparaha.browser import BrowserTestCase
+from keteparaha.html_driver import HtmlDriver
+from keteparaha.page import Page
+from keteparaha.replay import (
+    Recorder,
+    ReplayDriver,
+    ReplayMismatch,
+    command_counts,
+    load_recording
+)
+
+
+def app(environ, start_response):
+    start_response('200 OK', [('Content-Type', 'text/html')])
+    return [b'''<html><body>
+        <h1>Orders</h1>
+        <ul><li>Tea</li><li>Coffee</li></ul>
+        </body></html>''']
+
+
+class OrdersPage(Page):
+    scope = 'replay_tests'
+    url = 'http://testserver/orders/'
+
+    def items(self):
+        return [item.text for item in self.get_components('li')]
+
+
+class W3CDriver(WebDriver):
+    """Answers like a W3C browser, which selenium asks for attributes with a
+    JavaScript atom"""
+    capabilities = {'browserName': 'firefox'}
+
+    def __init__(self):
+        self.session_id = 'w3c'
+        self.w3c = True
+        self._is_remote = False
+        self.scripts = []
+
+    def execute(self, driver_command, params=None):
+        if driver_command in ('findElement', 'findElements'):
+            value = {'ELEMENT': 'drink'}
+            if driver_command == 'findElements':
+                value = [value]
+        else:
+            if 'script' in (params or {}):
+                self.scripts.append(params['script'])
+            value = 'tea'
+        return {'status': 0, 'value': self._unwrap_value(value)}
+
+
+class ReplayTest(TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.path = os.path.join(self.directory, 'orders.jsonl.gz')
+
+    def record(self, flow):
+        driver = HtmlDriver(app=app)
+        recorder = Recorder(driver, self.path).start()
+        try:
+            return flow(driver)
+        finally:
+            recorder.stop()
+
+    def test_replayed_flow_gives_the_recorded_results(self):
+        def flow(driver):
+            return OrdersPage(driver).items()
+
+        recorded = self.record(flow)
+        driver = ReplayDriver(self.path)
+
+        self.assertEqual(flow(driver), recorded)
+        self.assertEqual(recorded, ['Tea', 'Coffee'])
+        self.assertEqual(driver.remaining, 0)
+        self.assertEqual(driver.command_counts, command_counts(self.path))
+
+    def test_w3c_drivers_are_replayed_in_w3c_mode(self):
+        def flow(driver):
+            return driver.find_element_by_css_selector('li').get_attribute(
+                'class')
+
+        driver = W3CDriver()
+        recorder = Recorder(driver, self.path).start()
+        recorded = flow(driver)
+        recorder.stop()
+        replay = ReplayDriver(self.path)
+
+        self.assertEqual(flow(replay), recorded)
+        self.assertTrue(replay.w3c)
+        self.assertEqual(replay.remaining, 0)
+        self.assertEqual([
+            entry['params']['script'] for entry in load_recording(
+                self.path)[1] if 'script' in entry['params']
+        ], ['<getAttribute atom>'] if driver.scripts else [])
+
+    def test_commands_from_other_threads_are_not_recorded(self):
+        driver = HtmlDriver(app=app)
+        recorder = Recorder(driver, self.path).start()
+        OrdersPage(driver)
+        thread = threading.Thread(target=lambda: driver.title)
+        thread.start()
+        thread.join()
+        recorder.stop()
+
+        self.assertNotIn('getTitle', command_counts(self.path))
+
+    def test_errors_are_replayed(self):
+        def flow(driver):
+            OrdersPage(driver)
+            with self.assertRaises(NoSuchElementException):
+                driver.find_element_by_css_selector('table')
+
+        self.record(flow)
+
+        flow(ReplayDriver(self.path))
+
+    def test_different_commands_raise_a_mismatch(self):
+        self.record(lambda driver: OrdersPage(driver).items())
+        driver = ReplayDriver(self.path)
+        OrdersPage(driver)
+
+        with self.assertRaises(ReplayMismatch):
+            driver.find_element_by_css_selector('table')
+
+    def test_recording_stops_wrapping_the_driver(self):
+        driver = HtmlDriver(app=app)
+        recorder = Recorder(driver, self.path).start()
+
+        recorder.stop()
+
+        self.assertNotIn('execute', vars(driver))
+        header, entries = load_recording(self.path)
+        self.assertEqual(header['capabilities']['browserName'], 'htmldriver')
+        self.assertEqual(entries, [])
+
+    def test_browser_test_case_records_browsers(self):
+        directory = self.directory
+
+        class RecordedTest(BrowserTestCase):
+            record_to = directory
+
+            def test_orders(self):
+                OrdersPage(self.start_browser(driver='HtmlDriver')).items()
+
+        RecordedTest.app = staticmethod(app)
+        test = RecordedTest('test_orders')
+
+        test.run(TestResult())
+
+        path = os.path.join(directory, test.id() + '-0.jsonl.gz')
+        self.assertIn('get', command_counts(path))
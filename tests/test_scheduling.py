@@ -0,0 +1,190 @@
+from abc import ABCMeta, abstractmethod
+from unittest import TestCase, TestResult, TestSuite
+
+from mock import Mock
+from six import with_metaclass
+
+from keteparaha.browser import BrowserTestCase
+from keteparaha.page import Page
+from keteparaha.scheduling import (
+    BrowserPool,
+    GroupingLoader,
+    start_state,
+    starts_on
+)
+
+
+def app(environ, start_response):
+    start_response('200 OK', [('Content-Type', 'text/html')])
+    return [b'<html><body><h1>Scheduled</h1></body></html>']
+
+
+class OrdersPage(Page):
+    scope = 'scheduling_tests'
+    url = 'http://testserver/orders/'
+
+
+class AccountPage(Page):
+    scope = 'scheduling_tests'
+    url = 'http://testserver/account/'
+
+
+class StartStateTest(TestCase):
+
+    def test_decorated_test_has_its_start_state(self):
+
+        class Test(TestCase):
+            start_user = 'bob'
+
+            @starts_on(OrdersPage, user='alice')
+            def test_orders(self):
+                pass
+
+            def test_other(self):
+                pass
+
+        self.assertEqual(
+            start_state(Test('test_orders')), (OrdersPage, 'alice'))
+        self.assertEqual(start_state(Test('test_other')), (None, 'bob'))
+
+    def test_loader_groups_tests_by_user_then_page(self):
+
+        class Test(TestCase):
+
+            @starts_on(OrdersPage, user='alice')
+            def test_a(self):
+                pass
+
+            @starts_on(AccountPage, user='bob')
+            def test_b(self):
+                pass
+
+            @starts_on(AccountPage, user='alice')
+            def test_c(self):
+                pass
+
+            def test_d(self):
+                pass
+
+            @starts_on(OrdersPage, user='alice')
+            def test_e(self):
+                pass
+
+        names = GroupingLoader().getTestCaseNames(Test)
+
+        self.assertEqual(
+            list(names), ['test_d', 'test_c', 'test_a', 'test_e', 'test_b'])
+
+
+class BrowserPoolTest(TestCase):
+
+    def test_released_browsers_are_acquired_by_state(self):
+        pool = BrowserPool()
+        browser = Mock()
+        pool.release('alice', browser)
+
+        self.assertIsNone(pool.acquire('bob'))
+        self.assertIs(pool.acquire('alice'), browser)
+        self.assertIsNone(pool.acquire('alice'))
+
+    def test_least_recently_used_browsers_are_quit(self):
+        pool = BrowserPool(max_idle=2)
+        browsers = [Mock(), Mock(), Mock()]
+        for user, browser in zip(['alice', 'bob', 'carol'], browsers):
+            pool.release(user, browser)
+
+        browsers[0].quit.assert_called_once_with()
+        self.assertEqual(len(pool), 2)
+
+        pool.close()
+
+        browsers[2].quit.assert_called_once_with()
+        self.assertEqual(len(pool), 0)
+
+
+class StartPageTest(TestCase):
+
+    def run_suite(self, test_case, *names):
+        result = TestResult()
+        TestSuite([test_case(name) for name in names]).run(result)
+        self.assertTrue(result.wasSuccessful(), result.errors)
+
+    def test_browsers_are_reused_by_tests_with_the_same_start_state(self):
+        pool = BrowserPool()
+        started = []
+        log_ins = []
+
+        class ReusedTest(BrowserTestCase):
+            browser_pool = pool
+            reuse_browsers = True
+
+            def log_in(self, browser, user):
+                log_ins.append(user)
+
+            @starts_on(OrdersPage, user='alice')
+            def test_one(self):
+                page = self.start_page(driver='HtmlDriver')
+                self.assertIsInstance(page, OrdersPage)
+                started.append(page._driver)
+
+            @starts_on(AccountPage, user='alice')
+            def test_two(self):
+                started.append(self.start_page(driver='HtmlDriver')._driver)
+
+            @starts_on(OrdersPage, user='bob')
+            def test_three(self):
+                started.append(self.start_page(driver='HtmlDriver')._driver)
+
+        ReusedTest.app = staticmethod(app)
+        self.addCleanup(pool.close)
+
+        self.run_suite(ReusedTest, 'test_one', 'test_two', 'test_three')
+
+        self.assertIs(started[0], started[1])
+        self.assertIsNot(started[1], started[2])
+        self.assertEqual(log_ins, ['alice', 'bob'])
+        self.assertEqual(len(pool), 2)
+
+    def test_browsers_are_closed_without_reuse(self):
+
+        class ClosedTest(BrowserTestCase):
+
+            @starts_on(OrdersPage)
+            def test_one(self):
+                page = self.start_page(driver='HtmlDriver')
+                self.assertIsInstance(page, OrdersPage)
+
+        ClosedTest.app = staticmethod(app)
+
+        self.run_suite(ClosedTest, 'test_one')
+
+    def test_tests_starting_as_a_user_need_a_log_in_method(self):
+
+        class UserTest(BrowserTestCase):
+
+            @starts_on(OrdersPage, user='alice')
+            def test_one(self):
+                self.start_page(driver='HtmlDriver')
+
+        UserTest.app = staticmethod(app)
+        test = UserTest('test_one')
+        result = TestResult()
+
+        test.run(result)
+
+        self.assertEqual(len(result.errors), 1)
+        message = result.errors[0][1]
+        self.assertIn('NotImplementedError', message)
+        self.assertIn(test.id(), message)
+        self.assertIn("'alice'", message)
+
+    def test_abstract_test_cases_can_be_defined(self):
+
+        class AbstractTest(with_metaclass(ABCMeta, BrowserTestCase)):
+            start_user = 'alice'
+
+            @abstractmethod
+            def test_one(self):
+                pass
+
+        self.assertTrue(AbstractTest.__abstractmethods__)
@@ -0,0 +1,51 @@
+from unittest import TestCase
+
+from six.moves.urllib.request import urlopen
+
+from keteparaha.page import Page, _Registry
+from keteparaha.server import LiveServer, live_server, rebase_pages
+
+
+def hello_app(environ, start_response):
+    start_response('200 OK', [('Content-Type', 'text/plain')])
+    return [environ['PATH_INFO'].encode('utf-8')]
+
+
+class LiveServerTest(TestCase):
+
+    def test_serves_app_on_ephemeral_port(self):
+        server = LiveServer(hello_app).start()
+        self.addCleanup(server.stop)
+
+        self.assertNotEqual(server.port, 0)
+        self.assertEqual(urlopen(server.url + '/hello/').read(), b'/hello/')
+
+    def test_live_server_is_started_once_per_process(self):
+        server = live_server(hello_app)
+
+        self.assertTrue(server.running)
+        self.assertIs(live_server(hello_app), server)
+
+
+class RebasePagesTest(TestCase):
+
+    def test_rewrites_urls_and_registry_keys(self):
+        registry = _Registry()
+        Deployed = type('Deployed', (Page,), {})
+        Deployed.url = 'http://www.site.com/login/'
+        Other = type('Other', (Page,), {})
+        Other.url = 'http://other.com/'
+        registry.scope('app').register(Deployed)
+        registry.register(Other)
+
+        rebase_pages('http://www.site.com', 'http://127.0.0.1:8000', registry)
+        rebase_pages('http://www.site.com/', 'http://127.0.0.1:9000/',
+                     registry)
+
+        self.assertEqual(Deployed.url, 'http://127.0.0.1:9000/login/')
+        self.assertIs(
+            registry.scope('app')['http://127.0.0.1:9000/login/'], Deployed)
+        self.assertEqual(
+            set(registry.scope('app')),
+            {'http://127.0.0.1:9000/login/', 'http://other.com/'})
+        self.assertEqual(Other.url, 'http://other.com/')
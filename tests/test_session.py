@@ -0,0 +1,154 @@
+import shutil
+import tempfile
+import threading
+import time
+from unittest import TestCase
+
+from mock import Mock
+
+from keteparaha.html_driver import HtmlDriver
+from keteparaha.session import (
+    CAPTURE_STORAGE_SCRIPT,
+    RESTORE_STORAGE_SCRIPT,
+    SessionCache,
+    SessionState
+)
+
+
+def app(environ, start_response):
+    path = environ['PATH_INFO']
+    if path == '/login/':
+        start_response('302 Found', [
+            ('Location', '/dashboard/'),
+            ('Set-Cookie', 'user=alice; Path=/'),
+        ])
+        return [b'']
+    start_response('200 OK', [('Content-Type', 'text/html')])
+    if 'user=alice' in environ.get('HTTP_COOKIE', ''):
+        return [b'<h1>Hello alice</h1>']
+    return [b'<h1>Please log in</h1>']
+
+
+def login(driver):
+    driver.get('http://testserver/login/')
+
+
+def heading(driver):
+    driver.get('http://testserver/dashboard/')
+    return driver.find_element_by_tag_name('h1').text
+
+
+class SessionStateTest(TestCase):
+
+    def test_restored_session_is_logged_in(self):
+        driver = HtmlDriver(app=app)
+        login(driver)
+
+        state = SessionState.capture(driver)
+        other = HtmlDriver(app=app)
+        state.restore(other)
+
+        self.assertEqual(heading(other), 'Hello alice')
+        self.assertEqual(state.cookies[0]['name'], 'user')
+
+    def test_state_expires_after_max_age(self):
+        state = SessionState('http://testserver/', [], created=100)
+
+        self.assertFalse(state.expired(max_age=60, now=150))
+        self.assertTrue(state.expired(max_age=60, now=161))
+
+    def test_state_expires_with_its_cookies(self):
+        state = SessionState('http://testserver/', [
+            {'name': 'user', 'value': 'alice', 'expiry': 200}])
+
+        self.assertFalse(state.expired(now=199))
+        self.assertTrue(state.expired(now=200))
+
+    def test_web_storage_is_captured_from_w3c_browsers(self):
+        driver = Mock(current_url='http://testserver/dashboard/')
+        driver.capabilities = {'browserName': 'firefox'}
+        driver.execute_script.return_value = {
+            'local': {'token': 'abc'}, 'session': {'tab': '1'}}
+        driver.get_cookies.return_value = []
+
+        state = SessionState.capture(driver)
+
+        driver.execute_script.assert_called_with(CAPTURE_STORAGE_SCRIPT)
+        self.assertEqual(state.local_storage, {'token': 'abc'})
+        self.assertEqual(state.session_storage, {'tab': '1'})
+
+    def test_web_storage_is_restored_by_script(self):
+        driver = Mock(current_url='http://testserver/dashboard/')
+        driver.capabilities = {'browserName': 'chrome'}
+        state = SessionState(
+            'http://testserver/', [], {'token': 'abc'}, {'tab': '1'})
+
+        state.restore(driver)
+
+        self.assertFalse(driver.get.called)
+        driver.execute_script.assert_called_with(
+            RESTORE_STORAGE_SCRIPT, {'token': 'abc'}, {'tab': '1'})
+
+
+class SessionCacheTest(TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.logins = []
+
+    def login(self, driver):
+        self.logins.append(driver)
+        login(driver)
+
+    def test_logs_in_once_per_key(self):
+        cache = SessionCache(self.directory)
+        first, second = HtmlDriver(app=app), HtmlDriver(app=app)
+
+        cache.restore('alice', first, self.login)
+        cache.restore('alice', second, self.login)
+
+        self.assertEqual(self.logins, [first])
+        self.assertEqual(heading(second), 'Hello alice')
+
+    def test_different_keys_log_in_at_the_same_time(self):
+        cache = SessionCache(None)
+        alice_logging_in, bob_logging_in = threading.Event(), threading.Event()
+        overlapped = []
+
+        def alice_login(driver):
+            alice_logging_in.set()
+            overlapped.append(bob_logging_in.wait(5))
+            login(driver)
+
+        def bob_login(driver):
+            bob_logging_in.set()
+            login(driver)
+
+        thread = threading.Thread(target=cache.restore, args=(
+            'alice', HtmlDriver(app=app), alice_login))
+        thread.start()
+        alice_logging_in.wait(5)
+        cache.restore('bob', HtmlDriver(app=app), bob_login)
+        thread.join()
+
+        self.assertEqual(overlapped, [True])
+
+    def test_sessions_are_shared_through_the_directory(self):
+        SessionCache(self.directory).restore(
+            'alice', HtmlDriver(app=app), self.login)
+        driver = HtmlDriver(app=app)
+
+        SessionCache(self.directory).restore('alice', driver, self.login)
+
+        self.assertEqual(len(self.logins), 1)
+        self.assertEqual(heading(driver), 'Hello alice')
+
+    def test_expired_sessions_log_in_again(self):
+        cache = SessionCache(self.directory, max_age=60)
+        cache.set('alice', SessionState(
+            'http://testserver/', [], created=time.time() - 120))
+
+        cache.restore('alice', HtmlDriver(app=app), self.login)
+
+        self.assertEqual(len(self.logins), 1)
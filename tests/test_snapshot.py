@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+from unittest import TestCase
+
+from mock import Mock
+
+from keteparaha.html_driver import HtmlDriver
+from keteparaha.page import Page
+from keteparaha.snapshot import SNAPSHOT_SCRIPT, SnapshotNode, snapshot_element
+
+DATA = {
+    'tag': 'table',
+    'attrs': {'id': 'orders'},
+    'displayed': True,
+    'rect': {'x': 0, 'y': 10, 'width': 100, 'height': 40},
+    'children': [
+        {'tag': 'tr', 'attrs': {'data-id': '1'}, 'displayed': True,
+         'children': [{'tag': 'td', 'attrs': {'class': 'total'},
+                       'displayed': True, 'children': ['10.00']}]},
+        {'tag': 'tr', 'attrs': {'data-id': '2'}, 'displayed': False,
+         'children': [{'tag': 'td', 'attrs': {'class': 'total'},
+                       'displayed': False, 'children': ['20.00']}]},
+    ]
+}
+
+
+def orders_app(environ, start_response):
+    start_response('200 OK', [])
+    return [b'''<html><body><table id="orders">
+        <tr data-id="1"><td class="total">10.00</td></tr>
+        <tr data-id="2" hidden><td class="total">20.00</td></tr>
+        </table><input name="q" value="shoes"></body></html>''']
+
+
+class Orders(Page):
+    scope = 'snapshot_tests'
+    url = 'http://testserver/orders/'
+
+
+class SnapshotNodeTest(TestCase):
+
+    def test_select_and_read_locally(self):
+        snapshot = SnapshotNode(DATA)
+
+        self.assertEqual(
+            [td.text for td in snapshot.select('tr td.total')],
+            ['10.00', '']
+        )
+        self.assertEqual(snapshot.text, '10.00')
+        self.assertEqual(
+            snapshot.select_one('tr:last-child').get_attribute('data-id'),
+            '2'
+        )
+        self.assertFalse(snapshot.select_one('tr:last-child').displayed)
+        self.assertEqual(snapshot.rect['y'], 10)
+
+    def test_snapshots_are_immutable(self):
+        snapshot = SnapshotNode(DATA)
+
+        with self.assertRaises(TypeError):
+            snapshot.attrs['id'] = 'changed'
+        with self.assertRaises(AttributeError):
+            snapshot.tag = 'div'
+
+    def test_serializes_element_with_one_script(self):
+        element = Mock()
+        element.parent = Mock(spec=['execute_script'])
+        element.parent.execute_script.return_value = DATA
+
+        snapshot = snapshot_element(element)
+
+        element.parent.execute_script.assert_called_once_with(
+            SNAPSHOT_SCRIPT, element)
+        self.assertEqual(snapshot.get_attribute('id'), 'orders')
+
+
+class ComponentSnapshotTest(TestCase):
+
+    def test_html_driver_serializes_elements_itself(self):
+        orders = Orders(HtmlDriver(app=orders_app))
+
+        snapshot = orders.get_component('#orders').snapshot()
+
+        self.assertTrue(snapshot.has_text('10.00'))
+        self.assertFalse(snapshot.has_text('20.00'))
+        self.assertEqual(
+            orders.snapshot().select_one('input').get_attribute('value'),
+            'shoes'
+        )
@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+from unittest import TestCase, skipIf
+
+import six
+
+from keteparaha.transport import (
+    ASGITransport,
+    TransportError,
+    WSGITransport,
+    app_transport
+)
+
+
+def wsgi_app(environ, start_response):
+    path = environ['PATH_INFO']
+    if path == '/login/':
+        start_response(str('302 Found'), [
+            (str('Location'), str('/account/')),
+            (str('Set-Cookie'), str('session=abc; Path=/')),
+        ])
+        return [b'']
+    if path == '/loop/':
+        start_response(str('302 Found'), [(str('Location'), str('/loop/'))])
+        return [b'']
+    start_response(str('200 OK'), [
+        (str('Content-Type'), str('text/plain; charset=utf-8'))])
+    return [
+        '{0} {1} {2}'.format(
+            environ['REQUEST_METHOD'], path, environ.get('HTTP_COOKIE', '')
+        ).encode('utf-8')
+    ]
+
+
+class WSGITransportTest(TestCase):
+
+    def test_follows_redirects_and_keeps_cookies(self):
+        transport = WSGITransport(wsgi_app)
+
+        response = transport.request('POST', 'http://testserver/login/', b'x')
+
+        self.assertEqual(response.url, 'http://testserver/account/')
+        self.assertEqual(response.status, 200)
+        self.assertEqual(response.text, 'GET /account/ session=abc')
+
+    def test_cookies_are_sent_with_later_requests(self):
+        transport = WSGITransport(wsgi_app)
+        transport.request('GET', 'http://testserver/login/')
+
+        response = transport.request('GET', 'http://testserver/other/')
+
+        self.assertEqual(response.text, 'GET /other/ session=abc')
+
+    def test_redirect_loops_raise_error(self):
+        with self.assertRaises(TransportError):
+            WSGITransport(wsgi_app).request('GET', 'http://testserver/loop/')
+
+    def test_app_transport_picks_wsgi_for_wsgi_apps(self):
+        self.assertIsInstance(app_transport(wsgi_app), WSGITransport)
+
+
+@skipIf(six.PY2, 'ASGI needs Python 3')
+class ASGITransportTest(TestCase):
+
+    def test_calls_app_in_process_and_keeps_cookies(self):
+        from asgi_app import app
+        transport = app_transport(app)
+        self.addCleanup(transport.close)
+
+        transport.request('GET', 'http://testserver/')
+        response = transport.request('POST', 'http://testserver/form/', b'a')
+
+        self.assertEqual(response.text, 'POST /form/ a visited=yes')
+
+    def test_app_transport_picks_asgi_for_coroutine_apps(self):
+        from asgi_app import app
+
+        self.assertIsInstance(app_transport(app), ASGITransport)
@@ -0,0 +1,182 @@
+import io
+import os
+import shutil
+import tempfile
+from unittest import TestCase, TestResult, skipIf
+
+from mock import Mock, patch
+from selenium.common.exceptions import WebDriverException
+
+try:
+    import numpy
+    from PIL import Image
+except ImportError:
+    numpy = None
+
+from keteparaha.browser import BrowserTestCase
+from keteparaha.visual import (
+    UPDATE_ENV,
+    VisualMismatch,
+    assert_visually_matches,
+    compare_images,
+    screenshot
+)
+
+
+def image(width=100, height=80, colour=(255, 255, 255)):
+    array = numpy.zeros((height, width, 3), dtype=numpy.uint8)
+    array[:] = colour
+    return array
+
+
+def png(array):
+    output = io.BytesIO()
+    Image.fromarray(array).save(output, 'PNG')
+    return output.getvalue()
+
+
+@skipIf(numpy is None, 'NumPy and Pillow are not installed')
+class CompareImagesTest(TestCase):
+
+    def test_identical_images_match(self):
+        comparison = compare_images(image(), image())
+
+        self.assertTrue(comparison)
+        self.assertEqual(comparison.different, 0)
+
+    def test_differences_within_tolerance_match(self):
+        actual = image()
+        actual[10:20, 10:20] = (250, 250, 250)
+
+        self.assertTrue(compare_images(actual, image(), tolerance=8))
+
+    def test_differences_over_tolerance_fail(self):
+        actual = image()
+        actual[10:20, 10:20] = (0, 0, 0)
+
+        comparison = compare_images(actual, image())
+
+        self.assertFalse(comparison)
+        self.assertGreater(comparison.ratio, 0.001)
+
+    def test_a_few_different_pixels_are_allowed(self):
+        actual = image()
+        actual[5, 5] = (0, 0, 0)
+
+        comparison = compare_images(actual, image(), max_diff_ratio=0.001)
+
+        self.assertTrue(comparison)
+        self.assertEqual(comparison.different, 1)
+
+    def test_masked_regions_are_not_compared(self):
+        actual = image()
+        actual[10:20, 30:60] = (0, 0, 0)
+
+        self.assertTrue(compare_images(
+            actual, image(), masks=[(30, 10, 30, 10)]))
+
+    def test_blue_counts_less_than_green(self):
+        blue, green = image(colour=(0, 0, 0)), image(colour=(0, 0, 0))
+        blue[:] = (0, 0, 60)
+        green[:] = (0, 60, 0)
+
+        self.assertTrue(compare_images(blue, image(colour=(0, 0, 0))))
+        self.assertFalse(compare_images(green, image(colour=(0, 0, 0))))
+
+    def test_images_of_different_sizes_fail(self):
+        comparison = compare_images(image(width=90), image())
+
+        self.assertFalse(comparison)
+        self.assertEqual(comparison.ratio, 1.0)
+
+    def test_result_is_the_same_without_the_downscaled_check(self):
+        actual = image(width=200, height=200)
+        actual[::7, ::5] = (0, 0, 0)
+
+        self.assertFalse(compare_images(actual, image(200, 200)))
+        self.assertFalse(compare_images(actual, image(200, 200), downscale=0))
+
+
+@skipIf(numpy is None, 'NumPy and Pillow are not installed')
+class AssertVisuallyMatchesTest(TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.driver = Mock(spec=['get_screenshot_as_png'])
+        self.driver.get_screenshot_as_png.return_value = png(image())
+
+    def test_missing_baseline_is_saved(self):
+        assert_visually_matches(self.driver, 'home.png', self.directory)
+
+        self.assertTrue(os.path.exists(
+            os.path.join(self.directory, 'home.png')))
+        assert_visually_matches(self.driver, 'home.png', self.directory)
+
+    def test_mismatch_saves_screenshot_and_diff(self):
+        assert_visually_matches(self.driver, 'home.png', self.directory)
+        changed = image()
+        changed[:40] = (0, 0, 0)
+        self.driver.get_screenshot_as_png.return_value = png(changed)
+
+        with self.assertRaises(VisualMismatch) as raised:
+            assert_visually_matches(self.driver, 'home.png', self.directory)
+
+        self.assertTrue(os.path.exists(raised.exception.actual_path))
+        diff = numpy.asarray(Image.open(raised.exception.diff_path))
+        self.assertEqual(tuple(diff[0, 0]), (255, 0, 0))
+        self.assertNotEqual(tuple(diff[79, 0]), (255, 0, 0))
+
+    def test_baselines_are_replaced_when_updating(self):
+        assert_visually_matches(self.driver, 'home.png', self.directory)
+        self.driver.get_screenshot_as_png.return_value = png(
+            image(colour=(0, 0, 0)))
+
+        with patch.dict(os.environ, {UPDATE_ENV: '1'}):
+            assert_visually_matches(self.driver, 'home.png', self.directory)
+
+        assert_visually_matches(self.driver, 'home.png', self.directory)
+
+    def test_elements_are_cropped_from_the_page(self):
+        page = image()
+        page[10:30, 20:60] = (0, 0, 0)
+        element = Mock(spec=['location', 'parent', 'size'],
+                       location={'x': 20, 'y': 10},
+                       size={'width': 40, 'height': 20})
+        type(element).screenshot_as_png = property(
+            Mock(side_effect=WebDriverException('Unsupported')))
+        element.parent.get_screenshot_as_png.return_value = png(page)
+        element.parent.execute_script.return_value = 1
+
+        self.assertTrue(numpy.array_equal(
+            screenshot(element), image(40, 20, (0, 0, 0))))
+
+    def test_elements_are_cropped_in_device_pixels(self):
+        page = image(200, 160)
+        page[20:60, 40:120] = (0, 0, 0)
+        element = Mock(spec=['location', 'parent', 'size'],
+                       location={'x': 20, 'y': 10},
+                       size={'width': 40, 'height': 20})
+        type(element).screenshot_as_png = property(
+            Mock(side_effect=WebDriverException('Unsupported')))
+        element.parent.get_screenshot_as_png.return_value = png(page)
+        element.parent.execute_script.return_value = 2
+
+        self.assertTrue(numpy.array_equal(
+            screenshot(element), image(80, 40, (0, 0, 0))))
+
+    def test_browser_test_case_keeps_baselines_in_visual_baselines(self):
+        directory, driver = self.directory, self.driver
+
+        class VisualTest(BrowserTestCase):
+            visual_baselines = directory
+
+            def test_home(self):
+                self.browsers.append(driver)
+                self.assertTrue(self.assert_visually_matches('home.png'))
+
+        result = TestResult()
+        VisualTest('test_home').run(result)
+
+        self.assertTrue(result.wasSuccessful(), result.errors)
+        self.assertTrue(os.path.exists(os.path.join(directory, 'home.png')))